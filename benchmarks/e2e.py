@@ -0,0 +1,317 @@
+"""
+Harness offline de ponta a ponta: mede a latência dos fluxos do bot sem rede.
+
+O Gemini é substituído por um cliente falso (latência configurável, injeção de
+429 e JSON pronto por tipo de prompt), o Telegram por uma sessão falsa do Bot
+que registra cada `message.answer`, e a planilha pelo FakeSheetsService. Os
+updates passam pelo Dispatcher e pelos routers reais de `bot/handlers.py`.
+
+Uso:
+    python -m benchmarks.e2e
+    python -m benchmarks.e2e --iterations 200 --latency 0.3 --quota-rate 0.1
+    python -m benchmarks.e2e --fused
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import time
+from datetime import datetime
+
+# O AIService exige a chave, mas aqui o cliente do Gemini é sempre o falso
+os.environ.setdefault("GEMINI_API_KEY", "offline")
+
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.base import BaseSession
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.methods import SendMessage
+from aiogram.types import Chat, Message, Update, User
+from benchmarks.fake_sheets import FakeSheetsService
+from benchmarks.ledger_generator import generate_ledger
+from services.ai_handler import AIService
+from services.container import ServiceContainer
+from services.metrics import percentile
+from services.response_cache import ResponseCache
+from services.transaction_service import TransactionService
+from services.user_registry import UserServiceRegistry
+
+USER_ID = 4242
+BOT_TOKEN = "123456:OFFLINE"
+
+# Trecho característico de cada prompt de utils/prompts.py (o fused vem antes do router)
+PROMPT_KINDS = [
+    ("fused", "roteador e extrator"),
+    ("router", "roteador de um assistente"),
+    ("reimbursement", "é sobre um REEMBOLSO"),
+    ("past_edit", "alterar ou corrigir"),
+    ("tags", "gerenciar tags"),
+    ("query", "pergunta do usuário"),
+    ("expense", "assistente financeiro pessoal"),
+]
+_USER_TEXT_RE = re.compile(r'^Frase: "(.*)"$', re.MULTILINE)
+
+
+def classify_prompt(prompt):
+    """(tipo do prompt, texto do usuário) a partir das instruções + conteúdo enviados ao Gemini."""
+    prompt = str(prompt)
+    kind = next((kind for kind, marker in PROMPT_KINDS if marker in prompt), "unknown")
+    matches = _USER_TEXT_RE.findall(prompt)
+    return kind, matches[-1] if matches else ""
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeCachedContent:
+    def __init__(self, name):
+        self.name = name
+
+
+class FakeGenaiClient:
+    """Substituto do `genai.Client` com a mesma forma de `client.aio.models.generate_content`.
+
+    Args:
+        responses: {tipo do prompt: {texto do usuário: resposta (dict)}}
+        latency: segundos por chamada (com `jitter` relativo aleatório)
+        quota_rate: fração das chamadas que falham com 429
+    """
+
+    def __init__(self, responses, latency=0.0, jitter=0.2, quota_rate=0.0, seed=7):
+        self.responses = responses
+        self.latency = latency
+        self.jitter = jitter
+        self.quota_rate = quota_rate
+        self.rng = random.Random(seed)
+        self.calls = []
+        self.cached_contents = {}
+        self.aio = self
+        self.models = self
+        self.caches = self
+
+    async def create(self, model, config=None):
+        """caches.create: guarda as instruções para as chamadas com cached_content."""
+        name = f"cachedContents/{len(self.cached_contents)}"
+        self.cached_contents[name] = config["system_instruction"]
+        return FakeCachedContent(name)
+
+    async def generate_content(self, model, contents, config=None):
+        config = config or {}
+        instructions = config.get("system_instruction") or self.cached_contents.get(config.get("cached_content"), "")
+        kind, text = classify_prompt(f"{instructions}\n\n{contents}")
+        self.calls.append((model, kind))
+        if self.latency:
+            await asyncio.sleep(self.latency * (1 + self.rng.uniform(-self.jitter, self.jitter)))
+        if self.quota_rate and self.rng.random() < self.quota_rate:
+            raise Exception("429 RESOURCE_EXHAUSTED. Please retry in 1s.")
+        return FakeResponse(json.dumps(self.responses.get(kind, {}).get(text, {}), ensure_ascii=False))
+
+
+class FakeTelegramSession(BaseSession):
+    """Sessão do Bot que não acessa a rede e registra as mensagens enviadas."""
+
+    def __init__(self):
+        super().__init__()
+        self.sent = []
+        self.requests = 0
+
+    async def make_request(self, bot, method, timeout=None):
+        self.requests += 1
+        if isinstance(method, SendMessage):
+            self.sent.append(method.text)
+            return Message(
+                message_id=len(self.sent),
+                date=datetime.now(),
+                chat=Chat(id=method.chat_id, type="private"),
+                text=method.text,
+            )
+        return True
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self):
+        pass
+
+
+class CountingSheets(FakeSheetsService):
+    """FakeSheetsService que conta as operações que seriam chamadas ao Sheets."""
+
+    # add_expense delega para append_rows
+    COUNTED = ("refresh_ledger", "append_rows", "update_transaction", "add_category")
+
+    def __init__(self, rows):
+        super().__init__(rows)
+        self.calls = 0
+
+    def __getattribute__(self, name):
+        if name in CountingSheets.COUNTED:
+            object.__setattr__(self, "calls", object.__getattribute__(self, "calls") + 1)
+        return object.__getattribute__(self, name)
+
+
+# Roteiro de cada fluxo: mensagens do usuário, em ordem
+FLOWS = {
+    "insert_missing_info": ["Almocei com a equipe e deu 50 conto", "Pix"],
+    "insert_then_edit": ["Uber 25 no pix", "O valor é 30"],
+    "reimbursement_multi_match": ["Recebi o reembolso de 20 do uber", "1"],
+    "query_month": ["Quanto gastei este mês?"],
+}
+
+# Respostas do "Gemini" para cada tipo de prompt e frase
+SPECIALISTS = {
+    "Almocei com a equipe e deu 50 conto": ("insert", "expense", {
+        "valor": -50, "descricao": "Almoço equipe", "tags": "Restaurante", "metodo_pagamento": None, "data": None,
+    }),
+    "Uber 25 no pix": ("insert", "expense", {
+        "valor": -25, "descricao": "Uber", "tags": "Uber", "metodo_pagamento": "Pix", "data": None,
+    }),
+    "O valor é 30": ("edit", "past_edit", {
+        "is_past_edit": True, "search_criteria": {}, "updates": {"amount": 30},
+    }),
+    "Recebi o reembolso de 20 do uber": ("reimburse", "reimbursement", {
+        "is_reimbursement": True, "valor_reembolsado": 20, "data_compra": None, "descricao_compra": "uber",
+    }),
+    "Quanto gastei este mês?": ("query", "query", {
+        "is_query": True, "start_date": datetime.now().replace(day=1).strftime("%d/%m/%Y"), "end_date": None,
+        "label": "este mês", "query_type": "spent", "exclude_methods": [], "include_methods": [],
+    }),
+}
+
+
+def build_responses():
+    responses = {"router": {}, "fused": {}}
+    for text, (intent, kind, payload) in SPECIALISTS.items():
+        responses["router"][text] = {"intent": intent}
+        responses["fused"][text] = {"intent": intent, "data": payload}
+        responses.setdefault(kind, {})[text] = payload
+    return responses
+
+
+_dispatcher = None
+
+
+def get_dispatcher(router):
+    """Dispatcher único do processo: o aiogram só deixa um router ter um pai."""
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = Dispatcher()
+        _dispatcher.include_router(router)
+    return _dispatcher
+
+
+class Harness:
+    """Dispatcher real + handlers reais, com Gemini, Telegram e planilha falsos."""
+
+    def __init__(self, ledger_rows=10_000, latency=0.0, quota_rate=0.0, fused=False):
+        from bot.handlers import router
+
+        self.sheets = CountingSheets(generate_ledger(ledger_rows))
+        service = TransactionService(storage=self.sheets)
+        service.refresh_ledger()
+        self.sheets.calls = 0
+
+        self.genai = FakeGenaiClient(build_responses(), latency=latency, quota_rate=quota_rate)
+        ai_service = AIService(fused_routing=fused)
+        ai_service.client = self.genai
+        self.container = ServiceContainer(
+            registry=UserServiceRegistry({USER_ID: self.sheets.sheet_id}, lambda sheet_id: service),
+            ai_service=ai_service,
+        )
+
+        self.session = FakeTelegramSession()
+        self.bot = Bot(token=BOT_TOKEN, session=self.session)
+        self.dp = get_dispatcher(router)
+        self.state_key = StorageKey(bot_id=self.bot.id, chat_id=USER_ID, user_id=USER_ID)
+        self._update_id = 0
+
+    def make_update(self, text):
+        self._update_id += 1
+        user = User(id=USER_ID, is_bot=False, first_name="Bench")
+        return Update(update_id=self._update_id, message=Message(
+            message_id=self._update_id,
+            date=datetime.now(),
+            chat=Chat(id=USER_ID, type="private"),
+            from_user=user,
+            text=text,
+        ))
+
+    async def reset(self):
+        """Conversa limpa e cache de respostas vazio (cada rodada paga as chamadas ao Gemini)."""
+        await self.dp.storage.set_state(self.state_key, None)
+        await self.dp.storage.set_data(self.state_key, {})
+        self.container.ai_service.response_cache = ResponseCache(max_size=256, ttl=3600)
+
+    async def run_flow(self, messages):
+        """Executa um fluxo e retorna (segundos, chamadas ao Gemini, ao Sheets, ao Telegram, respostas)."""
+        await self.reset()
+        genai_before, sheets_before = len(self.genai.calls), self.sheets.calls
+        telegram_before, sent_before = self.session.requests, len(self.session.sent)
+
+        start = time.perf_counter()
+        for text in messages:
+            await self.dp.feed_update(self.bot, self.make_update(text), container=self.container)
+        elapsed = time.perf_counter() - start
+
+        return (
+            elapsed,
+            len(self.genai.calls) - genai_before,
+            self.sheets.calls - sheets_before,
+            self.session.requests - telegram_before,
+            self.session.sent[sent_before:],
+        )
+
+    async def run(self, iterations, flows=None):
+        report = {}
+        for name, messages in FLOWS.items():
+            if flows and name not in flows:
+                continue
+            latencies, genai_calls, sheets_calls, telegram_calls = [], 0, 0, 0
+            for _ in range(iterations):
+                elapsed, g, s, t, _ = await self.run_flow(messages)
+                latencies.append(elapsed)
+                genai_calls += g
+                sheets_calls += s
+                telegram_calls += t
+            report[name] = {
+                "p50": percentile(latencies, 50),
+                "p95": percentile(latencies, 95),
+                "p99": percentile(latencies, 99),
+                "gemini_calls": genai_calls / iterations,
+                "sheets_calls": sheets_calls / iterations,
+                "telegram_calls": telegram_calls / iterations,
+            }
+        return report
+
+
+def print_report(report):
+    print(f"{'fluxo':<28}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'gemini':>9}{'sheets':>9}{'telegram':>10}")
+    for name, stats in report.items():
+        print(
+            f"{name:<28}{stats['p50'] * 1000:>10.2f}{stats['p95'] * 1000:>10.2f}{stats['p99'] * 1000:>10.2f}"
+            f"{stats['gemini_calls']:>9.2f}{stats['sheets_calls']:>9.2f}{stats['telegram_calls']:>10.2f}"
+        )
+
+
+async def main(argv=None):
+    parser = argparse.ArgumentParser(description="Latência de ponta a ponta dos fluxos do bot (offline)")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--ledger-rows", type=int, default=10_000)
+    parser.add_argument("--latency", type=float, default=0.0, help="Latência simulada do Gemini (s)")
+    parser.add_argument("--quota-rate", type=float, default=0.0, help="Fração de chamadas com 429")
+    parser.add_argument("--fused", action="store_true", help="Roteamento fused (AI_FUSED_ROUTING=1)")
+    parser.add_argument("--flows", default="", help="Só estes fluxos (separados por vírgula)")
+    args = parser.parse_args(argv)
+
+    harness = Harness(args.ledger_rows, args.latency, args.quota_rate, args.fused)
+    report = await harness.run(args.iterations, {f for f in args.flows.split(",") if f} or None)
+    print_report(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
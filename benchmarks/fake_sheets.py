@@ -0,0 +1,54 @@
+from models.transaction import COLUMN_INDEX
+from services.ledger_cache import LedgerCache
+from services.storage import LedgerStorage
+
+
+class FakeSheetsService(LedgerStorage):
+    """Planilha em memória com a mesma interface do GoogleSheetsService.
+
+    Não faz rede: as escritas só alteram `self.sheet_rows`, então os benchmarks
+    medem apenas o custo da camada de serviço (cache, índices e agregações).
+    """
+
+    is_remote = False
+
+    def __init__(self, rows, sheet_id="fake-sheet"):
+        self.sheet_id = sheet_id
+        self.sheet_rows = [list(row) for row in rows]
+        self._init_registry()
+        self.ledger = LedgerCache(refresh_interval=0)
+
+    def setup_headers(self):
+        return "Headers já existentes."
+
+    def refresh_ledger(self):
+        self.ledger.refresh(lambda: [list(row) for row in self.sheet_rows])
+        return len(self.ledger.rows)
+
+    def add_expense(self, valor, descricao, reembolsado=0, tags="", metodo_pagamento="", data_custom=None):
+        return self.append_rows([self._new_row(valor, descricao, reembolsado, tags, metodo_pagamento, data_custom)])[0]
+
+    def append_rows(self, rows):
+        first_row = len(self.sheet_rows) + 1
+        row_numbers = list(range(first_row, first_row + len(rows)))
+        for row_number, row in zip(row_numbers, rows):
+            self.sheet_rows.append([str(v) for v in row])
+            self.ledger.append_row(row_number, row)
+        return row_numbers
+
+    def update_transaction(self, row_index, changes):
+        row = self.sheet_rows[row_index - 1]
+        for field, value in changes.items():
+            col = COLUMN_INDEX[field]
+            if len(row) < col:
+                row.extend([""] * (col - len(row)))
+            row[col - 1] = str(value)
+            self.ledger.update_cell(row_index, col, value)
+
+    def add_category(self, category, category_type='expense'):
+        tags = self.expense_tags if category_type == 'expense' else self.income_tags
+        if category in tags:
+            return False
+        tags.append(category)
+        self.tag_options = list(set(self.expense_tags + self.income_tags))
+        return True
@@ -0,0 +1,75 @@
+import random
+from datetime import date, timedelta
+
+HEADERS = ["Data", "Valor", "Reembolsado", "Descrição", "Tags", "Método de Pagamento"]
+
+EXPENSES = [
+    ("Mercado", ["Mercado Extra", "Pão de Açúcar", "Feira", "Padaria", "Açougue"], (20, 600)),
+    ("Restaurante", ["Almoço", "Jantar", "iFood", "Pizza", "Café"], (15, 250)),
+    ("Uber", ["Uber", "99", "Uber aeroporto", "Táxi"], (8, 120)),
+    ("Gasolina", ["Gasolina", "Posto Shell", "Etanol"], (80, 350)),
+    ("Academia", ["Academia", "Smart Fit", "Natação"], (90, 200)),
+    ("Compras", ["Amazon", "Mercado Livre", "Roupa", "Tênis", "Farmácia"], (30, 900)),
+    ("Viagem", ["Passagem aérea", "Hotel", "Airbnb", "Rodoviária"], (150, 3000)),
+    ("Outros", ["Presente", "Cabeleireiro", "Lavanderia", "Pet shop"], (10, 300)),
+]
+INCOMES = [
+    ("Salário", ["Salário", "Adiantamento"], (3000, 12000)),
+    ("Presente", ["Presente da mãe", "Aniversário"], (50, 1000)),
+    ("Reembolso", ["Reembolso Excedente: Uber", "Pix do João"], (10, 300)),
+]
+# Variações de escrita que aparecem em planilhas editadas à mão
+METHODS = ["Pix", "Crédito", "Débito", "Caju", "pix", "crédito", "CREDITO", ""]
+METHOD_WEIGHTS = [30, 35, 12, 10, 4, 4, 2, 3]
+
+
+def brl(value):
+    """Valor no formato da planilha brasileira: vírgula decimal, sem separador de milhar."""
+    return f"{value:.2f}".replace(".", ",")
+
+
+def generate_ledger(n_rows, seed=42, start=date(2019, 1, 1), per_day=4):
+    """
+    Gera um ledger sintético no formato de `get_all_values()` (com header).
+
+    As datas avançam em ordem (em média `per_day` transações por dia), com e sem
+    horário; valores usam vírgula decimal; ~5% dos gastos têm reembolso
+    (parcial ou total) e ~6% das linhas são entradas.
+    """
+    rng = random.Random(seed)
+    rows = [list(HEADERS)]
+    day = start
+    for i in range(n_rows):
+        if rng.random() < 1 / per_day:
+            day += timedelta(days=1)
+
+        date_cell = day.strftime("%d/%m/%Y")
+        if rng.random() < 0.6:
+            date_cell += f" {rng.randint(7, 23):02d}:{rng.randint(0, 59):02d}"
+
+        if rng.random() < 0.06:
+            tag, descriptions, (low, high) = rng.choice(INCOMES)
+            amount = round(rng.uniform(low, high), 2)
+            reimbursed = 0.0
+        else:
+            tag, descriptions, (low, high) = rng.choice(EXPENSES)
+            amount = -round(rng.uniform(low, high), 2)
+            roll = rng.random()
+            if roll < 0.02:
+                reimbursed = -amount
+            elif roll < 0.05:
+                reimbursed = round(-amount * rng.uniform(0.1, 0.9), 2)
+            else:
+                reimbursed = 0.0
+
+        method = rng.choices(METHODS, METHOD_WEIGHTS)[0]
+        rows.append([date_cell, brl(amount), brl(reimbursed) if reimbursed else "0", rng.choice(descriptions), tag, method])
+    return rows
+
+
+def parse_size(value):
+    """'1k' -> 1000, '100k' -> 100000, '1m' -> 1000000."""
+    value = value.strip().lower()
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(value[-1:], 1)
+    number = value[:-1] if multiplier > 1 else value
+    return int(float(number) * multiplier)
@@ -0,0 +1,91 @@
+"""
+Tokens por prompt: quanto de cada chamada ao Gemini é instrução fixa (cacheável)
+e quanto muda a cada mensagem, comparado com o baseline dos templates antigos.
+
+Uso:
+    python -m benchmarks.prompt_tokens             # contagem aproximada, offline
+    python -m benchmarks.prompt_tokens --exact     # tokenizer do Gemini (requer sentencepiece)
+"""
+import argparse
+import json
+import math
+import os
+import re
+import sys
+from utils import prompts
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "prompt_tokens_baseline.json")
+
+EXPENSE_TAGS = ["Mercado", "Restaurante", "Uber", "Gasolina", "Academia", "Compras", "Viagem", "Outros"]
+INCOME_TAGS = ["Salário", "Presente", "Reembolso"]
+METHODS = ["Pix", "Crédito", "Débito", "Caju"]
+TODAY = "17/10/2026"
+
+# Uma chamada típica de cada tipo (mesmos argumentos usados pelo AIService)
+SAMPLES = {
+    "expense": lambda: prompts.get_expense_classification_prompt("Almocei com a equipe e deu 50 conto no pix", EXPENSE_TAGS, INCOME_TAGS, TODAY),
+    "reimbursement": lambda: prompts.get_reimbursement_prompt("Recebi o reembolso de 20 do uber de ontem", TODAY),
+    "past_edit": lambda: prompts.get_past_edit_prompt("o valor é 30", EXPENSE_TAGS + INCOME_TAGS, METHODS),
+    "tags": lambda: prompts.get_tag_intent_prompt("crie a tag Pets"),
+    "query": lambda: prompts.get_query_intent_prompt("Quanto gastei este mês sem o caju?", TODAY, METHODS),
+    "router": lambda: prompts.get_intent_router_prompt("Uber 25 no pix"),
+    "fused": lambda: prompts.get_fused_router_prompt("Uber 25 no pix", EXPENSE_TAGS, INCOME_TAGS, METHODS, TODAY),
+}
+
+# Palavras, pontuação e blocos de espaço/indentação (um espaço simples vai junto com a palavra)
+_PIECE_RE = re.compile(r"\w+|[^\w\s]|\s*\n\s*| {2,}")
+
+
+def estimate_tokens(text):
+    """Aproximação do tokenizer do Gemini: ~4 caracteres por token em palavras,
+    1 token por sinal de pontuação e por quebra de linha/indentação."""
+    tokens = 0
+    for piece in _PIECE_RE.findall(text):
+        tokens += max(1, math.ceil(len(piece) / 4)) if piece[0].isalnum() or piece[0] == "_" else 1
+    return tokens
+
+
+def exact_counter(model="gemini-2.5-flash"):
+    """Contador com o tokenizer local do SDK (baixa o modelo do tokenizer na primeira vez)."""
+    from google.genai.local_tokenizer import LocalTokenizer
+    tokenizer = LocalTokenizer(model_name=model)
+    return lambda text: tokenizer.count_tokens(text).total_tokens
+
+
+def count_prompt(prompt, counter=estimate_tokens):
+    """{"static", "dynamic", "total"} de um Prompt (ou de uma string inteira, como nos templates antigos)."""
+    if isinstance(prompt, prompts.Prompt):
+        static, dynamic = counter(prompt.static), counter(prompt.dynamic)
+        return {"static": static, "dynamic": dynamic, "total": static + dynamic}
+    total = counter(str(prompt))
+    return {"static": 0, "dynamic": total, "total": total}
+
+
+def measure(counter=estimate_tokens):
+    return {kind: count_prompt(build(), counter) for kind, build in SAMPLES.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tokens por prompt do Gemini")
+    parser.add_argument("--exact", action="store_true", help="Usa o tokenizer local do Gemini em vez da aproximação")
+    args = parser.parse_args(argv)
+
+    counter = exact_counter() if args.exact else estimate_tokens
+    results = measure(counter)
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, encoding="utf-8") as f:
+            baseline = json.load(f).get("exact" if args.exact else "estimated", {})
+
+    print(f"{'prompt':<15}{'fixo':>8}{'dinâmico':>10}{'total':>8}{'antes':>8}{'economia':>10}{'c/ cache':>10}")
+    for kind, counts in results.items():
+        before = baseline.get(kind)
+        saving = f"{1 - counts['total'] / before:.0%}" if before else "-"
+        # Com context caching só a parte dinâmica é cobrada pelo preço cheio
+        cached_saving = f"{1 - counts['dynamic'] / before:.0%}" if before else "-"
+        print(f"{kind:<15}{counts['static']:>8}{counts['dynamic']:>10}{counts['total']:>8}{before or '-':>8}{saving:>10}{cached_saving:>10}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
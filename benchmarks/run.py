@@ -0,0 +1,147 @@
+"""
+Benchmarks da camada de serviço sobre um ledger sintético em memória.
+
+Uso:
+    python -m benchmarks.run                      # 1k e 100k linhas, compara com o baseline
+    python -m benchmarks.run --sizes 1k,100k,1m
+    python -m benchmarks.run --update-baseline    # grava os tempos atuais como referência
+
+Sai com código 1 se algum caso ficar mais lento que baseline * tolerância.
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+from datetime import date
+from benchmarks.fake_sheets import FakeSheetsService
+from benchmarks.ledger_generator import generate_ledger, parse_size
+from models.transaction import Transaction
+from services.transaction_service import TransactionService
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+def measure(func, repeat=5, min_time=0.2):
+    """Menor tempo por chamada (s) em `repeat` rodadas de pelo menos `min_time` segundos."""
+    calls = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(calls):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / repeat or calls >= 1_000_000:
+            break
+        calls *= 10
+
+    best = elapsed / calls
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(calls):
+            func()
+        best = min(best, (time.perf_counter() - start) / calls)
+    return best
+
+
+def build_cases(rows):
+    """Monta {nome: função} para um ledger já gerado."""
+    sheets = FakeSheetsService(rows)
+    service = TransactionService(storage=sheets)
+    service.refresh_ledger()
+
+    last_day = service.sheets.ledger.transaction_at(len(rows) - 2).date_ordinal
+    month_start = date.fromordinal(last_day).replace(day=1)
+    year_start = month_start.replace(month=1)
+    month_start_str = month_start.strftime("%d/%m/%Y")
+    year_start_str = year_start.strftime("%d/%m/%Y")
+    tomorrow_str = date.fromordinal(last_day + 1).strftime("%d/%m/%Y")
+    mid_day_str = date.fromordinal(last_day - 30).strftime("%d/%m/%Y")
+
+    # Uma despesa sem reembolso para o caso de reembolso parcial
+    expense = service.find_transaction(desc_query="mercado")[0]
+    sample = rows[1:100_001]
+
+    return {
+        "from_row": lambda: [Transaction.from_row(row) for row in sample],
+        "refresh_ledger": service.refresh_ledger,
+        "calculate_totals_month": lambda: service.calculate_totals(month_start_str, tomorrow_str, "summary", items_limit=5),
+        "calculate_totals_year_rollups": lambda: service.calculate_totals(year_start_str, tomorrow_str, "spent", exclude_methods=["Caju"], items_limit=0),
+        "calculate_totals_all": lambda: service.calculate_totals(query_type="summary", items_limit=5),
+        "find_transaction_desc": lambda: service.find_transaction(desc_query="uber aeroporto"),
+        "find_transaction_date_amount": lambda: service.find_transaction(date_query=mid_day_str, amount_query=1),
+        "find_expense_by_date_and_desc": lambda: service.find_expense_by_date_and_desc(mid_day_str, "compra no mercado"),
+        "process_reimbursement": lambda: service.process_reimbursement(expense, abs(expense.amount) / 2),
+    }
+
+
+def run(sizes, cases_filter=None):
+    results = {}
+    for size_label in sizes:
+        n_rows = parse_size(size_label)
+        print(f"📦 Gerando ledger com {n_rows} linhas...")
+        rows = generate_ledger(n_rows)
+        cases = build_cases(rows)
+        for name, func in cases.items():
+            if cases_filter and name not in cases_filter:
+                continue
+            gc.collect()
+            seconds = measure(func)
+            key = f"{name}@{size_label}"
+            results[key] = seconds
+            print(f"  {key:<45} {seconds * 1000:>10.3f} ms")
+        del rows, cases
+    return results
+
+
+def compare(results, baseline, tolerance, min_delta=0.0001):
+    """Lista de regressões: (caso, tempo atual, baseline).
+
+    Diferenças absolutas abaixo de `min_delta` segundos são ignoradas (ruído em
+    casos de microssegundos).
+    """
+    regressions = []
+    for key, seconds in results.items():
+        reference = baseline.get(key)
+        if reference is not None and seconds > reference * tolerance and seconds - reference > min_delta:
+            regressions.append((key, seconds, reference))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks do TeleGrana")
+    parser.add_argument("--sizes", default="1k,100k", help="Tamanhos do ledger, ex: 1k,100k,1m")
+    parser.add_argument("--cases", default="", help="Só estes casos (separados por vírgula)")
+    parser.add_argument("--tolerance", type=float, default=float(os.getenv("BENCH_TOLERANCE", "1.5")),
+                        help="Falha se tempo > baseline * tolerância")
+    parser.add_argument("--update-baseline", action="store_true", help="Grava os tempos medidos no baseline")
+    args = parser.parse_args(argv)
+
+    sizes = [s for s in args.sizes.split(",") if s]
+    cases_filter = {c for c in args.cases.split(",") if c} or None
+    results = run(sizes, cases_filter)
+
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    if args.update_baseline:
+        baseline.update(results)
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump(dict(sorted(baseline.items())), f, indent=2)
+            f.write("\n")
+        print(f"💾 Baseline atualizado ({len(results)} casos)")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    for key, seconds, reference in regressions:
+        print(f"❌ Regressão em {key}: {seconds * 1000:.3f} ms (baseline {reference * 1000:.3f} ms)")
+    if regressions:
+        return 1
+    print("✅ Nenhuma regressão")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
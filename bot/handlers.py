@@ -1,20 +1,25 @@
+import asyncio
 from aiogram import Router, types
 from aiogram.filters import Command, StateFilter
 from aiogram.fsm.context import FSMContext
-from services.ai_handler import AIService
-from services.transaction_service import TransactionService
+from services.container import ServiceContainer
+from services.metrics import metrics
+from bot.middlewares import HandlerTimingMiddleware
 from bot.states import ExpenseState
 from models.transaction import Transaction
-import os
 
 router = Router()
-service = TransactionService() # Renamed from 'sheets' to 'service'
-ai_service = AIService()
-MY_ID = int(os.getenv('MY_USER_ID'))
+# Intents do roteador; qualquer outro valor vindo do Gemini vira "other" no rótulo das métricas
+INTENTS = {"insert", "reimburse", "query", "edit", "tags", "other"}
+# Latência de cada handler (e do ramo de intent) para o /stats e o /metrics
+router.message.middleware(HandlerTimingMiddleware())
+
+# Os serviços (registry, Gemini, journal) chegam em `container`, o workflow data
+# do Dispatcher criado no main.py: importar este módulo não abre conexões.
 
 @router.message(Command("start"))
-async def cmd_start(message: types.Message, state: FSMContext):
-    if message.from_user.id != MY_ID: return
+async def cmd_start(message: types.Message, state: FSMContext, container: ServiceContainer):
+    if not container.registry.is_authorized(message.from_user.id): return
     await state.clear()
     await message.answer(
         "💰 *TeleGrana Ativo!*\n\n"
@@ -24,67 +29,64 @@ async def cmd_start(message: types.Message, state: FSMContext):
         "💸 Gasto: \"Paguei 50 reais de uber com cartão de crédito\""
     )
 
+@router.message(Command("stats"))
+async def cmd_stats(message: types.Message, container: ServiceContainer):
+    """Latência por etapa (Gemini, Sheets, handlers). Só para o dono do bot."""
+    if not container.owner_id or str(message.from_user.id) != container.owner_id: return
+    cache = container.ai_service.response_cache.stats
+    await message.answer(
+        metrics.render_text()
+        + f"\n\n🧠 Cache da IA: {cache['hits']} acertos, {cache['misses']} falhas"
+    )
+
 @router.message(ExpenseState.AwaitingEdit)
-async def handle_edit(message: types.Message, state: FSMContext):
+async def handle_edit(message: types.Message, state: FSMContext, container: ServiceContainer):
     """
     Handler para quando o bot está esperando uma possível edição da última transação.
     """
-    if message.from_user.id != MY_ID: return
+    service = await container.user_service(message.from_user.id)
+    if service is None: return
     
     text = message.text.strip()
     
-    # 1. Detectar Intenção usando o Roteador
-    routing = await ai_service.detect_intent(text)
+    # 1. Detectar Intenção: um gasto/ganho simples é resolvido localmente, sem o Gemini
+    ai_service = container.ai_service
+    fast_result = container.fast_parser.parse(text, service.expense_tags, service.income_tags)
+    if fast_result:
+        routing = {"intent": "insert", "payload": fast_result}
+    else:
+        routing = await ai_service.detect_intent(text, service.expense_tags, service.income_tags, service.metodo_options)
     intent = routing.get("intent", "other")
 
     # Se a intenção não for 'edit', limpamos o estado e processamos como uma mensagem nova
     if intent != "edit":
         await state.clear()
-        await handle_message(message, state) # Reprocessa no fluxo principal
+        await handle_message(message, state, container, routing=routing) # Reprocessa no fluxo principal sem rotear de novo
         return
 
-    # 2. Se for 'edit', usamos o especialista em edição (parse_past_edit)
-    ai_result = await ai_service.parse_past_edit(text, service.tag_options, service.metodo_options)
+    # 2. Se for 'edit', usamos o payload do roteador (modo fused) ou o especialista em edição
+    ai_result = routing.get("payload") or await ai_service.parse_past_edit(text, service.tag_options, service.metodo_options)
 
     if ai_result and ai_result.get("is_past_edit"):
         updates = ai_result.get("updates", {})
         
         user_data = await state.get_data()
-        last_row = user_data.get("last_transaction_row")
+        # A última inserção pode ainda estar no journal (row_index provisório)
+        last_row = await service.resolve_row_index(user_data.get("last_transaction_row"))
 
         if not last_row:
             await message.answer("⚠️ Não encontrei a última transação para editar.")
             await state.clear()
             return
         
-        response_parts = ["✅ Transação anterior atualizada!"]
+        transaction = await service.get_transaction(last_row)
+        if not transaction:
+            await message.answer("⚠️ Não encontrei a última transação para editar.")
+            await state.clear()
+            return
         
-        if updates.get("tag"):
-            new_tag = str(updates["tag"]).capitalize()
-            service.add_category(new_tag)
-            service.update_expense_category(last_row, new_tag)
-            response_parts.append(f"🏷️ Tag: {new_tag}")
-            
-        if updates.get("payment_method"):
-            new_method = str(updates["payment_method"]).capitalize()
-            service.update_payment_method(last_row, new_method)
-            response_parts.append(f"💳 Método: {new_method}")
-            
-        if updates.get("amount") is not None:
-            # Precisamos manter o sinal original
-            all_rows = service.sheets.get_all_rows()
-            row_data = all_rows[last_row - 1]
-            old_val = service.get_expense_value(row_data)
-            
-            new_val_abs = abs(float(updates["amount"]))
-            new_val_signed = -new_val_abs if old_val < 0 else new_val_abs
-            service.update_expense_value(last_row, new_val_signed)
-            response_parts.append(f"💰 Valor: R$ {new_val_abs:.2f}")
-            
-        if updates.get("description"):
-            new_desc = str(updates["description"])
-            service.update_description(last_row, new_desc)
-            response_parts.append(f"📝 Descrição: {new_desc}")
+        response_parts = ["✅ Transação anterior atualizada!"]
+        response_parts += await apply_edit_updates(transaction, updates, service)
 
         if len(response_parts) == 1:
             await message.answer("❓ Não entendi o que você quer mudar. Tente algo como 'o valor é 50' ou 'a tag é Lazer'.")
@@ -94,12 +96,51 @@ async def handle_edit(message: types.Message, state: FSMContext):
     else:
         # Fallback caso a IA roteie para edit mas o especialista não extraia nada
         await state.clear()
-        await handle_message(message, state)
+        await handle_message(message, state, container)
+
+
+async def apply_edit_updates(transaction, updates, service):
+    """
+    Converte os updates da IA em um diff parcial da transação e grava tudo
+    em uma única chamada (batch_update). Retorna as linhas de resposta.
+    """
+    changes = {}
+    response_parts = []
+    # Escritas independentes (tag nova e a linha) rodam em paralelo no pool da planilha
+    writes = []
+
+    if updates.get("tag"):
+        new_tag = str(updates["tag"]).capitalize()
+        writes.append(service.add_category(new_tag))
+        changes["category"] = new_tag
+        response_parts.append(f"🏷️ Tag: {new_tag}")
+        
+    if updates.get("payment_method"):
+        new_method = str(updates["payment_method"]).capitalize()
+        changes["payment_method"] = new_method
+        response_parts.append(f"💳 Método: {new_method}")
+        
+    if updates.get("amount") is not None:
+        # Precisamos manter o sinal original
+        new_val_abs = abs(float(updates["amount"]))
+        changes["amount"] = -new_val_abs if transaction.amount < 0 else new_val_abs
+        response_parts.append(f"💰 Valor: R$ {new_val_abs:.2f}")
+        
+    if updates.get("description"):
+        new_desc = str(updates["description"])
+        changes["description"] = new_desc
+        response_parts.append(f"📝 Descrição: {new_desc}")
+
+    if changes:
+        writes.append(service.update_transaction(transaction.row_index, changes))
+    await asyncio.gather(*writes)
+    return response_parts
 
 
 @router.message(ExpenseState.AwaitingReimbursementChoice)
-async def handle_reimbursement_choice(message: types.Message, state: FSMContext):
-    if message.from_user.id != MY_ID: return
+async def handle_reimbursement_choice(message: types.Message, state: FSMContext, container: ServiceContainer):
+    service = await container.user_service(message.from_user.id)
+    if service is None: return
     
     text = message.text.strip()
     user_data = await state.get_data()
@@ -127,7 +168,7 @@ async def process_reimbursement(message, matches_data, choice_idx, valor_reembol
     transaction = Transaction.from_row(selected_data["row_data"], row_index=selected_data["row_index"])
     
     # Delega lógica para o serviço
-    result = service.process_reimbursement(
+    result = await service.process_reimbursement(
         transaction=transaction, 
         valor_reembolsado=valor_reembolsado
     )
@@ -151,21 +192,32 @@ async def process_reimbursement(message, matches_data, choice_idx, valor_reembol
     await message.answer(resposta)
 
 @router.message(StateFilter(None))
-async def handle_message(message: types.Message, state: FSMContext):
-    if message.from_user.id != MY_ID: return
+async def handle_message(message: types.Message, state: FSMContext, container: ServiceContainer, routing: dict = None):
+    service = await container.user_service(message.from_user.id)
+    if service is None: return
 
     await state.clear()
     text = message.text.strip()
+    ai_service = container.ai_service
     
-    # 1. Roteamento de Intenção (Fase 1)
-    routing = await ai_service.detect_intent(text)
+    # 1. Roteamento de Intenção (Fase 1) - pode já vir do handle_edit
+    if routing is None:
+        # Frases simples de gasto/ganho são resolvidas localmente, sem chamar o Gemini
+        fast_result = container.fast_parser.parse(text, service.expense_tags, service.income_tags)
+        if fast_result:
+            routing = {"intent": "insert", "payload": fast_result}
+    if routing is None:
+        routing = await ai_service.detect_intent(text, service.expense_tags, service.income_tags, service.metodo_options)
     intent = routing.get("intent", "other")
+    metrics.set_branch(intent if intent in INTENTS else "other")
+    # No modo fused o roteador já traz os dados extraídos
+    payload = routing.get("payload")
     
     # 2. Execução (Fase 2)
     
     # --- REEMBOLSO ---
     if intent == "reimburse":
-        reembolso_result = await ai_service.parse_reimbursement(text)
+        reembolso_result = payload or await ai_service.parse_reimbursement(text)
         if reembolso_result and reembolso_result.get("is_reimbursement"):
             valor_reembolsado = reembolso_result.get("valor_reembolsado")
             data_compra = reembolso_result.get("data_compra")
@@ -175,7 +227,7 @@ async def handle_message(message: types.Message, state: FSMContext):
                 await message.answer("⚠️ Não consegui identificar o valor do reembolso.")
                 return
             
-            matches = service.find_expense_by_date_and_desc(data_compra, descricao_compra)
+            matches = await service.find_expense_by_date_and_desc(data_compra, descricao_compra)
             if not matches:
                 await message.answer(f"⚠️ Não encontrei despesa de '{descricao_compra}'" + (f" em {data_compra}." if data_compra else "."))
                 return
@@ -200,7 +252,7 @@ async def handle_message(message: types.Message, state: FSMContext):
 
     # --- INSERÇÃO (GASTO/GANHO) ---
     elif intent == "insert":
-        ai_result = await ai_service.parse_expense(text, service.expense_tags, service.income_tags)
+        ai_result = payload or await ai_service.parse_expense(text, service.expense_tags, service.income_tags)
         if ai_result and ai_result.get("valor") is not None:
             valor = float(ai_result["valor"])
             tipo_operacao = "Gasto" if valor < 0 else "Entrada"
@@ -214,19 +266,20 @@ async def handle_message(message: types.Message, state: FSMContext):
                 "type": tipo_operacao
             }
             await state.update_data(temp_expense=current_data)
-            await check_missing_info(message, state)
+            await check_missing_info(message, state, service)
             return
 
     # --- CONSULTA (QUERY/SALDO) ---
     elif intent == "query":
-        query_result = await ai_service.parse_query_intent(text, service.metodo_options)
+        query_result = payload or await ai_service.parse_query_intent(text, service.metodo_options)
         if query_result and query_result.get("is_query"):
-            totals = service.calculate_totals(
+            totals = await service.calculate_totals(
                 start_date_str=query_result.get("start_date"),
                 end_date_str=query_result.get("end_date"),
                 query_type=query_result.get("query_type"),
                 exclude_methods=query_result.get("exclude_methods"),
-                include_methods=query_result.get("include_methods")
+                include_methods=query_result.get("include_methods"),
+                items_limit=5
             )
             
             period_lab = query_result.get("label") or "período"
@@ -269,7 +322,7 @@ async def handle_message(message: types.Message, state: FSMContext):
 
     # --- TAGS ---
     elif intent == "tags":
-        tag_result = await ai_service.parse_tag_intent(text)
+        tag_result = payload or await ai_service.parse_tag_intent(text)
         if tag_result and tag_result.get("action"):
             action = tag_result.get("action")
             if action == "list":
@@ -279,7 +332,7 @@ async def handle_message(message: types.Message, state: FSMContext):
             if action == "create":
                 new_tag = tag_result.get("tag_name")
                 if new_tag:
-                    if service.add_category(new_tag):
+                    if await service.add_category(new_tag):
                          await message.answer(f"✅ Tag *{new_tag}* criada com sucesso!")
                     else:
                          await message.answer(f"⚠️ A tag *{new_tag}* já existe.")
@@ -289,11 +342,11 @@ async def handle_message(message: types.Message, state: FSMContext):
 
     # --- EDIÇÃO ---
     elif intent == "edit":
-        edit_result = await ai_service.parse_past_edit(text, service.tag_options, service.metodo_options)
+        edit_result = payload or await ai_service.parse_past_edit(text, service.tag_options, service.metodo_options)
         if edit_result and edit_result.get("is_past_edit"):
             criteria = edit_result.get("search_criteria", {})
             updates = edit_result.get("updates", {})
-            matches = service.find_transaction(
+            matches = await service.find_transaction(
                 date_query=criteria.get("date"),
                 amount_query=criteria.get("amount"),
                 desc_query=criteria.get("description")
@@ -307,28 +360,8 @@ async def handle_message(message: types.Message, state: FSMContext):
                 return
             
             transaction = matches[0]
-            row_index = transaction.row_index
             response_parts = ["✅ Transação atualizada!"]
-            
-            if updates.get("tag"):
-                new_tag = str(updates["tag"]).capitalize()
-                service.add_category(new_tag)
-                service.update_expense_category(row_index, new_tag)
-                response_parts.append(f"🏷️ Tag: {new_tag}")
-            if updates.get("payment_method"):
-                new_method = str(updates["payment_method"]).capitalize()
-                service.update_payment_method(row_index, new_method)
-                response_parts.append(f"💳 Método: {new_method}")
-            if updates.get("amount") is not None:
-                old_val = transaction.amount
-                new_val_abs = abs(float(updates["amount"]))
-                new_val_signed = -new_val_abs if old_val < 0 else new_val_abs
-                service.update_expense_value(row_index, new_val_signed)
-                response_parts.append(f"💰 Valor: R$ {new_val_abs:.2f}")
-            if updates.get("description"):
-                new_desc = str(updates["description"])
-                service.update_description(row_index, new_desc)
-                response_parts.append(f"📝 Descrição: {new_desc}")
+            response_parts += await apply_edit_updates(transaction, updates, service)
                 
             await message.answer("\n".join(response_parts))
             return
@@ -342,8 +375,9 @@ async def handle_message(message: types.Message, state: FSMContext):
     )
 
 @router.message(ExpenseState.AwaitingMissingInfo)
-async def handle_missing_info_response(message: types.Message, state: FSMContext):
-    if message.from_user.id != MY_ID: return
+async def handle_missing_info_response(message: types.Message, state: FSMContext, container: ServiceContainer):
+    service = await container.user_service(message.from_user.id)
+    if service is None: return
     
     text = message.text.strip()
     user_data = await state.get_data()
@@ -360,7 +394,7 @@ async def handle_missing_info_response(message: types.Message, state: FSMContext
         clean_tag = text.title()
         # Se não existir, cria (ou avisa? MVP: Cria)
         if clean_tag not in service.tag_options:
-             service.add_category(clean_tag)
+             await service.add_category(clean_tag)
         temp_expense["tags"] = clean_tag
         
     elif missing_field == "metodo_pagamento":
@@ -376,9 +410,9 @@ async def handle_missing_info_response(message: types.Message, state: FSMContext
         
     # Salva atualização e verifica se falta mais algo
     await state.update_data(temp_expense=temp_expense)
-    await check_missing_info(message, state)
+    await check_missing_info(message, state, service)
 
-async def check_missing_info(message: types.Message, state: FSMContext):
+async def check_missing_info(message: types.Message, state: FSMContext, service):
     user_data = await state.get_data()
     data = user_data.get("temp_expense")
     
@@ -404,11 +438,11 @@ async def check_missing_info(message: types.Message, state: FSMContext):
         return
         
     # Se chegou aqui, tem tudo! Salva.
-    await final_save(message, state, data)
+    await final_save(message, state, data, service)
 
-async def final_save(message, state, data):
+async def final_save(message, state, data, service):
     # Delega salvamento ao TransactionService
-    result = service.create_transaction(
+    result = await service.create_transaction(
         valor=data["valor"],
         descricao=data["descricao"],
         tags=data["tags"],
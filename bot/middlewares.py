@@ -0,0 +1,126 @@
+import asyncio
+import contextlib
+import os
+import time
+import traceback
+from aiogram import BaseMiddleware
+from services.metrics import metrics
+
+
+class HandlerTimingMiddleware(BaseMiddleware):
+    """Mede cada handler de mensagem e registra em `handler_seconds`.
+
+    O rótulo `branch` vem de `metrics.set_branch` (ex: o intent escolhido em
+    handle_message); handlers que não definem ramo usam o próprio nome.
+    """
+
+    async def __call__(self, handler, event, data):
+        metrics.set_branch(None)
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            name = data["handler"].callback.__name__
+            metrics.observe(
+                "handler_seconds",
+                time.perf_counter() - start,
+                handler=name,
+                branch=metrics.current_branch() or name,
+            )
+
+
+class StartupTimingMiddleware(BaseMiddleware):
+    """Registra o tempo do início do processo até o primeiro update processado."""
+
+    def __init__(self, started_at):
+        # Instante do início (time.perf_counter) medido no main.py
+        self.started_at = started_at
+        self.reported = False
+
+    async def __call__(self, handler, event, data):
+        try:
+            return await handler(event, data)
+        finally:
+            if not self.reported:
+                self.reported = True
+                elapsed = time.perf_counter() - self.started_at
+                metrics.observe("startup_to_first_update_seconds", elapsed)
+                print(f"⏱️ Primeiro update processado {elapsed:.2f}s após o início")
+
+
+class UpdateScheduler(BaseMiddleware):
+    """Ordem por conversa, paralelismo entre conversas e fila limitada.
+
+    Updates da mesma conversa são processados um de cada vez, na ordem de chegada
+    (um "Uber 25" seguido de "o valor é 30" nunca inverte); conversas diferentes
+    rodam em paralelo, até `max_concurrency` ao mesmo tempo.
+
+    Backpressure: quem entrega o update (o long polling ou a requisição do
+    webhook) espera enquanto houver `max_pending` updates na fila ou em
+    processamento. O processamento em si segue em uma task própria, então a
+    entrega volta assim que o update é aceito.
+
+    O FSMContextMiddleware do aiogram roda antes deste e lê o estado da conversa
+    na chegada do update. Com a mensagem anterior ainda em processamento, esse
+    estado está velho, então ele é lido de novo quando chega a vez do update.
+    """
+
+    def __init__(self, max_concurrency=16, max_pending=256):
+        self.max_pending = max_pending
+        self._slots = asyncio.Semaphore(max_pending)
+        self._running = asyncio.Semaphore(max_concurrency)
+        # chat_id -> [lock, quantos updates da conversa estão na fila]
+        self._chats = {}
+        self._tasks = set()
+
+    @classmethod
+    def from_env(cls):
+        # WEBHOOK_MAX_CONCURRENCY é o nome antigo, de quando o limite valia só para o webhook
+        max_concurrency = os.getenv("MAX_CONCURRENT_UPDATES") or os.getenv("WEBHOOK_MAX_CONCURRENCY", "16")
+        return cls(int(max_concurrency), int(os.getenv("MAX_PENDING_UPDATES", "256")))
+
+    @property
+    def pending(self):
+        return len(self._tasks)
+
+    async def __call__(self, handler, event, data):
+        start = time.perf_counter()
+        await self._slots.acquire()
+        metrics.observe("update_admission_seconds", time.perf_counter() - start)
+
+        chat = data.get("event_chat") or data.get("event_from_user")
+        key = chat.id if chat else None
+        entry = None
+        if key is not None:
+            entry = self._chats.setdefault(key, [asyncio.Lock(), 0])
+            entry[1] += 1
+
+        task = asyncio.create_task(self._process(handler, event, data, key, entry))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _process(self, handler, event, data, key, entry):
+        queued_at = time.perf_counter()
+        try:
+            # Updates sem conversa não têm ordem a preservar
+            async with entry[0] if entry else contextlib.nullcontext(), self._running:
+                metrics.observe("update_queue_seconds", time.perf_counter() - queued_at)
+                state = data.get("state")
+                if state is not None:
+                    # Estado deixado pelo update anterior da mesma conversa (usado pelos StateFilter)
+                    data["raw_state"] = await state.get_state()
+                await handler(event, data)
+        except Exception as e:
+            print(f"❌ Erro ao processar update {getattr(event, 'update_id', '?')}: {e!r}")
+            traceback.print_exc()
+        finally:
+            if entry:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._chats[key]
+            self._slots.release()
+
+    async def drain(self):
+        """Espera todos os updates aceitos terminarem (usado no desligamento e nos testes)."""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
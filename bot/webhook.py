@@ -0,0 +1,66 @@
+import asyncio
+import os
+from aiohttp import web
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from services.metrics import metrics
+
+
+def build_webhook_app(dp, bot, path="/webhook", secret_token=None):
+    """Cria a aplicação aiohttp que recebe os updates do Telegram em `path`.
+
+    Requisições sem o header X-Telegram-Bot-Api-Secret-Token correto são recusadas (401).
+    A requisição espera o UpdateScheduler aceitar o update (que então segue em
+    background): com a fila cheia, o Telegram segura as próximas entregas.
+    """
+    app = web.Application()
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=secret_token,
+        handle_in_background=False,
+    ).register(app, path=path)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def run_webhook(dp, bot):
+    """Registra o webhook no Telegram e serve os updates até o processo ser encerrado."""
+    base_url = os.getenv('WEBHOOK_URL')
+    if not base_url:
+        raise ValueError("❌ WEBHOOK_URL não encontrado no .env (obrigatório com BOT_MODE=webhook)!")
+    path = os.getenv('WEBHOOK_PATH', '/webhook')
+    secret_token = os.getenv('WEBHOOK_SECRET')
+    host = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+    port = int(os.getenv('WEBHOOK_PORT', '8080'))
+
+    app = build_webhook_app(dp, bot, path, secret_token)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+
+    await bot.set_webhook(base_url.rstrip('/') + path, secret_token=secret_token)
+    print(f"🌐 Webhook ativo em {host}:{port}{path}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+async def metrics_endpoint(request):
+    """GET /metrics no formato texto do Prometheus."""
+    return web.Response(text=metrics.render_prometheus(), content_type="text/plain", charset="utf-8")
+
+
+def build_metrics_app():
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_endpoint)
+    return app
+
+
+async def start_metrics_server(host, port):
+    """Sobe o endpoint /metrics em uma porta própria (funciona com polling ou webhook)."""
+    runner = web.AppRunner(build_metrics_app())
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    print(f"📈 Métricas em http://{host}:{port}/metrics")
+    return runner
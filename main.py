@@ -1,3 +1,8 @@
+import time
+
+# Início do processo, para medir o tempo até o primeiro update processado
+STARTED_AT = time.perf_counter()
+
 import asyncio
 import os
 from dotenv import load_dotenv
@@ -7,28 +12,73 @@ load_dotenv()
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from bot.handlers import router
-from services.transaction_service import TransactionService 
+from bot.middlewares import StartupTimingMiddleware, UpdateScheduler
+from services.container import ServiceContainer
+from services.journal import JournalFlusher
+from bot.webhook import run_webhook, start_metrics_server
 
 async def main():    
-    service = TransactionService()
-    
+    # Um único container com todos os serviços, entregue aos handlers pelo Dispatcher
+    container = ServiceContainer()
+    registry = container.registry
+    # O cliente do Gemini não conecta na criação; criar aqui só valida a GEMINI_API_KEY cedo
+    container.ai_service
+
+    # Backend SQLite: espelha opcionalmente as transações na planilha para consulta.
+    # Ligado antes do warm: cada banco aberto (no warm ou depois) ganha o seu espelho.
+    if os.getenv('SQLITE_MIRROR_TO_SHEETS', '0') == '1':
+        container.enable_mirror()
+
     # ---------------------------------------------------------
-    # Inicialização Inteligente: Verifica se a planilha está vazia
+    # Inicialização Inteligente: Verifica se cada planilha está vazia
     # Se estiver vazia, cria headers e validações.
     # Se não, mantém como está.
+    # As planilhas que cabem no cache de usuários são abertas e carregadas em paralelo.
+    # WARM_ON_STARTUP=0 deixa tudo para a primeira mensagem de cada usuário.
     # ---------------------------------------------------------
-    print(f"--- {service.initialize_sheet()} ---") 
+    if os.getenv('WARM_ON_STARTUP', '1') == '1':
+        await container.warm()
+    print(f"👥 {len(registry.user_sheets)} usuário(s) autorizado(s)")
     
     # Inicializa serviços
     bot = Bot(
         token=os.getenv('TELEGRAM_TOKEN'),
         default=DefaultBotProperties(parse_mode="Markdown")
     )
-    dp = Dispatcher()
+    dp = Dispatcher(container=container)
+    # Ordem por conversa, conversas em paralelo e fila limitada (MAX_CONCURRENT_UPDATES/MAX_PENDING_UPDATES).
+    # Registrado antes dos outros: o restante da cadeia roda na task de cada update.
+    scheduler = UpdateScheduler.from_env()
+    dp.update.outer_middleware(scheduler)
+    dp.update.outer_middleware(StartupTimingMiddleware(STARTED_AT))
     dp.include_router(router)
 
-    print("🚀 Bot TeleGrana rodando com sucesso!")
-    await dp.start_polling(bot)
+    # Write-behind: envia em background as inserções registradas no journal local
+    journal = container.journal
+    flusher = None
+    if journal and os.getenv('STORAGE_BACKEND', 'sheets').lower() == 'sheets':
+        flusher = JournalFlusher(journal, lambda sheet_id: registry.get_by_sheet(sheet_id).sheets)
+        flusher.start()
+
+    # METRICS_PORT: expõe /metrics (Prometheus) com a latência de cada etapa
+    if os.getenv('METRICS_PORT'):
+        await start_metrics_server(os.getenv('METRICS_HOST', '0.0.0.0'), int(os.getenv('METRICS_PORT')))
+
+    print(f"🚀 Bot TeleGrana rodando com sucesso! ({time.perf_counter() - STARTED_AT:.2f}s)")
+    try:
+        # BOT_MODE=webhook: o Telegram envia os updates por HTTP em vez do long polling
+        if os.getenv('BOT_MODE', 'polling') == 'webhook':
+            await run_webhook(dp, bot)
+        else:
+            await bot.delete_webhook()
+            # O scheduler cria a task de cada update; sem handle_as_tasks o polling
+            # espera uma vaga na fila antes de buscar mais updates (backpressure)
+            await dp.start_polling(bot, handle_as_tasks=False)
+    finally:
+        await scheduler.drain()
+        # Depois do drain: as inserções dos últimos updates também vão para a planilha
+        if flusher:
+            await flusher.stop()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
@@ -1,8 +1,62 @@
+import sys
 from dataclasses import dataclass
-from typing import Optional, List
-from datetime import datetime
+from typing import Optional, List, Tuple
+from datetime import date
 
-@dataclass
+# Spreadsheet column (1-based) of each Transaction field
+COLUMN_INDEX = {
+    "date": 1,
+    "amount": 2,
+    "reimbursed_amount": 3,
+    "description": 4,
+    "category": 5,
+    "payment_method": 6,
+}
+
+def parse_amount(value) -> float:
+    """Parses a spreadsheet number that may use a comma as decimal separator."""
+    if not value:
+        return 0.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return float(value.replace(',', '.'))
+    except (ValueError, AttributeError):
+        return 0.0
+
+def parse_date_cell(value) -> Tuple[Optional[int], Optional[str]]:
+    """Splits a 'dd/mm/yyyy[ HH:MM]' cell into (proleptic ordinal, time), or (None, None) if invalid.
+
+    Hand-rolled instead of strptime: it runs once per cached row.
+    """
+    parts = str(value).split(None, 1)
+    if not parts:
+        return None, None
+    pieces = parts[0].split('/')
+    if len(pieces) != 3:
+        return None, None
+    day, month, year = pieces
+    if not (day.isdigit() and month.isdigit() and year.isdigit()):
+        return None, None
+    try:
+        ordinal = date(int(year), int(month), int(day)).toordinal()
+    except ValueError:
+        return None, None
+    return ordinal, (parts[1].strip() or None) if len(parts) > 1 else None
+
+def parse_date_ordinal(value) -> Optional[int]:
+    """Returns the proleptic ordinal of a 'dd/mm/yyyy[ HH:MM]' cell, or None if invalid."""
+    return parse_date_cell(value)[0]
+
+def _intern(value) -> Optional[str]:
+    # Tags and payment methods repeat on every row: share one string object each
+    return sys.intern(value) if value else None
+
+@dataclass(slots=True)
 class Transaction:
     date: str
     amount: float
@@ -11,33 +65,30 @@ class Transaction:
     category: Optional[str]
     payment_method: Optional[str]
     row_index: Optional[int] = None # To track where it is in the sheet
+    date_ordinal: Optional[int] = None # Parsed once from `date`
+    time: Optional[str] = None # 'HH:MM' part of `date`, if any
+
+    def __post_init__(self):
+        if self.date_ordinal is None and self.date:
+            self.date_ordinal, self.time = parse_date_cell(self.date)
 
     @classmethod
     def from_row(cls, row: List[str], row_index: int = None) -> 'Transaction':
-        """Creates a Transaction object from a spreadsheet row."""
-        # Ensure row has enough columns, pad with empty strings if not
-        if len(row) < 6:
-            row = row + [""] * (6 - len(row))
-
-        try:
-            amount = float(str(row[1]).replace(',', '.')) if row[1] else 0.0
-        except ValueError:
-            amount = 0.0
-
-        try:
-            # Reimbursed amount can be empty or '0.00' or similar
-            reimbursed_amount = float(str(row[2]).replace(',', '.')) if row[2] else 0.0
-        except ValueError:
-            reimbursed_amount = 0.0
-
+        """Creates a Transaction object from a spreadsheet row (short rows are not copied or padded)."""
+        n = len(row)
+        date_cell = row[0] if n > 0 else ""
+        date_ordinal, time = parse_date_cell(date_cell)
         return cls(
-            date=row[0],
-            amount=amount,
-            reimbursed_amount=reimbursed_amount,
-            description=row[3] if row[3] else None,
-            category=row[4] if row[4] else None,
-            payment_method=row[5] if row[5] else None,
-            row_index=row_index
+            date_cell,
+            parse_amount(row[1]) if n > 1 else 0.0,
+            # Reimbursed amount can be empty or '0.00' or similar
+            parse_amount(row[2]) if n > 2 else 0.0,
+            (row[3] or None) if n > 3 else None,
+            _intern(row[4]) if n > 4 else None,
+            _intern(row[5]) if n > 5 else None,
+            row_index,
+            date_ordinal,
+            time,
         )
 
     def to_row(self) -> List[str]:
@@ -1,21 +1,29 @@
 import os
 import json
+import copy
+import asyncio
+import time
 from datetime import datetime
 from google import genai
 from dotenv import load_dotenv
+from services.response_cache import ResponseCache
+from services.circuit_breaker import HALF_OPEN, CircuitBreaker, parse_retry_after
+from services.metrics import metrics
+from utils.text import normalize_text
 from utils.prompts import (
     get_expense_classification_prompt,
     get_reimbursement_prompt,
     get_past_edit_prompt,
     get_tag_intent_prompt,
     get_query_intent_prompt,
-    get_intent_router_prompt
+    get_intent_router_prompt,
+    get_fused_router_prompt
 )
 
 load_dotenv()
 
 class AIService:
-    def __init__(self):
+    def __init__(self, fused_routing=None):
         # Pega a chave do seu .env
         api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
@@ -35,51 +43,225 @@ class AIService:
             'gemini-2.0-flash-lite'       # 6º: Opção de baixo custo da geração anterior
         ]
 
+        # Saúde de cada modelo: quem estourou a quota fica em cooldown e é pulado
+        cooldown = int(os.getenv("AI_MODEL_COOLDOWN", "60"))
+        self.breakers = {model: CircuitBreaker(cooldown=cooldown) for model in self.models_to_try}
+
+        # Modo "fused": uma única chamada devolve o intent e os dados extraídos
+        if fused_routing is None:
+            fused_routing = os.getenv("AI_FUSED_ROUTING", "0") == "1"
+        self.fused_routing = fused_routing
+
+        # Cache de respostas para detect_intent, parse_query_intent e parse_tag_intent
+        self.response_cache = ResponseCache(
+            max_size=int(os.getenv("AI_CACHE_SIZE", "256")),
+            ttl=int(os.getenv("AI_CACHE_TTL", "3600")),
+            path=os.getenv("AI_CACHE_PATH") or None,
+            save_delay=float(os.getenv("AI_CACHE_SAVE_SECONDS", "5"))
+        )
+
+        # Limite de chamadas simultâneas ao Gemini (várias conversas em paralelo)
+        self.semaphore = asyncio.Semaphore(int(os.getenv("AI_MAX_CONCURRENCY", "4")))
+
+        # Context caching: as instruções fixas de cada prompt ficam no cache do Gemini
+        self.context_cache = os.getenv("AI_CONTEXT_CACHE", "0") == "1"
+        self.context_cache_ttl = int(os.getenv("AI_CONTEXT_CACHE_TTL", "3600"))
+        # (modelo, tipo do prompt) -> (nome do cached content, expira em) ou None se não suportado
+        self._cached_contents = {}
+
+    def _cache_key(self, kind, text, *context):
+        """Chave do cache: tipo de chamada, texto normalizado, data atual e listas do prompt."""
+        normalized = " ".join(normalize_text(text).split()).strip(" ?!.")
+        current_date = datetime.now().strftime('%d/%m/%Y')
+        return json.dumps([kind, normalized, current_date, *context], ensure_ascii=False)
+
+    def _cache_get(self, key):
+        cached = self.response_cache.get(key)
+        # Cópia para que o chamador não altere a entrada em cache
+        return copy.deepcopy(cached) if cached is not None else None
+
+    def _models_available(self):
+        """Modelos na ordem de preferência, pulando os que estão com o circuito aberto."""
+        attempted = False
+        for model_name in self.models_to_try:
+            if self.breakers[model_name].allow_request():
+                attempted = True
+                yield model_name
+        if not attempted:
+            # Todos em cooldown: testa o que volta primeiro em vez de desistir
+            model_name = min(self.models_to_try, key=lambda m: self.breakers[m].opened_until)
+            self.breakers[model_name].force_probe()
+            yield model_name
+
+    async def _cached_content(self, model_name, prompt):
+        """Nome do cached content com as instruções fixas do prompt, criado sob demanda.
+
+        Retorna None se o cache estiver desligado ou não for aceito (ex: instruções
+        abaixo do mínimo de tokens do modelo); nesse caso elas vão como system_instruction.
+        """
+        if not self.context_cache:
+            return None
+        key = (model_name, prompt.kind)
+        entry = self._cached_contents.get(key, ())
+        if entry is None:
+            return None
+        # Renova um minuto antes de expirar
+        if entry and entry[1] - 60 > time.monotonic():
+            return entry[0]
+        try:
+            cached = await self.client.aio.caches.create(
+                model=model_name,
+                config={
+                    "system_instruction": prompt.static,
+                    "display_name": f"telegrana-{prompt.kind}",
+                    "ttl": f"{self.context_cache_ttl}s"
+                }
+            )
+        except Exception as e:
+            print(f"⚠️ Context cache indisponível para {model_name}/{prompt.kind}: {e}")
+            # Quota é passageira; outros erros (ex: prompt pequeno demais) desligam o cache deste par
+            if "429" not in str(e):
+                self._cached_contents[key] = None
+            return None
+        self._cached_contents[key] = (cached.name, time.monotonic() + self.context_cache_ttl)
+        return cached.name
+
+    @staticmethod
+    def _record_usage(response, kind):
+        """Tokens de entrada (e quantos vieram do cache) e de saída por tipo de prompt."""
+        usage = getattr(response, "usage_metadata", None)
+        if usage is None:
+            return
+        for token_type, count in (
+            ("prompt", usage.prompt_token_count),
+            ("cached", usage.cached_content_token_count),
+            ("output", usage.candidates_token_count),
+        ):
+            if count:
+                metrics.inc("gemini_tokens_total", count, kind=kind, type=token_type)
+
     async def _generate_content_with_fallback(self, prompt):
-        """Tenta gerar conteúdo com fallback usando o novo SDK v1."""
+        """Tenta gerar conteúdo com fallback usando o novo SDK v1.
+
+        `prompt` é um utils.prompts.Prompt: as instruções fixas vão como
+        system_instruction (ou cached content) e só a parte dinâmica como conteúdo.
+        """
+        with metrics.timer("gemini_request_seconds", kind=prompt.kind):
+            return await self._generate_with_models(prompt)
+
+    async def _generate_with_models(self, prompt):
+        kind = prompt.kind
         last_error = None
-        for model_name in self.models_to_try:
+        for attempt, model_name in enumerate(self._models_available()):
+            breaker = self.breakers[model_name]
+            # Esta chamada é a de teste do circuito meio-aberto
+            probing = breaker.state == HALF_OPEN
+            if attempt:
+                metrics.inc("gemini_fallbacks_total", kind=kind)
+            start = queued = time.perf_counter()
             try:
-                # No novo SDK, usamos o client.models.generate_content
-                response = self.client.models.generate_content(
-                    model=model_name,
-                    contents=prompt,
-                    config={
+                # Cliente assíncrono (client.aio) para não travar o event loop do aiogram
+                async with self.semaphore:
+                    start = time.perf_counter()
+                    metrics.observe("gemini_queue_seconds", start - queued, kind=kind)
+                    config = {
                         "response_mime_type": "application/json",
                         "max_output_tokens": 500,
                         "temperature": 0.1
                     }
-                )
+                    cached_content = await self._cached_content(model_name, prompt)
+                    if cached_content:
+                        config["cached_content"] = cached_content
+                    else:
+                        config["system_instruction"] = prompt.static
+                    response = await self.client.aio.models.generate_content(
+                        model=model_name,
+                        contents=prompt.dynamic,
+                        config=config
+                    )
+                breaker.record_success()
+                self._record_usage(response, kind)
+                metrics.observe("gemini_call_seconds", time.perf_counter() - start, model=model_name, kind=kind, outcome="ok")
                 return response.text
             except Exception as e:
                 last_error = e
                 erro_str = str(e).lower()
-                if "429" in erro_str or "quota" in erro_str:
-                    print(f"⚠️ Quota excedida para o modelo {model_name}. Tentando próximo...")
+                quota_error = "429" in erro_str or "quota" in erro_str
+                metrics.observe("gemini_call_seconds", time.perf_counter() - start, model=model_name, kind=kind,
+                                outcome="quota" if quota_error else "error")
+                if quota_error:
+                    breaker.record_quota_error(parse_retry_after(e))
+                    print(f"⚠️ Quota excedida para o modelo {model_name}. Em cooldown até nova tentativa; tentando próximo...")
                     continue
                 else:
                     # Erros que não são de quota a gente interrompe
+                    breaker.record_other_error()
                     print(f"❌ Erro no modelo {model_name}: {e}")
                     break
+            finally:
+                # CancelledError não passa pelo except: sem isso o circuito nunca mais testaria
+                if probing:
+                    breaker.release_probe()
         
         # Se chegou aqui, todos falharam ou houve um erro crítico
         if last_error:
             print(f"🚨 Todos os modelos falharam. Último erro: {last_error}")
         return None
 
-    async def detect_intent(self, text: str):
-        """Identifica a intenção principal do usuário (Roteamento)."""
+    async def detect_intent(self, text: str, expense_tags: list = None, income_tags: list = None, metodo_options: list = None):
+        """
+        Identifica a intenção principal do usuário (Roteamento).
+        No modo fused, retorna também "payload" com os mesmos dados que o
+        especialista do intent retornaria, evitando uma segunda chamada.
+        """
+        if self.fused_routing:
+            cache_key = self._cache_key("intent_fused", text, expense_tags or [], income_tags or [], metodo_options or [])
+        else:
+            cache_key = self._cache_key("intent", text)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached
+
+        if self.fused_routing:
+            result = await self._detect_intent_fused(text, expense_tags or [], income_tags or [], metodo_options or [])
+        else:
+            result = await self._detect_intent_simple(text)
+        if result is None:
+            return {"intent": "other"}
+        self.response_cache.set(cache_key, result)
+        return copy.deepcopy(result)
+
+    async def _detect_intent_simple(self, text):
         prompt = get_intent_router_prompt(text)
         try:
             response_text = await self._generate_content_with_fallback(prompt)
             if not response_text:
-                return {"intent": "other"}
+                return None
             
             clean_text = response_text.replace("```json", "").replace("```", "").strip()
             return json.loads(clean_text)
         except Exception as e:
             print(f"Erro ao detectar intenção: {e}")
-            return {"intent": "other"}
+            return None
+
+    async def _detect_intent_fused(self, text, expense_tags, income_tags, metodo_options):
+        current_date = datetime.now().strftime('%d/%m/%Y')
+        prompt = get_fused_router_prompt(text, expense_tags, income_tags, metodo_options, current_date)
+        try:
+            response_text = await self._generate_content_with_fallback(prompt)
+            if not response_text:
+                return None
+
+            clean_text = response_text.replace("```json", "").replace("```", "").strip()
+            result = json.loads(clean_text)
+            routing = {"intent": result.get("intent", "other")}
+            # Payload inválido: o handler cai no especialista normalmente
+            if isinstance(result.get("data"), dict) and result["data"]:
+                routing["payload"] = result["data"]
+            return routing
+        except Exception as e:
+            print(f"Erro ao detectar intenção (fused): {e}")
+            return None
 
     async def parse_expense(self, text: str, expense_tags: list, income_tags: list):
         current_date = datetime.now().strftime('%d/%m/%Y')
@@ -134,13 +316,20 @@ class AIService:
         """
         Analisa se o usuário quer gerenciar tags (criar ou listar).
         """
+        cache_key = self._cache_key("tags", text)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached
+
         prompt = get_tag_intent_prompt(text)
         try:
             response_text = await self._generate_content_with_fallback(prompt)
             if not response_text:
                 return None
             clean_text = response_text.replace("```json", "").replace("```", "").strip()
-            return json.loads(clean_text)
+            result = json.loads(clean_text)
+            self.response_cache.set(cache_key, result)
+            return copy.deepcopy(result)
         except Exception as e:
             return None
 
@@ -148,6 +337,11 @@ class AIService:
         """
         Detecta se o usuário está fazendo uma pergunta sobre gastos/ganhos.
         """
+        cache_key = self._cache_key("query", text, metodo_options)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached
+
         current_date = datetime.now().strftime('%d/%m/%Y')
         prompt = get_query_intent_prompt(text, current_date, metodo_options)
         try:
@@ -155,7 +349,9 @@ class AIService:
             if not response_text:
                 return None
             clean_text = response_text.replace("```json", "").replace("```", "").strip()
-            return json.loads(clean_text)
+            result = json.loads(clean_text)
+            self.response_cache.set(cache_key, result)
+            return copy.deepcopy(result)
         except Exception as e:
             print(f"Erro ao processar JSON de consulta: {e}")
             return None
\ No newline at end of file
@@ -0,0 +1,166 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from services.metrics import metrics
+
+
+def create_sheets_executor(max_workers=None):
+    """Pool dedicado às chamadas da planilha (SHEETS_MAX_WORKERS threads, padrão 8).
+
+    Limitado de propósito: o gspread abre uma conexão HTTP por chamada em andamento
+    e a cota da API do Sheets é por minuto, então mais threads só geram 429.
+    """
+    max_workers = max_workers or int(os.getenv("SHEETS_MAX_WORKERS", "8"))
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sheets")
+
+
+class RowLocks:
+    """Um asyncio.Lock por linha de planilha, criado sob demanda.
+
+    Serializa as escritas na mesma linha (ex: um reembolso e uma edição do mesmo
+    gasto vindos de conversas diferentes) sem segurar escritas em outras linhas.
+    Locks sem ninguém esperando são descartados ao serem liberados.
+    """
+
+    def __init__(self):
+        # (sheet_id, linha) -> [lock, quantos seguram ou esperam]
+        self._locks = {}
+
+    @asynccontextmanager
+    async def hold(self, sheet_id, row):
+        key = (sheet_id, row)
+        entry = self._locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+    def __len__(self):
+        return len(self._locks)
+
+
+class AsyncTransactionService:
+    """Fachada async do TransactionService.
+
+    Cada método roda o equivalente síncrono no pool de threads da planilha, então
+    uma escrita lenta no Sheets não trava o event loop: as outras conversas
+    continuam sendo respondidas e chamadas independentes podem se sobrepor.
+    As listas de tags e métodos já ficam em memória e são lidas direto.
+
+    Mutações de uma linha existente (e o registro de tags) passam por `row_locks`,
+    compartilhado entre todos os serviços da mesma planilha.
+    """
+
+    def __init__(self, service, executor, row_locks=None):
+        self.service = service
+        self.executor = executor
+        self.row_locks = row_locks or RowLocks()
+
+    async def _run(self, method, *args, **kwargs):
+        submitted = time.perf_counter()
+
+        def call():
+            # Tempo esperando uma thread livre do pool
+            metrics.observe("sheets_queue_seconds", time.perf_counter() - submitted)
+            return getattr(self.service, method)(*args, **kwargs)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, call)
+
+    def _row_lock(self, row):
+        return self.row_locks.hold(self.service.sheets.sheet_id, row)
+
+    async def _real_row(self, row_index):
+        # Linha provisória (journal): envia a pendência e usa a linha real, inclusive para o lock
+        if row_index is not None and row_index < 0:
+            return await self._run("resolve_row_index", row_index)
+        return row_index
+
+    @property
+    def sheets(self):
+        return self.service.sheets
+
+    @property
+    def tag_options(self):
+        return self.service.tag_options
+
+    @property
+    def metodo_options(self):
+        return self.service.metodo_options
+
+    @property
+    def expense_tags(self):
+        return self.service.expense_tags
+
+    @property
+    def income_tags(self):
+        return self.service.income_tags
+
+    async def initialize_sheet(self):
+        return await self._run("initialize_sheet")
+
+    async def refresh_ledger(self):
+        return await self._run("refresh_ledger")
+
+    async def add_category(self, category):
+        # Duas conversas criando a mesma tag não podem duplicá-la na aba Config
+        async with self._row_lock("tags"):
+            return await self._run("add_category", category)
+
+    async def find_expense_by_date_and_desc(self, data_compra, descricao_compra):
+        return await self._run("find_expense_by_date_and_desc", data_compra, descricao_compra)
+
+    async def find_transaction(self, date_query=None, amount_query=None, desc_query=None):
+        return await self._run("find_transaction", date_query=date_query, amount_query=amount_query, desc_query=desc_query)
+
+    async def get_expense_value(self, row_data):
+        return await self._run("get_expense_value", row_data)
+
+    async def process_reimbursement(self, transaction, valor_reembolsado):
+        transaction.row_index = await self._real_row(transaction.row_index)
+        async with self._row_lock(transaction.row_index):
+            # O reembolso é calculado sobre o valor atual: a linha pode ter sido
+            # editada depois que as opções foram mostradas ao usuário
+            latest = await self._run("get_transaction", transaction.row_index)
+            return await self._run("process_reimbursement", latest or transaction, valor_reembolsado)
+
+    async def create_transaction(self, valor, descricao, tags, metodo, data=None):
+        return await self._run("create_transaction", valor, descricao, tags, metodo, data=data)
+
+    async def calculate_totals(self, start_date_str=None, end_date_str=None, query_type=None, exclude_methods=None, include_methods=None, items_limit=None):
+        return await self._run(
+            "calculate_totals",
+            start_date_str=start_date_str,
+            end_date_str=end_date_str,
+            query_type=query_type,
+            exclude_methods=exclude_methods,
+            include_methods=include_methods,
+            items_limit=items_limit,
+        )
+
+    async def resolve_row_index(self, row_index):
+        return await self._run("resolve_row_index", row_index)
+
+    async def get_transaction(self, row_index):
+        return await self._run("get_transaction", row_index)
+
+    async def update_transaction(self, row_index, changes):
+        row_index = await self._real_row(row_index)
+        async with self._row_lock(row_index):
+            return await self._run("update_transaction", row_index, changes)
+
+    async def _update_row(self, method, row, val):
+        row = await self._real_row(row)
+        async with self._row_lock(row):
+            return await self._run(method, row, val)
+
+    async def update_expense_category(self, row, val): return await self._update_row("update_expense_category", row, val)
+    async def update_expense_value(self, row, val): return await self._update_row("update_expense_value", row, val)
+    async def update_description(self, row, val): return await self._update_row("update_description", row, val)
+    async def update_payment_method(self, row, val): return await self._update_row("update_payment_method", row, val)
@@ -0,0 +1,71 @@
+import re
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Ex: "Please retry in 23.5s." ou "'retryDelay': '23s'"
+_RETRY_RE = re.compile(r"retry(?:delay)?['\"]?\s*(?:in|:)?\s*['\"]?(\d+(?:\.\d+)?)s", re.IGNORECASE)
+
+
+def parse_retry_after(error):
+    """Extrai o tempo de espera sugerido pela API (em segundos) da mensagem de erro."""
+    match = _RETRY_RE.search(str(error))
+    return float(match.group(1)) if match else None
+
+
+class CircuitBreaker:
+    """Estado de saúde de um modelo do Gemini.
+
+    - closed: modelo saudável, recebe chamadas.
+    - open: quota estourada; ignorado até o fim do cooldown.
+    - half_open: cooldown acabou; uma única chamada de teste é liberada.
+    """
+
+    def __init__(self, cooldown=60, max_cooldown=900):
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_until = 0.0
+        self._probing = False
+
+    def allow_request(self, now=None):
+        now = time.monotonic() if now is None else now
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and now >= self.opened_until:
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def force_probe(self):
+        """Libera uma chamada mesmo em cooldown (todos os modelos estão abertos)."""
+        self.state = HALF_OPEN
+        self._probing = True
+
+    def release_probe(self):
+        """Encerra a chamada de teste sem resultado (ex: cancelada), liberando a próxima."""
+        self._probing = False
+
+    def record_success(self):
+        self.state = CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def record_quota_error(self, retry_after=None, now=None):
+        """Abre o circuito. Sem retry-after, o cooldown dobra a cada falha seguida."""
+        now = time.monotonic() if now is None else now
+        self.failures += 1
+        if retry_after is None:
+            retry_after = min(self.cooldown * 2 ** (self.failures - 1), self.max_cooldown)
+        self.state = OPEN
+        self.opened_until = now + retry_after
+        self._probing = False
+
+    def record_other_error(self):
+        """Erros que não são de quota não abrem o circuito, só liberam a chamada de teste."""
+        self._probing = False
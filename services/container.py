@@ -0,0 +1,141 @@
+import asyncio
+import os
+import time
+from functools import cached_property
+from services.ai_handler import AIService
+from services.async_transaction_service import AsyncTransactionService, RowLocks, create_sheets_executor
+from services.fast_parser import FastExpenseParser
+from services.journal import TransactionJournal
+from services.sqlite_storage import SheetsMirror
+from services.storage import check_storage_config, create_storage
+from services.transaction_service import TransactionService
+from services.user_registry import UserServiceRegistry
+
+
+class ServiceContainer:
+    """Todos os serviços do bot, criados uma única vez e só quando usados.
+
+    Importar os handlers não abre conexão nenhuma: o cliente do Gemini, o journal
+    e cada planilha nascem no primeiro acesso. O container chega aos handlers
+    como workflow data do Dispatcher (`Dispatcher(container=...)`).
+    """
+
+    # Loop onde rodam os espelhos SQLite -> Sheets (ver enable_mirror)
+    _mirror_loop = None
+
+    def __init__(self, registry=None, ai_service=None, journal=None, fast_parser=None, owner_id=None):
+        # Permite injetar dependências prontas (testes, benchmarks)
+        if registry is not None:
+            self.registry = registry
+        if ai_service is not None:
+            self.ai_service = ai_service
+        if journal is not None:
+            self.journal = journal
+        if fast_parser is not None:
+            self.fast_parser = fast_parser
+        # Dono do bot: único usuário que pode ver o /stats
+        self.owner_id = str(owner_id) if owner_id else (os.getenv("OWNER_USER_ID") or os.getenv("MY_USER_ID"))
+
+    @cached_property
+    def journal(self):
+        return TransactionJournal.from_env()
+
+    @cached_property
+    def registry(self):
+        # Usuários autorizados -> serviço da planilha de cada um (LRU, ver USER_SHEETS)
+        registry = UserServiceRegistry.from_env(self.open_user_service)
+        check_storage_config(len(registry.sheet_ids()))
+        return registry
+
+    @cached_property
+    def sheets_executor(self):
+        # Pool limitado onde roda todo I/O de planilha (ver AsyncTransactionService)
+        return create_sheets_executor()
+
+    @cached_property
+    def row_locks(self):
+        # Locks por linha, compartilhados por todas as conversas (ver RowLocks)
+        return RowLocks()
+
+    @cached_property
+    def ai_service(self):
+        return AIService()
+
+    @cached_property
+    def fast_parser(self):
+        return FastExpenseParser()
+
+    def open_user_service(self, sheet_id):
+        """Abre a planilha de um usuário (chamado pelo registry só na primeira mensagem)."""
+        storage = create_storage(sheet_id)
+        if self._mirror_loop is not None and not storage.is_remote:
+            # Roda numa thread do pool: o espelho é criado no event loop
+            self._mirror_loop.call_soon_threadsafe(self._start_mirror, sheet_id, storage)
+        return TransactionService(storage=storage, journal=self.journal)
+
+    def enable_mirror(self, sheets_factory=None):
+        """Espelha na planilha cada banco SQLite aberto pelo registry (SQLITE_MIRROR_TO_SHEETS).
+
+        O espelho de uma planilha nasce quando o serviço dela é criado (no warm ou
+        na primeira mensagem) e continua rodando se o serviço sair do LRU.
+        """
+        if sheets_factory is None:
+            from services.google_sheets import GoogleSheetsService
+            sheets_factory = lambda sheet_id: GoogleSheetsService(sheet_id=sheet_id)
+        self._mirror_sheets_factory = sheets_factory
+        # sheet_id -> task do espelho
+        self.mirror_tasks = {}
+        self._mirror_loop = asyncio.get_running_loop()
+
+    def _start_mirror(self, sheet_id, storage):
+        if sheet_id not in self.mirror_tasks:
+            self.mirror_tasks[sheet_id] = asyncio.create_task(self._run_mirror(sheet_id, storage))
+
+    async def _run_mirror(self, sheet_id, storage):
+        try:
+            # open_by_key é bloqueante
+            sheets = await asyncio.to_thread(self._mirror_sheets_factory, sheet_id)
+        except Exception as e:
+            print(f"⚠️ Espelho da planilha {sheet_id} desativado: {e}")
+            return
+        await SheetsMirror(storage, sheets).run()
+
+    async def user_service(self, user_id):
+        """Fachada async do serviço do usuário, ou None se ele não estiver autorizado.
+
+        O registry roda no pool da planilha: a primeira mensagem de um usuário
+        faz o open_by_key sem travar o event loop.
+        """
+        if not self.registry.is_authorized(user_id):
+            return None
+        loop = asyncio.get_running_loop()
+        service = await loop.run_in_executor(self.sheets_executor, self.registry.get, user_id)
+        if service is None:
+            return None
+        return AsyncTransactionService(service, self.sheets_executor, self.row_locks)
+
+    def _warm_sheet(self, sheet_id):
+        service = self.registry.get_by_sheet(sheet_id)
+        print(f"--- {service.initialize_sheet()} ---")
+        print(f"📒 Cache da planilha carregado: {service.refresh_ledger()} linhas")
+        return sheet_id, service
+
+    async def warm(self, limit=None):
+        """Abre e carrega as planilhas em paralelo no pool da planilha.
+
+        Args:
+            limit: Quantas planilhas aquecer (padrão: as que cabem no cache de usuários).
+
+        Returns:
+            dict: sheet_id -> TransactionService das planilhas aquecidas.
+        """
+        # Journal e registry são criados antes das threads: cached_property não é atômico
+        self.journal
+        sheet_ids = self.registry.sheet_ids()[:limit or self.registry.max_size]
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        warmed = await asyncio.gather(*(
+            loop.run_in_executor(self.sheets_executor, self._warm_sheet, sheet_id) for sheet_id in sheet_ids
+        ))
+        print(f"🔥 {len(warmed)} planilha(s) prontas em {time.perf_counter() - start:.2f}s")
+        return dict(warmed)
@@ -0,0 +1,51 @@
+from bisect import bisect_left, insort
+
+# Cada chave combina (ordinal da data, posição da linha) em um único int,
+# então a lista fica ordenada por data e, dentro do mesmo dia, por posição.
+_POS_BITS = 32
+_POS_MASK = (1 << _POS_BITS) - 1
+
+
+def _key(date_ord, pos):
+    return (date_ord << _POS_BITS) | pos
+
+
+class DateIndex:
+    """Índice ordenado de posições de linha por data da transação.
+
+    Responde intervalos [start, end) com busca binária: O(log n + k).
+    Linhas sem data válida não entram no índice.
+    """
+
+    def __init__(self, keys=None):
+        self._keys = keys or []
+
+    @classmethod
+    def from_ordinals(cls, date_ords, invalid):
+        """Constrói o índice a partir de um array de ordinais (posição = índice do array)."""
+        keys = [_key(int(d), pos) for pos, d in enumerate(date_ords) if d != invalid]
+        keys.sort()
+        return cls(keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, pos, date_ord):
+        key = _key(date_ord, pos)
+        # Caso comum: transação mais recente entra no fim da lista
+        if not self._keys or key > self._keys[-1]:
+            self._keys.append(key)
+        else:
+            insort(self._keys, key)
+
+    def remove(self, pos, date_ord):
+        key = _key(date_ord, pos)
+        i = bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            del self._keys[i]
+
+    def range(self, start_ord=None, end_ord=None):
+        """Posições com data em [start_ord, end_ord), ordenadas por data."""
+        lo = 0 if start_ord is None else bisect_left(self._keys, _key(start_ord, 0))
+        hi = len(self._keys) if end_ord is None else bisect_left(self._keys, _key(end_ord, 0))
+        return [key & _POS_MASK for key in self._keys[lo:hi]]
@@ -0,0 +1,174 @@
+import re
+from datetime import datetime, timedelta
+from services.transaction_service import METODO_MAP
+from utils.text import normalize_text
+
+# Verbos que definem o sinal do valor
+EXPENSE_VERBS = {"gastei", "paguei", "comprei"}
+INCOME_VERBS = {"recebi", "ganhei", "vendi"}
+
+# Se aparecer qualquer um destes, a frase não é uma inserção simples: deixa para o Gemini
+BLOCKING_WORDS = (
+    "reembols", "estorn", "devolv", "quanto", "saldo", "resumo", "total", "relatorio",
+    "tag", "categoria", "mude", "mudar", "altere", "alterar", "corrij", "corrig",
+    "troque", "trocar", "edite", "editar", "nao foi", "valor", "verdade", "?",
+)
+
+# Verbos cujo objeto é o próprio valor ("gastei 50"); "comprei 2 ingressos" não conta
+AMOUNT_VERBS = {"gastei", "paguei", "recebi"}
+
+# Moeda logo depois do número ("50 reais", "20 conto")
+CURRENCY_WORDS = {"reais", "real", "conto", "contos"}
+
+# Palavras que podem separar o número do método ("50 no cartão de crédito")
+METHOD_LINK_WORDS = {"no", "na", "em", "de", "do", "da", "via", "pelo", "pela", "com", "o", "a", "cartao"}
+
+# Referências de data que o parser não resolve: se sobrar alguma, a data ficaria errada
+TEMPORAL_WORDS = {
+    "dia", "semana", "mes", "ano", "passado", "passada", "retrasado", "retrasada", "atras",
+    "proximo", "proxima", "amanha", "segunda", "terca", "quarta", "quinta", "sexta",
+    "sabado", "domingo", "janeiro", "fevereiro", "marco", "abril", "maio", "junho",
+    "julho", "agosto", "setembro", "outubro", "novembro", "dezembro",
+}
+
+# Indícios de entrada sem um dos verbos acima: ambíguo demais para a regra
+INCOME_HINTS = ("ganh", "receb", "vend", "salari", "entrada")
+
+# Palavras que não fazem parte da descrição
+FILLER_WORDS = {
+    "no", "na", "nos", "nas", "de", "do", "da", "em", "com", "o", "a", "um", "uma",
+    "reais", "real", "r$", "pelo", "pela", "via", "cartao", "hoje", "ontem", "anteontem",
+    "e", "pra", "para", "foi", "dia", "meu", "minha", "por", "num", "numa",
+}
+
+METHOD_ALIASES = {normalize_text(alias): method for alias, method in METODO_MAP.items()}
+
+_DAY_RE = re.compile(r"\bdia (\d{1,2})\b")
+_DATE_RE = re.compile(r"\b(\d{1,2})/(\d{1,2})(?:/(\d{4}))?\b")
+_AMOUNT_RE = re.compile(r"(?:r\$\s*)?\b(\d+(?:[.,]\d{1,2})?)\b")
+_WORD_RE = re.compile(r"[\w$']+")
+
+
+class FastExpenseParser:
+    """Extrator determinístico para frases simples de gasto/ganho.
+
+    Roda antes do Gemini e retorna o mesmo formato de `AIService.parse_expense`
+    quando tem confiança; caso contrário retorna None e a mensagem segue para a IA.
+    """
+
+    def __init__(self):
+        self.stats = {"hits": 0, "misses": 0}
+
+    def parse(self, text, expense_tags, income_tags, now=None):
+        result = self._parse(text, expense_tags, income_tags, now or datetime.now())
+        self.stats["hits" if result else "misses"] += 1
+        return result
+
+    @staticmethod
+    def _is_money(norm, match):
+        """O número é um valor: tem moeda ou método de pagamento ao lado, ou vem logo
+        depois de um verbo cujo objeto é o valor ("gastei 50", "recebi 5000")."""
+        before = _WORD_RE.findall(norm[:match.start()])
+        after = _WORD_RE.findall(norm[match.end():])
+        if "r$" in match.group(0) or (before and before[-1] == "r$") or (after and after[0] in CURRENCY_WORDS):
+            return True
+        if before and before[-1] in AMOUNT_VERBS:
+            return True
+        for neighbours in (after, reversed(before)):
+            for word in neighbours:
+                if word in METHOD_ALIASES:
+                    return True
+                if word not in METHOD_LINK_WORDS:
+                    break
+        return False
+
+    def _parse(self, text, expense_tags, income_tags, now):
+        norm = normalize_text(text).strip()
+        if any(word in norm for word in BLOCKING_WORDS):
+            return None
+
+        # 1. Data relativa (removida antes de procurar o valor)
+        data = None
+        if "anteontem" in norm:
+            data = (now - timedelta(days=2)).strftime('%d/%m/%Y')
+        elif "ontem" in norm:
+            data = (now - timedelta(days=1)).strftime('%d/%m/%Y')
+        day_match = _DAY_RE.search(norm)
+        date_match = _DATE_RE.search(norm)
+        if day_match:
+            try:
+                data = now.replace(day=int(day_match.group(1))).strftime('%d/%m/%Y')
+            except ValueError:
+                return None
+            norm = _DAY_RE.sub(" ", norm)
+        elif date_match:
+            day, month, year = date_match.groups()
+            try:
+                data = datetime(int(year or now.year), int(month), int(day)).strftime('%d/%m/%Y')
+            except ValueError:
+                return None
+            norm = _DATE_RE.sub(" ", norm)
+
+        words = _WORD_RE.findall(norm)
+        if any(w in TEMPORAL_WORDS for w in words):
+            # "semana passada", "sexta", "dia 5 do mês passado"...: fica com o Gemini
+            return None
+
+        # 2. Valor: exatamente um número na frase, e com cara de dinheiro
+        amounts = list(_AMOUNT_RE.finditer(norm))
+        if len(amounts) != 1:
+            return None
+        if not self._is_money(norm, amounts[0]):
+            # "Comprei 2 ingressos" é quantidade, não valor
+            return None
+        amounts = [amounts[0].group(1)]
+        valor = float(amounts[0].replace(',', '.'))
+        if valor <= 0:
+            return None
+
+        # 3. Método de pagamento
+        methods = {METHOD_ALIASES[w] for w in words if w in METHOD_ALIASES}
+        if len(methods) > 1:
+            return None
+        metodo = methods.pop() if methods else None
+
+        # 4. Sinal
+        is_expense = any(w in EXPENSE_VERBS for w in words)
+        is_income = any(w in INCOME_VERBS for w in words)
+        if is_expense and is_income:
+            return None
+        if not is_expense and not is_income:
+            if any(hint in norm for hint in INCOME_HINTS):
+                return None
+            # Sem verbo só aceitamos o formato "item valor reais/método" (sempre gasto)
+            if not (metodo or "reais" in words or "r$" in norm):
+                return None
+            is_expense = True
+        if is_income and metodo == "Caju":
+            # Regra especial do vale alimentação: fica com o Gemini
+            return None
+
+        # 5. Descrição: o que sobra da frase original
+        skip = FILLER_WORDS | EXPENSE_VERBS | INCOME_VERBS | set(METHOD_ALIASES) | {amounts[0]}
+        original_words = _WORD_RE.findall(text)
+        desc_words = [w for w in original_words if normalize_text(w) not in skip and not w.isdigit()]
+        if not desc_words or len(desc_words) > 4:
+            return None
+        descricao = " ".join(desc_words)
+        descricao = descricao[0].upper() + descricao[1:]
+
+        # 6. Tag conhecida citada na frase
+        tags = None
+        candidates = expense_tags if is_expense else income_tags
+        for tag in candidates:
+            if normalize_text(tag) in words:
+                tags = tag
+                break
+
+        return {
+            "valor": -valor if is_expense else valor,
+            "descricao": descricao,
+            "tags": tags,
+            "metodo_pagamento": metodo,
+            "data": data
+        }
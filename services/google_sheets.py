@@ -1,42 +1,86 @@
 import os
 import json
+import threading
+import time
 import gspread
 from datetime import datetime, timedelta, date
 from gspread_formatting import *
+from gspread.utils import ValueInputOption, rowcol_to_a1
+from models.transaction import COLUMN_INDEX, Transaction
+from services.ledger_cache import LedgerCache
+from services.metrics import metrics
+from services.storage import LedgerStorage
 
-class GoogleSheetsService:
-    def __init__(self):
-        # Tenta carregar credenciais de variável de ambiente (para deploy) 
-        # ou do arquivo local credentials.json
-        creds_json = os.getenv('GOOGLE_SERVICE_ACCOUNT_JSON')
-        if creds_json:
-            try:
-                creds_dict = json.loads(creds_json)
-                self.gc = gspread.service_account_from_dict(creds_dict)
-            except Exception as e:
-                print(f"❌ Erro ao processar GOOGLE_SERVICE_ACCOUNT_JSON: {e}")
-                self.gc = gspread.service_account(filename='credentials.json')
-        else:
-            self.gc = gspread.service_account(filename='credentials.json')
-
-        sheet_id = os.getenv('GOOGLE_SHEET_ID')
+CONFIG_WORKSHEET = "Config"
+CONFIG_HEADERS = ["Tag", "Tipo"]
+# Linhas cobertas pelas validações além da última linha usada
+VALIDATION_HEADROOM = 1000
+VALIDATION_MIN_ROWS = 1000
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Autentica uma única vez por processo e reaproveita o cliente gspread entre planilhas."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            # Tenta carregar credenciais de variável de ambiente (para deploy) 
+            # ou do arquivo local credentials.json
+            creds_json = os.getenv('GOOGLE_SERVICE_ACCOUNT_JSON')
+            if creds_json:
+                try:
+                    creds_dict = json.loads(creds_json)
+                    _client = gspread.service_account_from_dict(creds_dict)
+                except Exception as e:
+                    print(f"❌ Erro ao processar GOOGLE_SERVICE_ACCOUNT_JSON: {e}")
+                    _client = gspread.service_account(filename='credentials.json')
+            else:
+                _client = gspread.service_account(filename='credentials.json')
+        return _client
+
+class GoogleSheetsService(LedgerStorage):
+    def __init__(self, sheet_id=None, gc=None):
+        """
+        Args:
+            sheet_id: ID da planilha (padrão: GOOGLE_SHEET_ID do .env)
+            gc: Cliente gspread já autenticado (padrão: cliente compartilhado do processo)
+        """
+        self.gc = gc or get_client()
+
+        sheet_id = sheet_id or os.getenv('GOOGLE_SHEET_ID')
+        self.sheet_id = sheet_id
         
         if not sheet_id:
             raise ValueError("❌ GOOGLE_SHEET_ID não encontrado no .env!")
             
         try:
-            self.sh = self.gc.open_by_key(sheet_id)
-            self.ws = self.sh.get_worksheet(0)
+            with metrics.timer("sheets_api_seconds", method="open_by_key"):
+                self.sh = self.gc.open_by_key(sheet_id)
+                self.ws = self.sh.get_worksheet(0)
         except Exception as e:
             print(f"❌ Erro ao abrir planilha com ID: {sheet_id}")
             raise e
 
-        self.expense_tags = ["Mercado", "Viagem", "Restaurante", "Academia", "Compras", "Gasolina", "Uber", "Outros"]
-        self.income_tags = ["Salário", "Presente", "Reembolso", "Outros"]
-        self.tag_options = list(set(self.expense_tags + self.income_tags))
-        self.metodo_options = ["Pix", "Crédito", "Débito", "Caju"]
+        self._init_registry()
+        self._load_tag_registry()
+
+        # Validações: aplicadas em lote, com debounce, e cobrindo o tamanho real da planilha
+        self._validation_debounce = float(os.getenv('VALIDATION_DEBOUNCE_SECONDS', '5'))
+        self._validation_timer = None
+        self._validation_lock = threading.Lock()
+        # Até onde as validações foram aplicadas, e até onde já foi pedido (ainda no debounce)
+        self._validated_until = VALIDATION_MIN_ROWS
+        self._requested_until = 0
+
+        # Buscas com o cache frio: quantas linhas por página
+        self.page_size = int(os.getenv('LEDGER_PAGE_SIZE', '1000'))
+        # Última linha com dados (a grade tem a folga das validações); None = ainda não sabemos
+        self._last_row = None
+
+        # Cache das linhas da planilha. LEDGER_REFRESH_SECONDS=0 desativa o refresh periódico.
+        self.ledger = LedgerCache(refresh_interval=int(os.getenv('LEDGER_REFRESH_SECONDS', '600')))
 
-        
     def test_connectivity(self):
         """Retorna True se conseguir ler o título da planilha."""
         return bool(self.sh.title)
@@ -56,53 +100,108 @@ class GoogleSheetsService:
         
         if not first_row:
             self.ws.insert_row(headers, 1)
+            self.ledger.invalidate()
             self.ws.format("A1:F1", {"textFormat": {"bold": True}})
             self.apply_validations()
             return "Headers criados com as novas categorias."
 
         return "Headers já existentes."
     
-    def apply_validations(self):
-        """Define as listas suspensas para as colunas Tags (F) e Método (G)."""
-        
-        set_data_validation_for_cell_range(
-            self.ws, 
-            "E2:E1000", 
-            DataValidationRule(
-                BooleanCondition('ONE_OF_LIST', self.tag_options),
-                showCustomUi=True
-            )
-        )
-
-        set_data_validation_for_cell_range(
-            self.ws, 
-            "F2:F1000", 
-            DataValidationRule(
-                BooleanCondition('ONE_OF_LIST', self.metodo_options),
-                showCustomUi=True
-            )
-        )
+    def _load_tag_registry(self):
+        """Carrega as tags criadas em runtime da aba oculta "Config" (criada se não existir)."""
+        try:
+            self.config_ws = self.sh.worksheet(CONFIG_WORKSHEET)
+        except gspread.WorksheetNotFound:
+            self.config_ws = self.sh.add_worksheet(CONFIG_WORKSHEET, rows=100, cols=len(CONFIG_HEADERS))
+            self.config_ws.update([CONFIG_HEADERS], "A1")
+            self.config_ws.hide()
+            return
+
+        for row in self.config_ws.get_all_values()[1:]:
+            if len(row) < 2 or not row[0]:
+                continue
+            tags = self.income_tags if row[1] == 'income' else self.expense_tags
+            if row[0] not in tags:
+                tags.append(row[0])
+        self.tag_options = list(set(self.expense_tags + self.income_tags))
+
+    def apply_validations(self, until_row=None):
+        """Define as listas suspensas das colunas Tags (E) e Método (F) em uma única requisição.
+
+        Args:
+            until_row: Última linha coberta. Padrão: tamanho atual da planilha + folga.
+        """
+        with self._validation_lock:
+            self._validation_timer = None
+            grid_rows = self._row_count()
+            until_row = max(until_row or 0, grid_rows, self._requested_until, self._validated_until, VALIDATION_MIN_ROWS)
+            # Pedido consumido: se a requisição falhar, o próximo append agenda de novo
+            self._requested_until = 0
+            if until_row > grid_rows:
+                # A API recusa ranges além da grade: ela cresce antes
+                with metrics.timer("sheets_api_seconds", method="add_rows"):
+                    self.ws.add_rows(until_row - grid_rows)
+            with metrics.timer("sheets_api_seconds", method="set_validations"), batch_updater(self.sh) as batch:
+                batch.set_data_validation_for_cell_range(
+                    self.ws,
+                    f"E2:E{until_row}",
+                    DataValidationRule(
+                        BooleanCondition('ONE_OF_LIST', self.tag_options),
+                        showCustomUi=True
+                    )
+                )
+                batch.set_data_validation_for_cell_range(
+                    self.ws,
+                    f"F2:F{until_row}",
+                    DataValidationRule(
+                        BooleanCondition('ONE_OF_LIST', self.metodo_options),
+                        showCustomUi=True
+                    )
+                )
+            # Só depois do batch dar certo
+            self._validated_until = until_row
+
+    def schedule_validations(self, until_row=None):
+        """Agenda apply_validations; chamadas dentro da janela de debounce viram uma só."""
+        with self._validation_lock:
+            if until_row:
+                self._requested_until = max(self._requested_until, until_row)
+            if self._validation_timer is not None:
+                self._validation_timer.cancel()
+            self._validation_timer = threading.Timer(self._validation_debounce, self._apply_scheduled_validations)
+            self._validation_timer.daemon = True
+            self._validation_timer.start()
+
+    def _apply_scheduled_validations(self):
+        try:
+            self.apply_validations()
+        except Exception as e:
+            print(f"⚠️ Falha ao atualizar as validações da planilha: {e}")
+
+    def _ensure_validated(self, row_number):
+        """Estende as validações quando as linhas usadas se aproximam do fim do range coberto."""
+        if row_number > max(self._validated_until, self._requested_until) - VALIDATION_HEADROOM // 10:
+            self.schedule_validations(until_row=row_number + VALIDATION_HEADROOM)
 
     def add_category(self, category, category_type='expense'):
-        """Adiciona uma nova categoria à lista de validação e atualiza a planilha.
+        """Adiciona uma nova categoria ao registro persistido e agenda a atualização das validações.
 
         Args:
             category: A nova categoria a ser adicionada.
             category_type: 'expense' or 'income'.
         """
-        if category_type == 'expense':
-            if category not in self.expense_tags:
-                self.expense_tags.append(category)
-                self.tag_options = list(set(self.expense_tags + self.income_tags))
-                self.apply_validations()
-                return True
-        elif category_type == 'income':
-            if category not in self.income_tags:
-                self.income_tags.append(category)
-                self.tag_options = list(set(self.expense_tags + self.income_tags))
-                self.apply_validations()
-                return True
-        return False
+        if category_type not in ('expense', 'income'):
+            return False
+        tags = self.expense_tags if category_type == 'expense' else self.income_tags
+        if category in tags:
+            return False
+
+        with metrics.timer("sheets_api_seconds", method="append_row"):
+            self.config_ws.append_row([category, category_type])
+        tags.append(category)
+        self.tag_options = list(set(self.expense_tags + self.income_tags))
+        self.schedule_validations()
+        return True
 
     def add_expense(self, valor, descricao, reembolsado=0, tags="", metodo_pagamento="", data_custom=None):
         """Adiciona uma nova linha de gasto e retorna o número da linha.
@@ -118,76 +217,123 @@ class GoogleSheetsService:
         Returns:
             int: O número da linha onde os dados foram inseridos.
         """
-        if data_custom:
-            data = data_custom
-        else:
-            data = datetime.now().strftime('%d/%m/%Y %H:%M')
-            
-        # Ordem: Data, Valor, Reembolsado, Descrição, Tags, Método de Pagamento
-        nova_linha = [data, valor, reembolsado, descricao, tags, metodo_pagamento]
-        result = self.ws.append_row(nova_linha)
+        nova_linha = self._new_row(valor, descricao, reembolsado, tags, metodo_pagamento, data_custom)
+        with metrics.timer("sheets_api_seconds", method="append_row"):
+            result = self.ws.append_row(nova_linha)
+        row_number = self._first_updated_row(result)
+        self._last_row = max(self._last_row or 0, row_number)
+        self.ledger.append_row(row_number, nova_linha)
+        self._ensure_validated(row_number)
+        return row_number
+
+    def append_rows(self, rows):
+        """Adiciona várias linhas em uma única requisição.
+
+        Returns:
+            list[int]: O número da linha de cada item de `rows`, na mesma ordem.
+        """
+        with metrics.timer("sheets_api_seconds", method="append_rows"):
+            result = self.ws.append_rows(rows)
+        first_row = self._first_updated_row(result)
+        row_numbers = list(range(first_row, first_row + len(rows)))
+        self._last_row = max(self._last_row or 0, row_numbers[-1])
+        for row_number, row in zip(row_numbers, rows):
+            self.ledger.append_row(row_number, row)
+        self._ensure_validated(row_numbers[-1])
+        return row_numbers
 
-        # Extrai o número da linha do resultado. Ex: 'Sheet1!A12:F12' -> 12
+    @staticmethod
+    def _first_updated_row(result):
+        """Extrai o número da primeira linha gravada. Ex: 'Sheet1!A12:F14' -> 12"""
         range_str = result['updates']['updatedRange']
         # Remove o nome da planilha e pega o número da linha
         row_number_str = ''.join(filter(str.isdigit, range_str.split('!')[1].split(':')[0]))
         return int(row_number_str)
-    
-        return matches
-    
-    # Logic moved to TransactionService
-    def get_all_rows(self):
-        """Retorna todas as linhas da planilha."""
-        return self.ws.get_all_values()
-    
-    # Logic moved to TransactionService
-    def find_transaction_logic_placeholder(self):
-        pass
 
-    def update_reimbursement(self, row_index, valor_reembolsado):
-        """Atualiza o valor reembolsado de uma despesa (coluna C).
-        
-        Args:
-            row_index: Índice da linha (1-based)
-            valor_reembolsado: Valor em reais que foi reembolsado
+    def refresh_ledger(self):
+        """Baixa a planilha inteira em uma requisição e recarrega o cache. Retorna o número de linhas.
+
+        A leitura paginada (`iter_row_pages`) fica para as buscas de trás para
+        frente, que costumam parar na primeira página.
         """
-        # Coluna C é o índice 3 (A=1, B=2, C=3)
-        self.ws.update_cell(row_index, 3, valor_reembolsado)
+        start_time = time.perf_counter()
+        self.ledger.refresh(self._download_rows)
+        metrics.observe("ledger_refresh_seconds", time.perf_counter() - start_time)
+        return len(self.ledger.rows)
 
-    def update_expense_category(self, row_index, category):
-        """Atualiza a categoria (tag) de uma despesa.
+    def _download_rows(self):
+        with metrics.timer("sheets_api_seconds", method="get"):
+            # Linhas vazias no meio vêm como [], então rows[row_index - 1] fica alinhado
+            rows = [list(row) for row in self.ws.get("A:F")]
+        metrics.inc("sheets_rows_fetched_total", len(rows), method="get")
+        # A API omite as linhas vazias do fim: len(rows) é a última linha usada
+        self._last_row = len(rows)
+        return rows
 
-        Args:
-            row_index: Índice da linha a ser atualizada.
-            category: A nova categoria a ser definida.
+    def _row_count(self):
+        """Tamanho atual da grade (só metadados, sem baixar valores)."""
+        with metrics.timer("sheets_api_seconds", method="fetch_sheet_metadata"):
+            metadata = self.sh.fetch_sheet_metadata(params={"fields": "sheets.properties"})
+        for sheet in metadata.get("sheets", []):
+            properties = sheet["properties"]
+            if properties["sheetId"] == self.ws.id:
+                return properties["gridProperties"]["rowCount"]
+        return self.ws.row_count
+
+    def _last_used_row(self):
+        """Última linha com dados: a rastreada por appends e refreshes ou, sem ela,
+        o tamanho da coluna A (a grade inclui as linhas vazias da folga)."""
+        if self._last_row is None:
+            with metrics.timer("sheets_api_seconds", method="col_values"):
+                self._last_row = len(self.ws.col_values(1))
+        return self._last_row
+
+    def iter_row_pages(self, page_size=None, reverse=False):
+        """Lê a planilha em ranges A{início}:F{fim} de tamanho fixo, uma página por vez.
+
+        Yields:
+            (start, rows): número da primeira linha da página e suas linhas, no
+            formato de get_all_values (linhas vazias no fim da página são omitidas).
         """
-        # Coluna E (5) é a de Tags
-        self.ws.update_cell(row_index, 5, category)
+        page_size = page_size or self.page_size
+        row_count = self._last_used_row()
+        starts = range(1, row_count + 1, page_size)
+        for start in (reversed(starts) if reverse else starts):
+            end = min(start + page_size - 1, row_count)
+            with metrics.timer("sheets_api_seconds", method="get"):
+                page = [list(row) for row in self.ws.get(f"A{start}:F{end}")]
+            metrics.inc("sheets_rows_fetched_total", len(page), method="get")
+            yield start, page
 
-    def update_expense_value(self, row_index, value):
-        """Atualiza o valor de uma despesa (coluna B)."""
-        self.ws.update_cell(row_index, 2, value)
+    def iter_transactions(self, reverse=False):
+        """Transações lidas página a página, sem carregar a planilha inteira.
 
-    def update_description(self, row_index, description):
-        """Atualiza a descrição de uma despesa (coluna D)."""
-        self.ws.update_cell(row_index, 4, description)
+        Com reverse=True começa pela última página (mais recentes primeiro), então
+        buscas que param nos primeiros resultados costumam ler uma página só.
+        """
+        for start, page in self.iter_row_pages(reverse=reverse):
+            if start == 1:
+                # Pula o header
+                page, start = page[1:], 2
+            # Linhas vazias ficam de fora
+            transactions = [Transaction.from_row(row, start + i) for i, row in enumerate(page) if any(row)]
+            yield from (reversed(transactions) if reverse else transactions)
+
+    def update_transaction(self, row_index, changes):
+        """Atualiza vários campos de uma linha em uma única requisição (batch_update).
 
-    def update_payment_method(self, row_index, method):
-        """Atualiza o método de pagamento de uma despesa (coluna F)."""
-        self.ws.update_cell(row_index, 6, method)
-    
-    def get_expense_value(self, row_data):
-        """Extrai o valor de uma linha de despesa.
-        
         Args:
-            row_data: Lista com os valores da linha
-            
-        Returns:
-            float: Valor da despesa
+            row_index: Índice da linha (1-based)
+            changes: Dict parcial {campo do Transaction: novo valor},
+                ex: {"amount": -30.0, "category": "Lazer"}
         """
-        if len(row_data) > 1:
-            try:
-                return float(str(row_data[1]).replace(',', '.'))
-            except (ValueError, TypeError):
-                return 0.0
-        return 0.0
\ No newline at end of file
+        if not changes:
+            return
+        data = [
+            {"range": rowcol_to_a1(row_index, COLUMN_INDEX[field]), "values": [[value]]}
+            for field, value in changes.items()
+        ]
+        with metrics.timer("sheets_api_seconds", method="batch_update"):
+            self.ws.batch_update(data, value_input_option=ValueInputOption.user_entered)
+        for field, value in changes.items():
+            self.ledger.update_cell(row_index, COLUMN_INDEX[field], value)
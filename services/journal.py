@@ -0,0 +1,247 @@
+import asyncio
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class TransactionJournal:
+    """Journal local (SQLite em modo WAL) das inserções ainda não enviadas à planilha.
+
+    Cada entrada recebe um id local; enquanto não é gravada no Sheets, a
+    transação é identificada pelo row_index provisório `-id`.
+
+    Estado de cada entrada:
+    - pending: aguardando envio.
+    - sending: enviada sem confirmação (o append pode ter sido gravado e a
+      resposta perdida); antes de reenviar, o flush procura a linha na planilha.
+    - dead: recusada pela API `max_attempts` vezes; sai da fila para não travar
+      as demais e fica no journal para inspeção (`requeue_dead` a devolve).
+    """
+
+    def __init__(self, path, max_attempts=5):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        # Serializa os flushes (flusher em background x flush sob demanda)
+        self.flush_lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS pending (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                sheet_id TEXT NOT NULL,
+                row_data TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                row_index INTEGER,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                state TEXT NOT NULL DEFAULT 'pending'
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_pending_unflushed ON pending (sheet_id, id) WHERE row_index IS NULL")
+
+    @classmethod
+    def from_env(cls):
+        """Cria o journal a partir do .env (WRITE_BEHIND=0 desativa)."""
+        if os.getenv("WRITE_BEHIND", "1") != "1":
+            return None
+        return cls(os.getenv("JOURNAL_PATH", "journal.db"), max_attempts=int(os.getenv("JOURNAL_MAX_ATTEMPTS", "5")))
+
+    def append(self, sheet_id, row):
+        """Registra uma linha para envio posterior. Retorna o id local."""
+        with self._lock:
+            cursor = self.conn.execute(
+                "INSERT INTO pending (sheet_id, row_data, created_at) VALUES (?, ?, ?)",
+                (sheet_id, json.dumps(row, ensure_ascii=False), time.time())
+            )
+            return cursor.lastrowid
+
+    def pending(self, sheet_id, limit=100, state="pending"):
+        """Entradas ainda não gravadas na planilha, em ordem de chegada: [(id, row, attempts)]."""
+        with self._lock:
+            cursor = self.conn.execute(
+                "SELECT id, row_data, attempts FROM pending WHERE sheet_id = ? AND row_index IS NULL AND state = ? ORDER BY id LIMIT ?",
+                (sheet_id, state, limit)
+            )
+            return [(entry_id, json.loads(row_data), attempts) for entry_id, row_data, attempts in cursor.fetchall()]
+
+    def pending_sheets(self):
+        with self._lock:
+            cursor = self.conn.execute("SELECT DISTINCT sheet_id FROM pending WHERE row_index IS NULL AND state != 'dead'")
+            return [sheet_id for (sheet_id,) in cursor.fetchall()]
+
+    def pending_count(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM pending WHERE row_index IS NULL AND state != 'dead'").fetchone()[0]
+
+    def dead_count(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM pending WHERE state = 'dead'").fetchone()[0]
+
+    def _set_state(self, entry_ids, state):
+        with self._lock:
+            self.conn.executemany("UPDATE pending SET state = ? WHERE id = ?", [(state, entry_id) for entry_id in entry_ids])
+
+    def mark_sending(self, entry_ids):
+        """Marca as entradas como enviadas sem confirmação (antes do append_rows)."""
+        self._set_state(entry_ids, "sending")
+
+    def mark_unsent(self, entry_ids):
+        """Devolve à fila entradas que com certeza não chegaram à planilha."""
+        self._set_state(entry_ids, "pending")
+
+    def requeue_dead(self):
+        """Devolve as entradas descartadas à fila (ex: depois de corrigir a planilha)."""
+        with self._lock:
+            return self.conn.execute("UPDATE pending SET state = 'pending', attempts = 0 WHERE state = 'dead'").rowcount
+
+    def mark_flushed(self, entries):
+        """Reconcilia as entradas com as linhas reais da planilha: [(id, row_index)]."""
+        with self._lock:
+            self.conn.execute("BEGIN")
+            self.conn.executemany("UPDATE pending SET row_index = ?, state = 'flushed' WHERE id = ?", [(row, entry_id) for entry_id, row in entries])
+            self.conn.execute("COMMIT")
+
+    def record_failure(self, entry_ids, error, rejected=False):
+        """Conta uma tentativa falha. Retorna os ids que foram para o estado dead.
+
+        Só uma entrada enviada sozinha e recusada pela API (`rejected`, ex: 400)
+        pode ser descartada: erros de rede e de quota nunca descartam nada.
+        """
+        with self._lock:
+            self.conn.execute("BEGIN")
+            self.conn.executemany(
+                "UPDATE pending SET attempts = attempts + 1, last_error = ? WHERE id = ?",
+                [(str(error), entry_id) for entry_id in entry_ids]
+            )
+            dead = []
+            if rejected and len(entry_ids) == 1:
+                cursor = self.conn.execute(
+                    "UPDATE pending SET state = 'dead' WHERE id = ? AND attempts >= ?",
+                    (entry_ids[0], self.max_attempts)
+                )
+                if cursor.rowcount:
+                    dead = list(entry_ids)
+            self.conn.execute("COMMIT")
+            return dead
+
+    def resolve(self, entry_id):
+        """Linha real de uma entrada, ou None se ainda não foi enviada."""
+        with self._lock:
+            result = self.conn.execute("SELECT row_index FROM pending WHERE id = ?", (entry_id,)).fetchone()
+            return result[0] if result else None
+
+    def prune(self, max_age=7 * 24 * 3600):
+        """Remove entradas já enviadas há mais de `max_age` segundos."""
+        with self._lock:
+            self.conn.execute(
+                "DELETE FROM pending WHERE row_index IS NOT NULL AND created_at < ?",
+                (time.time() - max_age,)
+            )
+
+
+def is_rejection(error):
+    """True se a API respondeu recusando a requisição (4xx que não é quota):
+    nada foi gravado e repetir igual não adianta."""
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    return status is not None and 400 <= status < 500 and status != 429
+
+
+def _reconcile(journal, sheets, entry_ids, row_numbers):
+    journal.mark_flushed(list(zip(entry_ids, row_numbers)))
+    sheets.ledger.settle(entry_ids)
+
+
+def flush_pending(journal, sheets, batch_size=100):
+    """Envia as entradas pendentes de uma planilha com append_rows. Retorna quantas foram gravadas."""
+    with journal.flush_lock:
+        flushed = 0
+        while True:
+            # 1. Envios sem confirmação: se as linhas já estão no fim da planilha, só reconcilia
+            unconfirmed = journal.pending(sheets.sheet_id, limit=batch_size, state="sending")
+            if unconfirmed:
+                entry_ids = [entry_id for entry_id, _, _ in unconfirmed]
+                row_numbers = sheets.find_appended([row for _, row, _ in unconfirmed])
+                if row_numbers:
+                    _reconcile(journal, sheets, entry_ids, row_numbers)
+                    flushed += len(entry_ids)
+                    continue
+                journal.mark_unsent(entry_ids)
+
+            entries = journal.pending(sheets.sheet_id, limit=batch_size)
+            if not entries:
+                return flushed
+            if entries[0][2]:
+                # Depois de uma falha, uma entrada por vez: uma linha recusada não segura as outras
+                entries = entries[:1]
+            entry_ids = [entry_id for entry_id, _, _ in entries]
+            journal.mark_sending(entry_ids)
+            try:
+                row_numbers = sheets.append_rows([row for _, row, _ in entries])
+            except Exception as e:
+                rejected = is_rejection(e)
+                if rejected:
+                    # Recusada: com certeza não foi gravada
+                    journal.mark_unsent(entry_ids)
+                dead = journal.record_failure(entry_ids, e, rejected=rejected)
+                if dead:
+                    sheets.ledger.settle(dead)
+                    print(f"☠️ Journal: entrada(s) {dead} recusada(s) {journal.max_attempts} vezes pela planilha e descartada(s) da fila: {e}")
+                    continue
+                raise
+            _reconcile(journal, sheets, entry_ids, row_numbers)
+            flushed += len(entries)
+
+
+class JournalFlusher:
+    """Tarefa em background que esvazia o journal para o Sheets, com retry e backoff."""
+
+    def __init__(self, journal, get_sheets, interval=2.0, max_backoff=60.0):
+        self.journal = journal
+        # get_sheets(sheet_id) -> GoogleSheetsService da planilha
+        self.get_sheets = get_sheets
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self):
+        """Para o loop e faz um último envio, para o desligamento não deixar nada para trás."""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        try:
+            flushed = await asyncio.to_thread(self.flush_once)
+            if flushed:
+                print(f"📤 Journal: {flushed} transação(ões) enviada(s) para a planilha no desligamento")
+        except Exception as e:
+            # Continuam no journal e vão no próximo start
+            print(f"⚠️ Falha no último envio do journal ({self.journal.pending_count()} pendente(s)): {e}")
+
+    def flush_once(self):
+        flushed = 0
+        for sheet_id in self.journal.pending_sheets():
+            flushed += flush_pending(self.journal, self.get_sheets(sheet_id))
+        return flushed
+
+    async def run(self):
+        delay = self.interval
+        while True:
+            try:
+                flushed = await asyncio.to_thread(self.flush_once)
+                if flushed:
+                    print(f"📤 Journal: {flushed} transação(ões) enviada(s) para a planilha")
+                delay = self.interval
+            except Exception as e:
+                delay = min(delay * 2, self.max_backoff)
+                print(f"⚠️ Falha ao enviar journal para a planilha (nova tentativa em {delay:.0f}s): {e}")
+            await asyncio.sleep(delay)
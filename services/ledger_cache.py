@@ -0,0 +1,217 @@
+import threading
+import time
+from models.transaction import Transaction
+from services.date_index import DateIndex
+from services.ledger_columns import LedgerColumns, INVALID_DATE
+from services.rollups import LedgerRollups
+from services.token_index import TokenIndex
+
+
+class LedgerCache:
+    """Espelho em memória da planilha (write-through).
+
+    Guarda as linhas no mesmo formato de `get_all_values()` (lista de listas,
+    com o header na posição 0), de forma que `rows[row_index - 1]` é a linha
+    `row_index` da planilha. Mantém também uma cópia colunar (`columns`) para
+    agregações vetorizadas, um índice ordenado por data (`dates`), um índice
+    invertido das descrições (`tokens`) e agregados por mês/tag/método (`rollups`).
+
+    Escritas (handlers no pool da planilha e o flush do journal) e leituras rodam
+    em threads diferentes: quem percorre o cache segura `lock` durante a leitura.
+
+    Um refresh completo (`refresh`) roda um por vez. As escritas feitas enquanto
+    a planilha é baixada e os índices são montados ficam registradas e são
+    reaplicadas sobre o snapshot novo, que pode ter sido lido antes delas.
+
+    Inserções ainda no journal (write-behind) entram como linhas provisórias no
+    fim do cache, para que consultas e buscas já as vejam; a Transaction delas
+    tem o row_index provisório `-entry_id`. Quando o flush grava a linha real,
+    `settle` remove a provisória.
+    """
+
+    def __init__(self, refresh_interval=0):
+        # refresh_interval em segundos; 0 desativa o refresh automático
+        self.refresh_interval = refresh_interval
+        self.rows = []
+        self.columns = LedgerColumns()
+        self.dates = DateIndex()
+        self.tokens = TokenIndex()
+        self.rollups = LedgerRollups()
+        self.loaded_at = None
+        self.lock = threading.RLock()
+        # Um refresh por vez; `generation` conta os loads concluídos
+        self._refresh_lock = threading.Lock()
+        self.generation = 0
+        # Escritas feitas durante um load, reaplicadas depois da troca (None fora de um load)
+        self._writes_during_load = None
+        # entry_id do journal -> valores da linha provisória, e onde ela está no cache
+        self._provisional = {}
+        self._provisional_slot = {}
+        self._provisional_at = {}
+
+    @property
+    def is_loaded(self):
+        return self.loaded_at is not None
+
+    def is_stale(self):
+        """Retorna True se o cache nunca foi carregado ou se o intervalo expirou."""
+        if not self.is_loaded:
+            return True
+        if self.refresh_interval and time.monotonic() - self.loaded_at >= self.refresh_interval:
+            return True
+        return False
+
+    def refresh(self, fetch_rows):
+        """Refresh completo com `fetch_rows()` (o download), um por vez.
+
+        Quem chega enquanto outro refresh está em andamento espera por ele e usa
+        o resultado, em vez de baixar a planilha de novo.
+        """
+        generation = self.generation
+        with self._refresh_lock:
+            if self.generation != generation:
+                return
+            self._record_writes()
+            try:
+                rows = fetch_rows()
+            except BaseException:
+                with self.lock:
+                    self._writes_during_load = None
+                raise
+            self.load(rows)
+
+    def _record_writes(self):
+        with self.lock:
+            if self._writes_during_load is None:
+                self._writes_during_load = []
+
+    def load(self, rows):
+        """Substitui todo o conteúdo do cache (refresh completo)."""
+        self._record_writes()
+        # Os índices são montados fora do lock; só a troca bloqueia os leitores
+        rows = [list(row) for row in rows]
+        columns = LedgerColumns.from_rows(rows[1:])
+        dates = DateIndex.from_ordinals(columns.date_ord[:columns.size], INVALID_DATE)
+        tokens = TokenIndex.from_descriptions(row[3] if len(row) > 3 else "" for row in rows[1:])
+        rollups = LedgerRollups.from_columns(columns)
+        with self.lock:
+            self.rows, self.columns, self.dates, self.tokens, self.rollups = rows, columns, dates, tokens, rollups
+            self.loaded_at = time.monotonic()
+            self._provisional_slot.clear()
+            self._provisional_at.clear()
+            # O snapshot pode ser anterior às escritas feitas durante o download
+            writes, self._writes_during_load = self._writes_during_load, None
+            for write, args in writes:
+                write(*args)
+            # O download não traz o que ainda está no journal: as provisórias voltam para o fim
+            for entry_id, values in self._provisional.items():
+                self._place_provisional(entry_id, values)
+            self.generation += 1
+
+    def invalidate(self):
+        """Força um refresh completo na próxima leitura."""
+        self.loaded_at = None
+
+    def append_row(self, row_index, row):
+        """Registra uma linha recém-inserida na planilha (1-based)."""
+        with self.lock:
+            if self._writes_during_load is not None:
+                self._writes_during_load.append((self.append_row, (row_index, row)))
+            if not self.is_loaded:
+                # Ainda não carregado: o refresh em andamento (ou o próximo) traz a linha
+                return
+            occupant = self._provisional_at.pop(row_index, None)
+            self._write_row(row_index, [str(v) for v in row])
+            if occupant is not None:
+                # A linha real caiu onde estava uma provisória: ela vai para o fim
+                self._place_provisional(occupant, self._provisional[occupant])
+
+    def add_provisional(self, entry_id, row):
+        """Registra uma inserção que ainda está no journal (row_index provisório -entry_id)."""
+        with self.lock:
+            self._provisional[entry_id] = [str(v) for v in row]
+            if self.is_loaded:
+                self._place_provisional(entry_id, self._provisional[entry_id])
+
+    def settle(self, entry_ids):
+        """Remove as linhas provisórias de entradas já gravadas (ou descartadas) do journal."""
+        with self.lock:
+            for entry_id in entry_ids:
+                self._provisional.pop(entry_id, None)
+                slot = self._provisional_slot.pop(entry_id, None)
+                if slot is not None:
+                    del self._provisional_at[slot]
+                    self._write_row(slot, [])
+
+    def _place_provisional(self, entry_id, values):
+        slot = len(self.rows) + 1
+        self._provisional_slot[entry_id] = slot
+        self._provisional_at[slot] = entry_id
+        self._write_row(slot, values)
+
+    def _write_row(self, row_index, values):
+        # A planilha pode ter linhas vazias no meio; preenchemos para manter o índice
+        while len(self.rows) < row_index - 1:
+            self.rows.append([])
+        if len(self.rows) >= row_index:
+            self.rows[row_index - 1] = values
+        else:
+            self.rows.append(values)
+        self._sync_indexes(row_index)
+
+    def update_cell(self, row_index, col, value):
+        """Atualiza uma célula (row e col 1-based) já gravada na planilha."""
+        with self.lock:
+            if self._writes_during_load is not None:
+                self._writes_during_load.append((self.update_cell, (row_index, col, value)))
+            if row_index < 1 or row_index > len(self.rows):
+                # Linha desconhecida: o cache está desatualizado
+                self.invalidate()
+                return
+            row = self.rows[row_index - 1]
+            if len(row) < col:
+                row.extend([""] * (col - len(row)))
+            row[col - 1] = str(value)
+            self._sync_indexes(row_index)
+
+    def _sync_indexes(self, row_index):
+        if row_index < 2:
+            return
+        pos = row_index - 2
+        row = self.rows[row_index - 1]
+        self.tokens.update(pos, row[3] if len(row) > 3 else "")
+        columns = self.columns
+        old_date = int(columns.date_ord[pos]) if pos < columns.size else INVALID_DATE
+        if old_date != INVALID_DATE:
+            self.rollups.remove(old_date, int(columns.category[pos]), int(columns.method[pos]), float(columns.net_values(pos)))
+        columns.set_row(pos, row)
+        new_date = int(columns.date_ord[pos])
+        if new_date != INVALID_DATE:
+            self.rollups.add(new_date, int(columns.category[pos]), int(columns.method[pos]), float(columns.net_values(pos)))
+        if old_date != new_date:
+            if old_date != INVALID_DATE:
+                self.dates.remove(pos, old_date)
+            if new_date != INVALID_DATE:
+                self.dates.add(pos, new_date)
+
+    def get_row(self, row_index):
+        """Retorna uma cópia da linha (1-based) ou None se não existir no cache."""
+        with self.lock:
+            if 1 <= row_index <= len(self.rows):
+                return list(self.rows[row_index - 1])
+            return None
+
+    def transaction_at(self, pos):
+        """Transaction da linha de dados na posição `pos` (linha `pos + 2` da planilha)."""
+        with self.lock:
+            entry_id = self._provisional_at.get(pos + 2)
+            return Transaction.from_row(self.rows[pos + 1], row_index=-entry_id if entry_id else pos + 2)
+
+    def positions_newest_first(self, start_ord=None, end_ord=None):
+        """Posições de linhas de dados, das mais recentes (maior linha) para as mais antigas.
+
+        Sem intervalo, percorre todas as linhas; com intervalo, usa o índice de datas.
+        """
+        if start_ord is None and end_ord is None:
+            return range(len(self.rows) - 2, -1, -1)
+        return sorted(self.dates.range(start_ord, end_ord), reverse=True)
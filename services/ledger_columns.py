@@ -0,0 +1,93 @@
+import numpy as np
+from models.transaction import parse_amount, parse_date_ordinal
+
+INVALID_DATE = -1
+
+
+class LedgerColumns:
+    """Representação colunar (NumPy) das linhas de dados da planilha.
+
+    A posição `pos` corresponde à linha `pos + 2` da planilha (a linha 1 é o header).
+    Datas viram ordinais (INVALID_DATE quando não parseáveis), valores viram float64
+    e categoria/método são codificados como inteiros via dicionário.
+    """
+
+    def __init__(self, capacity=1024):
+        self.size = 0
+        self.date_ord = np.full(capacity, INVALID_DATE, dtype=np.int64)
+        self.amount = np.zeros(capacity, dtype=np.float64)
+        self.reimbursed = np.zeros(capacity, dtype=np.float64)
+        self.category = np.zeros(capacity, dtype=np.int32)
+        self.method = np.zeros(capacity, dtype=np.int32)
+        # Código 0 é reservado para "vazio"
+        self.category_codes = {"": 0}
+        self.method_codes = {"": 0}
+
+    @classmethod
+    def from_rows(cls, data_rows):
+        """Constrói as colunas a partir das linhas de dados (sem o header)."""
+        columns = cls(capacity=max(1024, len(data_rows)))
+        for pos, row in enumerate(data_rows):
+            columns.set_row(pos, row)
+        return columns
+
+    def _grow(self, min_capacity):
+        capacity = len(self.amount)
+        while capacity < min_capacity:
+            capacity *= 2
+        for name in ("date_ord", "amount", "reimbursed", "category", "method"):
+            old = getattr(self, name)
+            fill = INVALID_DATE if name == "date_ord" else 0
+            new = np.full(capacity, fill, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    @staticmethod
+    def _encode(codes, value):
+        code = codes.get(value)
+        if code is None:
+            code = len(codes)
+            codes[value] = code
+        return code
+
+    def method_code(self, method):
+        """Código do método (normalizado com title()) ou None se nunca visto."""
+        return self.method_codes.get((method or "").title())
+
+    def set_row(self, pos, row):
+        """Grava (ou sobrescreve) a linha de dados na posição `pos`."""
+        if pos >= len(self.amount):
+            self._grow(pos + 1)
+        if pos >= self.size:
+            self.size = pos + 1
+
+        def cell(i):
+            return row[i] if len(row) > i else ""
+
+        date_ord = parse_date_ordinal(cell(0))
+        self.date_ord[pos] = INVALID_DATE if date_ord is None else date_ord
+        self.amount[pos] = parse_amount(cell(1))
+        self.reimbursed[pos] = parse_amount(cell(2))
+        self.category[pos] = self._encode(self.category_codes, cell(4) or "")
+        self.method[pos] = self._encode(self.method_codes, (cell(5) or "").title())
+
+    def valid_positions(self):
+        """Posições de todas as linhas com data válida."""
+        return np.flatnonzero(self.date_ord[:self.size] != INVALID_DATE)
+
+    def filter_methods(self, positions, include_methods=None, exclude_methods=None):
+        """Restringe `positions` pelos filtros de método (máscaras booleanas)."""
+        methods = self.method[positions]
+        keep = np.ones(len(positions), dtype=bool)
+        if exclude_methods:
+            codes = [c for c in (self.method_code(m) for m in exclude_methods) if c is not None]
+            if codes:
+                keep &= ~np.isin(methods, codes)
+        if include_methods:
+            codes = [c for c in (self.method_code(m) for m in include_methods) if c is not None]
+            keep &= np.isin(methods, codes)
+        return positions[keep]
+
+    def net_values(self, positions):
+        """Valor líquido (amount + reembolsado) das linhas em `positions`."""
+        return self.amount[positions] + self.reimbursed[positions]
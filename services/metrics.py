@@ -0,0 +1,163 @@
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Limites (s) dos buckets exportados no formato Prometheus
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Ramo do handler em execução (ex: "insert", "query"), definido pelo próprio handler
+_branch = ContextVar("metrics_branch", default=None)
+
+
+def percentile(values, p):
+    """Percentil `p` (0-100) por nearest-rank: o menor valor com ao menos p% das amostras até ele (0 se vazio)."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class LatencyHistogram:
+    """Janela das últimas `window` medições (para p50/p95/p99) + buckets cumulativos."""
+
+    def __init__(self, window=500):
+        self.samples = deque(maxlen=window)
+        self.bucket_counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.samples.append(seconds)
+        self.bucket_counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def percentile(self, p):
+        """Percentil `p` (0-100) da janela recente, em segundos (0 se vazia)."""
+        return percentile(self.samples, p)
+
+
+def _escape_label(value):
+    # Escapes do formato de texto do Prometheus
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    return ",".join(f'{key}="{_escape_label(value)}"' for key, value in labels)
+
+
+class Metrics:
+    """Histogramas de latência e contadores por etapa, com rótulos.
+
+    Cada série é identificada por (nome, rótulos). Thread-safe: o Sheets também
+    é chamado de threads (validações agendadas, journal).
+    """
+
+    def __init__(self, window=500):
+        self.window = window
+        self.histograms = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def observe(self, name, seconds, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = LatencyHistogram(self.window)
+            histogram.observe(seconds)
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Mede o bloco e registra em `name` (também quando ele levanta exceção)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def set_branch(self, branch):
+        _branch.set(branch)
+
+    def current_branch(self):
+        return _branch.get()
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def render_text(self):
+        """Resumo para o /stats: p50/p95/p99 da janela recente e contadores."""
+        with self._lock:
+            histograms = sorted(self.histograms.items())
+            counters = sorted(self.counters.items())
+        if not histograms and not counters:
+            return "📈 Nenhuma métrica coletada ainda."
+
+        # Nomes e rótulos em `código`: underscores quebram o Markdown do Telegram
+        lines = ["📈 *Latência (janela recente, ms)*"]
+        current = None
+        for (name, labels), histogram in histograms:
+            if name != current:
+                current = name
+                lines.append(f"\n`{name}`")
+            label = " ".join(value for _, value in labels) or "total"
+            lines.append(
+                f"• `{label}`: p50 {histogram.percentile(50) * 1000:.0f} · "
+                f"p95 {histogram.percentile(95) * 1000:.0f} · "
+                f"p99 {histogram.percentile(99) * 1000:.0f} (n={histogram.count})"
+            )
+        if counters:
+            lines.append("\n🔢 *Contadores*")
+            for (name, labels), value in counters:
+                label = "".join(f" {label_value}" for _, label_value in labels)
+                lines.append(f"• `{name}{label}`: {value}")
+        return "\n".join(lines)
+
+    def render_prometheus(self):
+        """Exposição no formato texto do Prometheus (histogramas cumulativos e contadores)."""
+        with self._lock:
+            histograms = sorted(self.histograms.items())
+            counters = sorted(self.counters.items())
+
+        lines = []
+        typed = set()
+        for (name, labels), histogram in histograms:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ("+Inf",), histogram.bucket_counts):
+                cumulative += count
+                bucket_labels = _format_labels(labels + (("le", str(bound)),))
+                lines.append(f"{name}_bucket{{{bucket_labels}}} {cumulative}")
+            suffix = f"{{{_format_labels(labels)}}}" if labels else ""
+            lines.append(f"{name}_sum{suffix} {histogram.sum}")
+            lines.append(f"{name}_count{suffix} {histogram.count}")
+        for (name, labels), value in counters:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} counter")
+            suffix = f"{{{_format_labels(labels)}}}" if labels else ""
+            lines.append(f"{name}{suffix} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# Instância do processo: AIService, GoogleSheetsService e handlers registram aqui
+metrics = Metrics(window=int(os.getenv("METRICS_WINDOW", "500")))
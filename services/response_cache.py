@@ -0,0 +1,98 @@
+import atexit
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """Cache LRU com TTL para respostas (já parseadas) do Gemini.
+
+    Se `path` for informado, as entradas são persistidas em um arquivo JSON
+    para sobreviver a reinícios do bot. A gravação não acontece a cada `set`:
+    fica agendada (debounce de `save_delay` segundos) e roda em uma thread,
+    fora do event loop, com uma última gravação ao encerrar o processo.
+    """
+
+    def __init__(self, max_size=256, ttl=3600, path=None, save_delay=5.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self.save_delay = save_delay
+        self._entries = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+        self._save_timer = None
+        if path:
+            self._load()
+            atexit.register(self.flush)
+
+    def get(self, key):
+        # Sob o lock: o flush do timer percorre as entradas em outra thread
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            if self.path:
+                self._schedule_save()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Cache de respostas ignorado ({self.path}): {e}")
+            return
+        now = time.time()
+        for key, expires_at, value in stored:
+            if expires_at > now:
+                self._entries[key] = (expires_at, value)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _schedule_save(self):
+        """Agenda uma gravação; várias inserções seguidas viram uma escrita só (chamado com o lock)."""
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(self.save_delay, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def flush(self):
+        """Grava agora o que estiver pendente (chamado pelo timer e no encerramento)."""
+        with self._lock:
+            timer, self._save_timer = self._save_timer, None
+            if timer is None:
+                return
+            timer.cancel()
+            # Cópia feita sob o lock: a escrita do arquivo não segura o event loop
+            snapshot = [[key, expires_at, value] for key, (expires_at, value) in list(self._entries.items())]
+        self._save(snapshot)
+
+    def _save(self, snapshot):
+        # Escrita atômica: nunca deixa um arquivo pela metade
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"⚠️ Não foi possível gravar o cache de respostas ({self.path}): {e}")
@@ -0,0 +1,92 @@
+from datetime import date
+import numpy as np
+
+_EPOCH_ORD = date(1970, 1, 1).toordinal()
+
+
+def month_of(date_ord):
+    """Mês (contado a partir de 01/1970) de um ordinal de data."""
+    d = date.fromordinal(date_ord)
+    return (d.year - 1970) * 12 + d.month - 1
+
+
+def month_start(month):
+    """Ordinal do dia 1 do mês."""
+    year, month0 = divmod(month, 12)
+    return date(1970 + year, month0 + 1, 1).toordinal()
+
+
+class LedgerRollups:
+    """Agregados materializados por (mês, categoria, método).
+
+    Cada bucket guarda [gasto líquido, ganho, quantidade de transações] e é
+    atualizado em O(1) a cada linha inserida ou alterada no cache. Categoria e
+    método usam os mesmos códigos de `LedgerColumns`.
+    """
+
+    def __init__(self):
+        # mês -> {(categoria, método): [spent, gain, count]}
+        self.months = {}
+
+    @classmethod
+    def from_columns(cls, columns):
+        """Constrói todos os buckets de uma vez a partir das colunas (refresh completo)."""
+        rollups = cls()
+        positions = columns.valid_positions()
+        if not len(positions):
+            return rollups
+
+        months = (columns.date_ord[positions] - _EPOCH_ORD).astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+        net = columns.net_values(positions)
+        keys = np.stack([months, columns.category[positions], columns.method[positions]], axis=1)
+        unique_keys, group = np.unique(keys, axis=0, return_inverse=True)
+        group = group.ravel()
+        spent = np.bincount(group, weights=np.where(net < 0, -net, 0.0), minlength=len(unique_keys))
+        gain = np.bincount(group, weights=np.where(net > 0, net, 0.0), minlength=len(unique_keys))
+        count = np.bincount(group, minlength=len(unique_keys))
+
+        for (month, category, method), s, g, n in zip(unique_keys.tolist(), spent.tolist(), gain.tolist(), count.tolist()):
+            rollups.months.setdefault(month, {})[(category, method)] = [s, g, n]
+        return rollups
+
+    def add(self, date_ord, category, method, net, sign=1):
+        """Soma (sign=1) ou retira (sign=-1) a contribuição de uma transação."""
+        month = month_of(date_ord)
+        buckets = self.months.setdefault(month, {})
+        bucket = buckets.setdefault((category, method), [0.0, 0.0, 0])
+        if net < 0:
+            bucket[0] -= net * sign
+        elif net > 0:
+            bucket[1] += net * sign
+        bucket[2] += sign
+        if bucket[2] <= 0:
+            del buckets[(category, method)]
+            if not buckets:
+                del self.months[month]
+
+    def remove(self, date_ord, category, method, net):
+        self.add(date_ord, category, method, net, sign=-1)
+
+    def month_range(self):
+        """(primeiro mês, último mês + 1) com dados, ou None se vazio."""
+        if not self.months:
+            return None
+        return min(self.months), max(self.months) + 1
+
+    def totals(self, start_month, end_month, include_codes=None, exclude_codes=None):
+        """Soma os buckets dos meses em [start_month, end_month). Retorna (spent, gain, count).
+
+        include_codes/exclude_codes filtram por código de método (None = sem filtro).
+        """
+        spent = gain = 0.0
+        count = 0
+        for month in range(start_month, end_month):
+            for (_, method), (s, g, n) in self.months.get(month, {}).items():
+                if include_codes is not None and method not in include_codes:
+                    continue
+                if exclude_codes is not None and method in exclude_codes:
+                    continue
+                spent += s
+                gain += g
+                count += n
+        return spent, gain, count
@@ -0,0 +1,254 @@
+import asyncio
+import os
+import sqlite3
+import threading
+from gspread.utils import ValueInputOption
+from models.transaction import COLUMN_INDEX, Transaction, parse_amount, parse_date_ordinal
+from services.ledger_cache import LedgerCache
+from services.storage import LedgerStorage
+from utils.text import normalize_text
+
+HEADERS = ["Data", "Valor", "Reembolsado", "Descrição", "Tags", "Método de Pagamento"]
+
+# Campo do Transaction -> coluna da tabela
+FIELD_COLUMNS = {
+    "date": "date",
+    "amount": "amount",
+    "reimbursed_amount": "reimbursed",
+    "description": "description",
+    "category": "category",
+    "payment_method": "method",
+}
+
+
+class SQLiteStorage(LedgerStorage):
+    """Backend local: o ledger fica em um banco SQLite indexado.
+
+    Os row_index seguem a numeração da planilha (a primeira transação é a linha 2),
+    então o resto do bot não sabe qual backend está em uso.
+    """
+
+    is_remote = False
+
+    def __init__(self, path):
+        self.path = path
+        self.sheet_id = f"sqlite:{os.path.abspath(path)}"
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self._create_schema()
+
+        self._init_registry()
+        self._load_tags()
+        self.ledger = LedgerCache(refresh_interval=0)
+
+    def _create_schema(self):
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS transactions (
+                row_index INTEGER PRIMARY KEY,
+                date TEXT NOT NULL,
+                date_ord INTEGER,
+                amount REAL NOT NULL DEFAULT 0,
+                reimbursed REAL NOT NULL DEFAULT 0,
+                description TEXT,
+                description_norm TEXT,
+                category TEXT,
+                method TEXT,
+                synced INTEGER NOT NULL DEFAULT 0,
+                version INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions (date_ord);
+            CREATE INDEX IF NOT EXISTS idx_transactions_method ON transactions (method, date_ord);
+            CREATE INDEX IF NOT EXISTS idx_transactions_description ON transactions (description_norm);
+            CREATE INDEX IF NOT EXISTS idx_transactions_unsynced ON transactions (row_index) WHERE synced = 0;
+            CREATE TABLE IF NOT EXISTS tags (
+                name TEXT NOT NULL,
+                type TEXT NOT NULL,
+                PRIMARY KEY (name, type)
+            );
+        """)
+
+    def _load_tags(self):
+        with self._lock:
+            rows = self.conn.execute("SELECT name, type FROM tags ORDER BY rowid").fetchall()
+        for name, category_type in rows:
+            tags = self.expense_tags if category_type == 'expense' else self.income_tags
+            if name not in tags:
+                tags.append(name)
+        self.tag_options = list(set(self.expense_tags + self.income_tags))
+
+    @staticmethod
+    def _to_record(row):
+        """Linha no formato da planilha -> valores das colunas da tabela."""
+        row = list(row) + [""] * (6 - len(row))
+        return (
+            str(row[0]),
+            parse_date_ordinal(row[0]),
+            parse_amount(row[1]),
+            parse_amount(row[2]),
+            row[3] or None,
+            normalize_text(row[3]) or None,
+            row[4] or None,
+            row[5] or None,
+        )
+
+    @staticmethod
+    def _format_number(value):
+        # Precisão completa (repr); inteiros sem ".0", como a planilha mostra
+        return str(int(value)) if value.is_integer() else repr(value)
+
+    @classmethod
+    def _to_row(cls, record):
+        date, amount, reimbursed, description, category, method = record
+        return [date, cls._format_number(amount), cls._format_number(reimbursed), description or "", category or "", method or ""]
+
+    def setup_headers(self):
+        return "Banco SQLite pronto."
+
+    def refresh_ledger(self):
+        self.ledger.refresh(self._read_rows)
+        return len(self.ledger.rows)
+
+    def _read_rows(self):
+        with self._lock:
+            records = self.conn.execute(
+                "SELECT row_index, date, amount, reimbursed, description, category, method FROM transactions ORDER BY row_index"
+            ).fetchall()
+        rows = [list(HEADERS)]
+        for row_index, *record in records:
+            # Mantém rows[row_index - 1] alinhado mesmo se houver buracos
+            while len(rows) < row_index - 1:
+                rows.append([])
+            rows.append(self._to_row(record))
+        return rows
+
+    def add_expense(self, valor, descricao, reembolsado=0, tags="", metodo_pagamento="", data_custom=None):
+        nova_linha = self._new_row(valor, descricao, reembolsado, tags, metodo_pagamento, data_custom)
+        return self.append_rows([nova_linha])[0]
+
+    def append_rows(self, rows):
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            next_row = self.conn.execute("SELECT COALESCE(MAX(row_index), 1) + 1 FROM transactions").fetchone()[0]
+            row_numbers = list(range(next_row, next_row + len(rows)))
+            self.conn.executemany(
+                "INSERT INTO transactions (row_index, date, date_ord, amount, reimbursed, description, description_norm, category, method) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(row_number, *self._to_record(row)) for row_number, row in zip(row_numbers, rows)]
+            )
+            self.conn.execute("COMMIT")
+        for row_number, row in zip(row_numbers, rows):
+            self.ledger.append_row(row_number, row)
+        return row_numbers
+
+    def update_transaction(self, row_index, changes):
+        if not changes:
+            return
+        assignments = [f"{FIELD_COLUMNS[field]} = ?" for field in changes]
+        values = list(changes.values())
+        if "date" in changes:
+            assignments.append("date_ord = ?")
+            values.append(parse_date_ordinal(changes["date"]))
+        if "description" in changes:
+            assignments.append("description_norm = ?")
+            values.append(normalize_text(changes["description"]) or None)
+        with self._lock:
+            self.conn.execute(
+                f"UPDATE transactions SET {', '.join(assignments)}, synced = 0, version = version + 1 WHERE row_index = ?",
+                (*values, row_index)
+            )
+        for field, value in changes.items():
+            self.ledger.update_cell(row_index, COLUMN_INDEX[field], value)
+
+    def add_category(self, category, category_type='expense'):
+        tags = self.expense_tags if category_type == 'expense' else self.income_tags
+        if category in tags:
+            return False
+        with self._lock:
+            self.conn.execute("INSERT OR IGNORE INTO tags (name, type) VALUES (?, ?)", (category, category_type))
+        tags.append(category)
+        self.tag_options = list(set(self.expense_tags + self.income_tags))
+        return True
+
+    def scan_range(self, start_ord=None, end_ord=None, method=None, description=None):
+        """Range scan direto no SQLite (índices em date_ord, method e description_norm)."""
+        query = "SELECT row_index, date, amount, reimbursed, description, category, method FROM transactions WHERE date_ord IS NOT NULL"
+        params = []
+        if start_ord is not None:
+            query += " AND date_ord >= ?"
+            params.append(start_ord)
+        if end_ord is not None:
+            query += " AND date_ord < ?"
+            params.append(end_ord)
+        if method is not None:
+            query += " AND method = ?"
+            params.append(method)
+        if description is not None:
+            query += " AND description_norm = ?"
+            params.append(normalize_text(description))
+        query += " ORDER BY row_index DESC"
+        with self._lock:
+            records = self.conn.execute(query, params).fetchall()
+        return [Transaction.from_row(self._to_row(record), row_index=row_index) for row_index, *record in records]
+
+    # --- Espelhamento para a planilha ---
+
+    def unsynced_rows(self, limit=500):
+        """Linhas criadas/alteradas desde o último espelhamento: [(row_index, version, row)]."""
+        with self._lock:
+            records = self.conn.execute(
+                "SELECT row_index, version, date, amount, reimbursed, description, category, method "
+                "FROM transactions WHERE synced = 0 ORDER BY row_index LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [(row_index, version, self._to_row(record)) for row_index, version, *record in records]
+
+    def mark_synced(self, rows):
+        """Marca como espelhadas as linhas [(row_index, version)] ainda nessa versão.
+
+        Uma linha editada depois de lida por `unsynced_rows` mudou de versão e
+        continua pendente para a próxima rodada.
+        """
+        with self._lock:
+            self.conn.executemany(
+                "UPDATE transactions SET synced = 1 WHERE row_index = ? AND version = ?",
+                list(rows)
+            )
+
+
+class SheetsMirror:
+    """Espelhamento de mão única SQLite -> Google Sheets, para consulta humana.
+
+    Cada linha é escrita na mesma posição (row_index) da planilha com um único
+    batch_update por rodada; a planilha nunca é lida de volta.
+    """
+
+    def __init__(self, storage, sheets, interval=30.0):
+        self.storage = storage
+        self.sheets = sheets
+        self.interval = interval
+
+    def sync_once(self):
+        pending = self.storage.unsynced_rows()
+        if not pending:
+            return 0
+        ws = self.sheets.ws
+        last_row = pending[-1][0]
+        if last_row > ws.row_count:
+            ws.add_rows(last_row - ws.row_count)
+        ws.batch_update(
+            [{"range": f"A{row_index}:F{row_index}", "values": [row]} for row_index, _, row in pending],
+            value_input_option=ValueInputOption.user_entered
+        )
+        self.storage.mark_synced([(row_index, version) for row_index, version, _ in pending])
+        return len(pending)
+
+    async def run(self):
+        while True:
+            try:
+                synced = await asyncio.to_thread(self.sync_once)
+                if synced:
+                    print(f"🪞 Espelho: {synced} linha(s) enviada(s) para a planilha")
+            except Exception as e:
+                print(f"⚠️ Falha ao espelhar o SQLite na planilha: {e}")
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,191 @@
+import os
+from abc import ABC, abstractmethod
+from datetime import datetime
+from models.transaction import Transaction, parse_amount
+from utils.text import normalize_text
+
+DEFAULT_EXPENSE_TAGS = ["Mercado", "Viagem", "Restaurante", "Academia", "Compras", "Gasolina", "Uber", "Outros"]
+DEFAULT_INCOME_TAGS = ["Salário", "Presente", "Reembolso", "Outros"]
+DEFAULT_METODO_OPTIONS = ["Pix", "Crédito", "Débito", "Caju"]
+# Um banco por planilha: usuários diferentes nunca dividem o mesmo arquivo
+DEFAULT_SQLITE_PATH = "telegrana_{sheet_id}.db"
+
+
+class LedgerStorage(ABC):
+    """Interface comum dos backends de armazenamento do ledger.
+
+    Todo backend expõe as linhas no formato da planilha (Data, Valor, Reembolsado,
+    Descrição, Tags, Método de Pagamento), endereçadas por row_index 1-based com o
+    header na linha 1, e mantém um `LedgerCache` (`self.ledger`) write-through.
+    """
+
+    # True quando cada escrita custa uma chamada de rede (habilita o write-behind)
+    is_remote = True
+
+    def _init_registry(self):
+        self.expense_tags = list(DEFAULT_EXPENSE_TAGS)
+        self.income_tags = list(DEFAULT_INCOME_TAGS)
+        self.tag_options = list(set(self.expense_tags + self.income_tags))
+        self.metodo_options = list(DEFAULT_METODO_OPTIONS)
+
+    @staticmethod
+    def _new_row(valor, descricao, reembolsado, tags, metodo_pagamento, data_custom):
+        data = data_custom or datetime.now().strftime('%d/%m/%Y %H:%M')
+        # Ordem: Data, Valor, Reembolsado, Descrição, Tags, Método de Pagamento
+        return [data, valor, reembolsado, descricao, tags, metodo_pagamento]
+
+    # --- Operações que cada backend implementa ---
+
+    @abstractmethod
+    def setup_headers(self):
+        """Prepara o armazenamento vazio. Retorna uma mensagem de status."""
+
+    @abstractmethod
+    def refresh_ledger(self):
+        """Recarrega o cache a partir do armazenamento. Retorna o número de linhas."""
+
+    @abstractmethod
+    def add_expense(self, valor, descricao, reembolsado=0, tags="", metodo_pagamento="", data_custom=None):
+        """Adiciona uma linha e retorna seu row_index."""
+
+    @abstractmethod
+    def append_rows(self, rows):
+        """Adiciona várias linhas de uma vez e retorna a lista de row_index."""
+
+    @abstractmethod
+    def update_transaction(self, row_index, changes):
+        """Atualiza campos de uma linha a partir de um diff parcial {campo: valor}."""
+
+    @abstractmethod
+    def add_category(self, category, category_type='expense'):
+        """Registra uma nova tag. Retorna True se ela ainda não existia."""
+
+    # --- Leitura (servida pelo cache) ---
+
+    def get_ledger(self):
+        """Retorna o cache do ledger, recarregando se estiver desatualizado."""
+        if self.ledger.is_stale():
+            self.refresh_ledger()
+        return self.ledger
+
+    def get_all_rows(self):
+        """Retorna todas as linhas (servidas pelo cache em memória)."""
+        return self.get_ledger().rows
+
+    def iter_transactions(self, reverse=False):
+        """Transações na ordem da planilha (reverse=True: mais recentes primeiro)."""
+        ledger = self.get_ledger()
+        positions = ledger.positions_newest_first()
+        for pos in (positions if reverse else reversed(positions)):
+            if any(ledger.rows[pos + 1]):
+                yield ledger.transaction_at(pos)
+
+    def scan_range(self, start_ord=None, end_ord=None, method=None, description=None):
+        """Transações com data em [start_ord, end_ord), das mais recentes para as mais antigas.
+
+        `method` e `description` filtram por igualdade (a descrição sem acentos e
+        sem diferenciar maiúsculas). Aqui a leitura vem do cache; o SQLite responde
+        direto pelos índices da tabela.
+        """
+        ledger = self.get_ledger()
+        wanted = normalize_text(description) if description is not None else None
+        result = []
+        for pos in ledger.positions_newest_first(start_ord, end_ord):
+            t = ledger.transaction_at(pos)
+            if t.date_ordinal is None:
+                continue
+            if method is not None and t.payment_method != method:
+                continue
+            if wanted is not None and normalize_text(t.description) != wanted:
+                continue
+            result.append(t)
+        return result
+
+    def find_appended(self, rows, lookback=20):
+        """Procura `rows`, em sequência, entre as últimas linhas gravadas.
+
+        Usado pelo journal quando um append_rows pode ter sido gravado sem que a
+        resposta chegasse. Retorna os row_index das linhas ou None se não estão lá.
+        """
+        wanted = [self._row_key(Transaction.from_row([str(v) for v in row])) for row in rows]
+        recent = []
+        for t in self.iter_transactions(reverse=True):
+            if t.row_index < 0:
+                # Linha provisória do próprio journal
+                continue
+            recent.append(t)
+            if len(recent) >= len(wanted) + lookback:
+                break
+        recent.reverse()
+        # A ocorrência mais recente, em linhas consecutivas
+        for start in range(len(recent) - len(wanted), -1, -1):
+            block = recent[start:start + len(wanted)]
+            if [self._row_key(t) for t in block] == wanted and all(
+                t.row_index == block[0].row_index + i for i, t in enumerate(block)
+            ):
+                return [t.row_index for t in block]
+        return None
+
+    @staticmethod
+    def _row_key(t):
+        return (t.date, round(t.amount, 2), t.description or "", t.category or "", t.payment_method or "")
+
+    # --- Atualizações pontuais (atalhos para update_transaction) ---
+
+    def update_reimbursement(self, row_index, valor_reembolsado):
+        """Atualiza o valor reembolsado de uma despesa (coluna C)."""
+        self.update_transaction(row_index, {"reimbursed_amount": valor_reembolsado})
+
+    def update_expense_category(self, row_index, category):
+        """Atualiza a categoria (tag) de uma despesa (coluna E)."""
+        self.update_transaction(row_index, {"category": category})
+
+    def update_expense_value(self, row_index, value):
+        """Atualiza o valor de uma despesa (coluna B)."""
+        self.update_transaction(row_index, {"amount": value})
+
+    def update_description(self, row_index, description):
+        """Atualiza a descrição de uma despesa (coluna D)."""
+        self.update_transaction(row_index, {"description": description})
+
+    def update_payment_method(self, row_index, method):
+        """Atualiza o método de pagamento de uma despesa (coluna F)."""
+        self.update_transaction(row_index, {"payment_method": method})
+
+    def get_expense_value(self, row_data):
+        """Extrai o valor (coluna B) de uma linha de despesa."""
+        return parse_amount(row_data[1]) if len(row_data) > 1 else 0.0
+
+
+def create_storage(sheet_id=None):
+    """Instancia o backend configurado em STORAGE_BACKEND ("sheets" ou "sqlite").
+
+    Args:
+        sheet_id: Planilha do usuário (padrão: GOOGLE_SHEET_ID). No SQLite, um
+            "{sheet_id}" em SQLITE_PATH separa o banco de cada planilha.
+    """
+    backend = os.getenv("STORAGE_BACKEND", "sheets").lower()
+    if backend == "sqlite":
+        from services.sqlite_storage import SQLiteStorage
+        sheet_id = sheet_id or os.getenv("GOOGLE_SHEET_ID") or "default"
+        return SQLiteStorage(os.getenv("SQLITE_PATH", DEFAULT_SQLITE_PATH).format(sheet_id=sheet_id))
+    if backend == "sheets":
+        from services.google_sheets import GoogleSheetsService
+        return GoogleSheetsService(sheet_id=sheet_id)
+    raise ValueError(f"❌ STORAGE_BACKEND inválido: {backend}")
+
+
+def check_storage_config(sheet_count):
+    """Recusa um SQLITE_PATH fixo quando há mais de uma planilha configurada.
+
+    Sem "{sheet_id}" no caminho, todas as planilhas abririam o mesmo banco e os
+    lançamentos de um usuário apareceriam para os outros.
+    """
+    if os.getenv("STORAGE_BACKEND", "sheets").lower() != "sqlite" or sheet_count <= 1:
+        return
+    path = os.getenv("SQLITE_PATH", DEFAULT_SQLITE_PATH)
+    if "{sheet_id}" not in path:
+        raise ValueError(
+            f"❌ SQLITE_PATH={path} é compartilhado por {sheet_count} planilhas: use {{sheet_id}} no caminho "
+            f"(ex: {DEFAULT_SQLITE_PATH})"
+        )
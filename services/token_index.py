@@ -0,0 +1,74 @@
+from utils.text import tokenize
+
+
+class TokenIndex:
+    """Índice invertido: token normalizado da descrição -> posições das linhas.
+
+    A busca por um termo casa tokens que *contêm* o termo (mesma semântica de
+    substring da busca antiga), mas percorre o vocabulário em vez das linhas.
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self._row_tokens = {}
+        # Memoização termo -> tokens do vocabulário que o contêm
+        self._term_tokens = {}
+
+    @classmethod
+    def from_descriptions(cls, descriptions):
+        """Constrói o índice a partir das descrições (posição = índice na lista)."""
+        index = cls()
+        for pos, description in enumerate(descriptions):
+            index.add(pos, description)
+        return index
+
+    def add(self, pos, description):
+        tokens = set(tokenize(description))
+        if not tokens:
+            return
+        self._row_tokens[pos] = tokens
+        for token in tokens:
+            posting = self.postings.get(token)
+            if posting is None:
+                self.postings[token] = posting = set()
+                self._term_tokens.clear()
+            posting.add(pos)
+
+    def remove(self, pos):
+        for token in self._row_tokens.pop(pos, ()):
+            posting = self.postings[token]
+            posting.discard(pos)
+            if not posting:
+                del self.postings[token]
+                self._term_tokens.clear()
+
+    def update(self, pos, description):
+        """Reindexa a linha caso a descrição tenha mudado."""
+        if set(tokenize(description)) == self._row_tokens.get(pos, set()):
+            return
+        self.remove(pos)
+        self.add(pos, description)
+
+    def lookup(self, term):
+        """Posições cujas descrições têm algum token contendo `term` (já normalizado)."""
+        tokens = self._term_tokens.get(term)
+        if tokens is None:
+            tokens = tuple(token for token in self.postings if term in token)
+            self._term_tokens[term] = tokens
+        if len(tokens) == 1:
+            return self.postings[tokens[0]]
+        return set().union(*(self.postings[token] for token in tokens))
+
+    def match_all(self, terms):
+        """Interseção das posting lists de todos os termos."""
+        result = None
+        for term in sorted(terms, key=len, reverse=True):
+            posting = self.lookup(term)
+            result = set(posting) if result is None else result & posting
+            if not result:
+                break
+        return result or set()
+
+    def match_any(self, terms):
+        """União das posting lists dos termos."""
+        return set().union(*(self.lookup(term) for term in terms))
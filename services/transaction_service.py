@@ -1,23 +1,35 @@
-from services.google_sheets import GoogleSheetsService
-from models.transaction import Transaction
-import unicodedata
-
-def normalize_text(text):
-    """Remove acentos e converte para minúsculas."""
-    if not text: return ""
-    return "".join(
-        c for c in unicodedata.normalize('NFD', str(text).lower())
-        if unicodedata.category(c) != 'Mn'
-    )
+from datetime import datetime
+from services.storage import create_storage
+from services.journal import flush_pending
+from services.rollups import month_of, month_start
+from models.transaction import Transaction, parse_date_ordinal
+from utils.text import normalize_text, tokenize
+import numpy as np
+
+# Mapeamento de métodos comuns
+METODO_MAP = {
+    "pix": "Pix", 
+    "crédito": "Crédito", "credito": "Crédito", 
+    "débito": "Débito", "debito": "Débito", 
+    "caju": "Caju"
+}
 
 class TransactionService:
-    def __init__(self):
-        self.sheets = GoogleSheetsService()
+    def __init__(self, storage=None, journal=None):
+        # Backend do ledger (Sheets ou SQLite, ver STORAGE_BACKEND)
+        self.sheets = storage or create_storage()
+        # Journal local opcional: inserções respondem na hora e são enviadas em background.
+        # Só faz sentido quando cada escrita é uma chamada de rede.
+        self.journal = journal if self.sheets.is_remote else None
 
     def initialize_sheet(self):
         """Verifica se a planilha está vazia e cria os headers se necessário."""
         return self.sheets.setup_headers()
 
+    def refresh_ledger(self):
+        """Recarrega o cache de linhas a partir da planilha (sob demanda)."""
+        return self.sheets.refresh_ledger()
+
     @property
     def tag_options(self):
         return self.sheets.tag_options
@@ -37,16 +49,60 @@ class TransactionService:
     def add_category(self, category):
         return self.sheets.add_category(category)
 
+    def _candidate_positions(self, ledger, date_str, desc_positions=None):
+        """
+        Posições candidatas (mais recentes primeiro) para um filtro de data e,
+        opcionalmente, um conjunto de posições vindo do índice de descrições.
+        Retorna (positions, substring): se a data for completa (dd/mm/yyyy), usa o
+        índice de datas e substring é None; senão o chamador aplica o teste de
+        substring antigo.
+        """
+        date_ord = parse_date_ordinal(date_str) if date_str else None
+        if date_ord is not None:
+            positions = ledger.positions_newest_first(date_ord, date_ord + 1)
+            if desc_positions is not None:
+                positions = [pos for pos in positions if pos in desc_positions]
+            return positions, None
+
+        substring = date_str or None
+        if desc_positions is not None:
+            return sorted(desc_positions, reverse=True), substring
+        return ledger.positions_newest_first(), substring
+
+    def _scan_recent(self, predicate, limit=5):
+        """
+        Busca sem o cache: percorre a planilha das linhas mais recentes para as
+        mais antigas, página a página, e para nos primeiros `limit` resultados.
+        """
+        matches = []
+        for transaction in self.sheets.iter_transactions(reverse=True):
+            if predicate(transaction):
+                matches.append(transaction)
+                if len(matches) >= limit:
+                    break
+        return matches
+
+    @staticmethod
+    def _description_matches(description, terms, match=any):
+        """Mesma semântica do índice de descrições: cada termo deve estar contido em algum token."""
+        tokens = tokenize(description)
+        return match(any(term in token for token in tokens) for term in terms)
+
+    @staticmethod
+    def _date_matches(transaction, date_str, date_ord, substring_cell):
+        """Filtro de data do modo sem cache (data completa por ordinal, parcial por substring)."""
+        if date_ord is not None:
+            return transaction.date_ordinal == date_ord
+        return date_str in substring_cell
+
     def find_expense_by_date_and_desc(self, data_compra, descricao_compra):
         """Busca uma despesa por data (opcional) e descrição (fuzzy). Retorna lista de Transaction."""
-        all_rows = self.sheets.get_all_rows()
         matches = []
         
-        # Stopwords para ignorar na busca
-        stopwords = {"de", "do", "da", "em", "no", "na", "com", "a", "o", "compra", "gasto", "despesa"}
-        
-        # Prepara termos de busca
-        search_terms = [word.lower() for word in descricao_compra.split() if word.lower() not in stopwords]
+        # Prepara termos de busca (sem acentos e sem stopwords)
+        search_terms = tokenize(descricao_compra) or normalize_text(descricao_compra).split()
+        if not search_terms:
+            return matches
         
         # Data de busca normalizada (se existir)
         data_busca_norm = None
@@ -54,65 +110,50 @@ class TransactionService:
              parts = data_compra.split('/')
              if len(parts) >= 2: 
                  data_busca_norm = data_compra
+
+        if not self.sheets.ledger.is_loaded:
+            # Cache frio: lê só as páginas mais recentes em vez da planilha inteira
+            date_ord = parse_date_ordinal(data_busca_norm) if data_busca_norm else None
+            return self._scan_recent(lambda t: (
+                not t.is_income
+                and t.reimbursed_amount < abs(t.amount)
+                and (not data_busca_norm or self._date_matches(t, data_busca_norm, date_ord, t.date.split()[0]))
+                and self._description_matches(t.description, search_terms, any)
+            ))
+
+        ledger = self.sheets.get_ledger()
+        # Escritas de outras threads (pool da planilha, flush do journal) esperam a busca terminar
+        with ledger.lock:
+            # Descrição via índice invertido: um termo deve casar; com vários, basta um
+            desc_positions = ledger.tokens.match_any(search_terms)
         
-        # Itera de trás pra frente (mais recentes primeiro)
-        # Offset start=2 because header is 1, and 0-indexed list implies row 2 is index 1. 
-        # Wait, enumerate idx matches row number in sheet logic?
-        # get_all_rows returns list of lists.
-        # Row 1 is header. Row 2 is first 
-        # enumerate(all_rows[1:], start=2) means idx is the actual 1-based row number in Sheets. Correct.
-        data_rows = list(enumerate(all_rows[1:], start=2))
-        data_rows.reverse() 
+            # Itera de trás pra frente (mais recentes primeiro), só nos candidatos
+            positions, data_substring = self._candidate_positions(ledger, data_busca_norm, desc_positions)
         
-        for idx, row in data_rows:
-            transaction = Transaction.from_row(row, row_index=idx)
+            for pos in positions:
+                transaction = ledger.transaction_at(pos)
             
-            # 1. Verifica Reembolso e Se é Gasto
-            # Ignorar Entradas (Valores positivos) - Lógica de Negócio!
-            if transaction.is_income:
-                continue
+                # 1. Verifica Reembolso e Se é Gasto
+                # Ignorar Entradas (Valores positivos) - Lógica de Negócio!
+                if transaction.is_income:
+                    continue
                 
-            if transaction.reimbursed_amount >= abs(transaction.amount):
-                continue
-
-            # 2. Verifica Data (se fornecida)
-            match_data = True
-            if data_busca_norm:
-                data_celula_date_part = transaction.date.split()[0]
-                if data_busca_norm not in data_celula_date_part:
-                    match_data = False
-            
-            # 3. Verifica Descrição (Fuzzy)
-            match_desc = False
-            desc_lower = (transaction.description or "").lower()
-            
-            if not search_terms: 
-                 search_terms = [w.lower() for w in descricao_compra.split()]
+                if transaction.reimbursed_amount >= abs(transaction.amount):
+                    continue
 
-            found_terms = 0
-            for term in search_terms:
-                if term in desc_lower:
-                    found_terms += 1
-            
-            if len(search_terms) == 1:
-                match_desc = found_terms == 1
-            else:
-                match_desc = found_terms >= 1
+                # 2. Verifica Data (datas parciais, fora do índice)
+                if data_substring and data_substring not in transaction.date.split()[0]:
+                    continue
             
-            if match_data and match_desc:
                 matches.append(transaction)
                 if len(matches) >= 5: break
         
-        return matches
+            return matches
 
     def find_transaction(self, date_query=None, amount_query=None, desc_query=None):
         """Busca genérica para edição passada. Retorna lista de Transaction."""
         from datetime import datetime, timedelta # Import local ou mover pro topo
         
-        all_rows = self.sheets.get_all_rows()
-        data_rows = list(enumerate(all_rows[1:], start=2))
-        data_rows.reverse()
-        
         matches = []
         
         # Normalização do date_query
@@ -125,35 +166,39 @@ class TransactionService:
             else:
                 date_check = date_query
 
-        for idx, row in data_rows:
-            transaction = Transaction.from_row(row, row_index=idx)
-            
-            # Checa Data
-            if date_check and date_check not in transaction.date:
-                continue
+        keywords = (tokenize(desc_query) or normalize_text(desc_query).split()) if desc_query else []
+
+        if not self.sheets.ledger.is_loaded:
+            # Cache frio: lê só as páginas mais recentes em vez da planilha inteira
+            date_ord = parse_date_ordinal(date_check) if date_check else None
+            return self._scan_recent(lambda t: (
+                (not date_check or self._date_matches(t, date_check, date_ord, t.date))
+                and (amount_query is None or abs(t.amount) == abs(amount_query))
+                and self._description_matches(t.description, keywords, all)
+            ))
+
+        ledger = self.sheets.get_ledger()
+        with ledger.lock:
+            # Descrição via índice invertido: todas as palavras devem casar
+            desc_positions = ledger.tokens.match_all(keywords) if keywords else None
+            positions, date_substring = self._candidate_positions(ledger, date_check, desc_positions)
+
+            for pos in positions:
+                transaction = ledger.transaction_at(pos)
             
-            # Checa Valor
-            if amount_query is not None:
-                if abs(transaction.amount) != abs(amount_query):
-                     continue
-
-            # Checa Descrição
-            if desc_query:
-                query_norm = normalize_text(desc_query)
-                keywords = query_norm.split()
-                desc_norm = normalize_text(transaction.description or "")
-                all_found = True
-                for kw in keywords:
-                    if kw not in desc_norm:
-                        all_found = False
-                        break
-                if not all_found:
+                # Checa Data (datas parciais, fora do índice)
+                if date_substring and date_substring not in transaction.date:
                     continue
             
-            matches.append(transaction)
-            if len(matches) >= 5: break
+                # Checa Valor
+                if amount_query is not None:
+                    if abs(transaction.amount) != abs(amount_query):
+                         continue
             
-        return matches
+                matches.append(transaction)
+                if len(matches) >= 5: break
+            
+            return matches
         
     def get_expense_value(self, row_data):
         return self.sheets.get_expense_value(row_data)
@@ -168,6 +213,9 @@ class TransactionService:
         - Se normal: atualiza original.
         Retorna um dict com resultados para a UI.
         """
+        if transaction.row_index is not None and transaction.row_index < 0:
+            # Gasto ainda no journal: envia agora para saber a linha real
+            transaction.row_index = self.resolve_row_index(transaction.row_index)
         valor_compra_abs = abs(transaction.amount)
         diferenca = valor_reembolsado - valor_compra_abs
         
@@ -206,20 +254,23 @@ class TransactionService:
         """
         Limpa dados e salva nova transação.
         """
-        # Mapeamento de métodos comuns
-        metodo_map = {
-            "pix": "Pix", 
-            "crédito": "Crédito", "credito": "Crédito", 
-            "débito": "Débito", "debito": "Débito", 
-            "caju": "Caju"
-        }
-        
         if metodo:
-            metodo_clean = metodo_map.get(metodo.lower(), metodo.capitalize())
+            metodo_clean = METODO_MAP.get(metodo.lower(), metodo.capitalize())
         else:
             metodo_clean = ""
             
-        row_index = self.sheets.add_expense(valor, descricao, 0, tags, metodo_clean, data_custom=data)
+        if self.journal:
+            # Write-behind: grava no journal local e devolve um row_index provisório (negativo)
+            data_linha = data or datetime.now().strftime('%d/%m/%Y %H:%M')
+            row = [data_linha, valor, 0, descricao, tags, metodo_clean]
+            # Linha provisória no cache: consultas e buscas já a veem antes do flush.
+            # O lock impede que o flush a remova (settle) antes de ela ser adicionada.
+            with self.sheets.ledger.lock:
+                entry_id = self.journal.append(self.sheets.sheet_id, row)
+                self.sheets.ledger.add_provisional(entry_id, row)
+            row_index = -entry_id
+        else:
+            row_index = self.sheets.add_expense(valor, descricao, 0, tags, metodo_clean, data_custom=data)
         
         return {
             "row_index": row_index,
@@ -231,94 +282,147 @@ class TransactionService:
             "is_expense": valor < 0
         }
 
-    def calculate_totals(self, start_date_str=None, end_date_str=None, query_type=None, exclude_methods=None, include_methods=None):
+    def calculate_totals(self, start_date_str=None, end_date_str=None, query_type=None, exclude_methods=None, include_methods=None, items_limit=None):
         """
         Calcula totais de gastos ou ganhos baseado em um range de datas e filtros.
         Gasto = abs(Amount + Reimbursed) para Amount < 0.
         Ganho = Amount para Amount > 0.
+
+        Os totais vêm sempre dos agregados mensais (só as bordas de meses parciais
+        são somadas a partir das linhas). Se `items_limit` for informado, "items"
+        traz apenas os N maiores gastos e os N maiores ganhos (suficiente para o
+        resumo do bot); com items_limit=0 nenhuma linha é listada.
         """
-        from datetime import datetime, timedelta
-        
-        all_rows = self.sheets.get_all_rows()
-        now = datetime.now()
-        
-        start_date = None
-        if start_date_str:
-            try:
-                start_date = datetime.strptime(start_date_str, "%d/%m/%Y")
-            except ValueError:
-                pass
-        
-        end_date = None
-        if end_date_str:
-            try:
-                end_date = datetime.strptime(end_date_str, "%d/%m/%Y")
-            except ValueError:
-                pass
-        
-        total_spent = 0.0
-        total_gain = 0.0
-        items_included = []
-        
-        # Filtros normalizados
-        excl_norm = [m.title() for m in (exclude_methods or [])]
-        incl_norm = [m.title() for m in (include_methods or [])]
+        ledger = self.sheets.get_ledger()
+        with ledger.lock:
+            columns = ledger.columns
 
-        for row in all_rows[1:]:
-            t = Transaction.from_row(row)
-            
-            # 1. Filtro de Data
-            try:
-                t_date_str = t.date.split()[0]
-                t_date = datetime.strptime(t_date_str, "%d/%m/%Y")
-                
-                if start_date and t_date < start_date:
-                    continue
-                if end_date and t_date >= end_date:
-                    continue
-            except (ValueError, IndexError, TypeError):
-                continue
-                
-            # 2. Filtro de Métodos (Caju, Crédito, etc)
-            metodo_t = (t.payment_method or "").title()
-            
-            if excl_norm and metodo_t in excl_norm:
-                continue
-            if incl_norm and metodo_t not in incl_norm:
-                continue
-            
-            # 3. Lógica de Cálculo
-            # Gasto Líquido = Amount + Reimbursed (se < 0)
-            # Ganho = Amount + Reimbursed (se > 0)
-            net_val = t.amount + t.reimbursed_amount
-            
-            if net_val < 0:
-                abs_net = abs(net_val)
-                total_spent += abs_net
-                items_included.append({
-                    "desc": t.description or "Sem descrição",
-                    "val": -abs_net,
-                    "date": t_date_str
-                })
-            elif net_val > 0:
-                total_gain += net_val
-                items_included.append({
-                    "desc": t.description or "Sem descrição",
-                    "val": net_val,
-                    "date": t_date_str
+            start_ord = parse_date_ordinal(start_date_str) if start_date_str else None
+            end_ord = parse_date_ordinal(end_date_str) if end_date_str else None
+
+            total_spent, total_gain = self._rollup_totals(ledger, start_ord, end_ord, include_methods, exclude_methods)
+            result = {
+                "spent": total_spent,
+                "gain": total_gain,
+                "balance": total_gain - total_spent,
+                "items": [],
+                "query_type": query_type
+            }
+            if items_limit == 0:
+                return result
+
+            # Itens: filtros vetorizados sobre as colunas do cache
+            if start_ord is None and end_ord is None:
+                positions = columns.valid_positions()
+            else:
+                # Busca binária no índice de datas: só as linhas do período são tocadas
+                positions = np.array(ledger.dates.range(start_ord, end_ord), dtype=np.int64)
+            positions = columns.filter_methods(positions, include_methods, exclude_methods)
+            net = columns.net_values(positions)
+
+            # Se net == 0, a linha não entra (totalmente reembolsada)
+            spent_sel = net < 0
+            gain_sel = net > 0
+
+            if items_limit is None:
+                selected = np.flatnonzero(spent_sel | gain_sel)
+                selected = selected[np.argsort(positions[selected], kind="stable")]
+            else:
+                selected = np.concatenate([
+                    self._top_indices(spent_sel, -net, items_limit),
+                    self._top_indices(gain_sel, net, items_limit),
+                ])
+
+            for i in selected:
+                row = ledger.rows[positions[i] + 1]
+                result["items"].append({
+                    "desc": (row[3] if len(row) > 3 else "") or "Sem descrição",
+                    "val": float(net[i]),
+                    "date": row[0].split()[0]
                 })
-            # Se net_val == 0, ignoramos do total (totalmente reembolsado)
-                
-        return {
-            "spent": total_spent,
-            "gain": total_gain,
-            "balance": total_gain - total_spent,
-            "items": items_included,
-            "query_type": query_type
-        }
+            return result
+
+    @staticmethod
+    def _rollup_totals(ledger, start_ord, end_ord, include_methods=None, exclude_methods=None):
+        """
+        (gasto, ganho) no intervalo [start_ord, end_ord): os meses inteiros vêm dos
+        rollups e só as bordas (meses parciais) são somadas a partir das linhas.
+        """
+        columns = ledger.columns
+        bounds = ledger.rollups.month_range()
+        if bounds is None:
+            return 0.0, 0.0
+
+        # Meses inteiros contidos no intervalo: [first_month, last_month)
+        first_month = bounds[0]
+        if start_ord is not None:
+            first_month = month_of(start_ord)
+            if month_start(first_month) < start_ord:
+                first_month += 1
+        last_month = month_of(end_ord) if end_ord is not None else bounds[1]
+
+        if first_month < last_month:
+            include_codes = exclude_codes = None
+            if include_methods:
+                include_codes = {columns.method_code(m) for m in include_methods} - {None}
+            if exclude_methods:
+                exclude_codes = {columns.method_code(m) for m in exclude_methods} - {None}
+            total_spent, total_gain, _ = ledger.rollups.totals(
+                max(first_month, bounds[0]), min(last_month, bounds[1]), include_codes, exclude_codes
+            )
+            edges = []
+            if start_ord is not None:
+                edges.append((start_ord, month_start(first_month)))
+            if end_ord is not None:
+                edges.append((month_start(last_month), end_ord))
+        else:
+            # Intervalo menor que um mês: tudo vem das linhas
+            total_spent = total_gain = 0.0
+            edges = [(start_ord, end_ord)]
+
+        for edge_start, edge_end in edges:
+            positions = np.array(ledger.dates.range(edge_start, edge_end), dtype=np.int64)
+            positions = columns.filter_methods(positions, include_methods, exclude_methods)
+            net = columns.net_values(positions)
+            total_spent += float(-net[net < 0].sum())
+            total_gain += float(net[net > 0].sum())
+        return total_spent, total_gain
+
+    @staticmethod
+    def _top_indices(selection, values, limit):
+        """Índices dos `limit` elementos selecionados com maior `values`."""
+        candidates = np.flatnonzero(selection)
+        if len(candidates) > limit:
+            top = np.argpartition(values[candidates], -limit)[-limit:]
+            candidates = candidates[top]
+        return candidates[np.argsort(-values[candidates], kind="stable")]
+
+    def resolve_row_index(self, row_index):
+        """
+        Converte um row_index provisório (negativo, ainda no journal) na linha real
+        da planilha, enviando as pendências na hora se necessário.
+        """
+        if row_index is None or row_index > 0 or not self.journal:
+            return row_index
+        real_row = self.journal.resolve(-row_index)
+        if real_row is None:
+            flush_pending(self.journal, self.sheets)
+            real_row = self.journal.resolve(-row_index)
+        return real_row
+
+    def get_transaction(self, row_index):
+        """Retorna a Transaction da linha (1-based) a partir do cache, ou None."""
+        row = self.sheets.get_ledger().get_row(row_index)
+        if row is None or row_index < 2:
+            return None
+        return Transaction.from_row(row, row_index=row_index)
+
+    def update_transaction(self, row_index, changes):
+        """Aplica um diff parcial (campos do Transaction) com uma única chamada à API."""
+        return self.sheets.update_transaction(self.resolve_row_index(row_index), changes)
 
     # Proxy methods for updates (could be refactored further but needed for edit handlers)
-    def update_expense_category(self, row, val): return self.sheets.update_expense_category(row, val)
-    def update_expense_value(self, row, val): return self.sheets.update_expense_value(row, val)
-    def update_description(self, row, val): return self.sheets.update_description(row, val)
-    def update_payment_method(self, row, val): return self.sheets.update_payment_method(row, val)
+    def update_expense_category(self, row, val): return self.sheets.update_expense_category(self.resolve_row_index(row), val)
+    def update_expense_value(self, row, val): return self.sheets.update_expense_value(self.resolve_row_index(row), val)
+    def update_description(self, row, val): return self.sheets.update_description(self.resolve_row_index(row), val)
+    def update_payment_method(self, row, val): return self.sheets.update_payment_method(self.resolve_row_index(row), val)
@@ -0,0 +1,84 @@
+import os
+import threading
+from collections import OrderedDict
+
+
+def parse_user_sheets(value):
+    """Lê o mapeamento "user_id:sheet_id,user_id:sheet_id" do USER_SHEETS."""
+    user_sheets = {}
+    for entry in (value or "").split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        user_id, _, sheet_id = entry.partition(":")
+        if not sheet_id:
+            raise ValueError(f"❌ Entrada inválida em USER_SHEETS: '{entry}' (use user_id:sheet_id)")
+        user_sheets[int(user_id)] = sheet_id.strip()
+    return user_sheets
+
+
+class UserServiceRegistry:
+    """Um TransactionService por planilha, abertos sob demanda e mantidos em um LRU.
+
+    Cada serviço guarda os handles do gspread e o cache do ledger da planilha, então
+    só a primeira mensagem (ou a primeira depois de uma evicção) paga o open_by_key
+    e o download. Usuários que apontam para a mesma planilha compartilham o serviço.
+    """
+
+    def __init__(self, user_sheets, factory, max_size=8):
+        # user_id -> sheet_id: quem pode usar o bot e em qual planilha
+        self.user_sheets = dict(user_sheets)
+        # factory(sheet_id) -> TransactionService
+        self.factory = factory
+        self.max_size = max_size
+        self._services = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, factory):
+        """
+        Usa USER_SHEETS quando definido; senão, o modo de um usuário só
+        (MY_USER_ID na planilha GOOGLE_SHEET_ID).
+        """
+        user_sheets = parse_user_sheets(os.getenv("USER_SHEETS"))
+        if not user_sheets and os.getenv("MY_USER_ID"):
+            user_sheets = {int(os.getenv("MY_USER_ID")): os.getenv("GOOGLE_SHEET_ID")}
+        return cls(user_sheets, factory, max_size=int(os.getenv("USER_CACHE_SIZE", "8")))
+
+    def is_authorized(self, user_id):
+        return user_id in self.user_sheets
+
+    def sheet_ids(self):
+        """Planilhas configuradas, sem repetição, na ordem do mapeamento."""
+        return list(dict.fromkeys(self.user_sheets.values()))
+
+    def get(self, user_id):
+        """Serviço do usuário, ou None se ele não estiver autorizado."""
+        if user_id not in self.user_sheets:
+            return None
+        return self.get_by_sheet(self.user_sheets[user_id])
+
+    def get_by_sheet(self, sheet_id):
+        with self._lock:
+            service = self._services.get(sheet_id)
+            if service is not None:
+                self._services.move_to_end(sheet_id)
+                return service
+
+        # Abre fora do lock: o open_by_key de uma planilha não bloqueia as outras
+        service = self.factory(sheet_id)
+
+        with self._lock:
+            # Outra thread pode ter aberto a mesma planilha enquanto isso
+            existing = self._services.get(sheet_id)
+            if existing is not None:
+                self._services.move_to_end(sheet_id)
+                return existing
+            self._services[sheet_id] = service
+            while len(self._services) > self.max_size:
+                evicted_id, _ = self._services.popitem(last=False)
+                print(f"♻️ Planilha {evicted_id} removida do cache de usuários")
+            return service
+
+    def __len__(self):
+        return len(self._services)
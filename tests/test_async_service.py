@@ -0,0 +1,122 @@
+import asyncio
+import threading
+import time
+import pytest
+from benchmarks.fake_sheets import FakeSheetsService
+from services.async_transaction_service import AsyncTransactionService, create_sheets_executor
+from services.ledger_cache import LedgerCache
+from services.transaction_service import TransactionService
+
+HEADER = ["Data", "Valor", "Reembolsado", "Descrição", "Tags", "Método"]
+
+
+class SlowSheets(FakeSheetsService):
+    """Planilha falsa em que cada escrita demora como uma chamada de rede."""
+
+    def __init__(self, rows, delay):
+        super().__init__(rows)
+        self.delay = delay
+
+    def append_rows(self, rows):
+        time.sleep(self.delay)
+        return super().append_rows(rows)
+
+
+@pytest.fixture
+def executor():
+    executor = create_sheets_executor(max_workers=4)
+    yield executor
+    executor.shutdown(wait=True)
+
+
+def make_service(executor, delay=0.3):
+    sheets = SlowSheets([HEADER, ["17/01/2026", "-50", "0", "Uber", "Uber", "Pix"]], delay)
+    sheets.refresh_ledger()
+    return AsyncTransactionService(TransactionService(storage=sheets), executor)
+
+
+@pytest.mark.asyncio
+async def test_slow_write_does_not_block_the_event_loop(executor):
+    service = make_service(executor)
+    ticks = 0
+
+    async def other_chat():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    task = asyncio.create_task(other_chat())
+    result = await service.create_transaction(-20.0, "Mercado", "Mercado", "pix", data="18/01/2026")
+    task.cancel()
+    assert result["row_index"] == 3
+    # Durante os 0.3s da escrita o loop continuou atendendo outras tarefas
+    assert ticks >= 10
+
+
+@pytest.mark.asyncio
+async def test_independent_calls_overlap(executor):
+    service = make_service(executor)
+    start = time.perf_counter()
+    await asyncio.gather(
+        service.create_transaction(-20.0, "Mercado", "Mercado", "pix", data="18/01/2026"),
+        service.create_transaction(-30.0, "Padaria", "Mercado", "pix", data="18/01/2026"),
+    )
+    assert time.perf_counter() - start < 0.55
+    found = await service.find_transaction(date_query="18/01/2026")
+    assert sorted(t.description for t in found) == ["Mercado", "Padaria"]
+
+
+def test_ledger_reads_see_whole_writes():
+    ledger = LedgerCache()
+    ledger.load([HEADER])
+    done = threading.Event()
+
+    def writer():
+        for i in range(2, 500):
+            ledger.append_row(i, ["17/01/2026", "-1", "0", f"Item {i}", "Outros", "Pix"])
+        done.set()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    while not done.is_set():
+        with ledger.lock:
+            # Linhas, colunas e agregados sempre avançam juntos
+            size = len(ledger.rows) - 1
+            assert ledger.columns.size == size
+            bounds = ledger.rollups.month_range()
+            assert (ledger.rollups.totals(*bounds)[2] if bounds else 0) == size
+    thread.join()
+
+def test_writes_during_a_refresh_survive_the_swap():
+    ledger = LedgerCache()
+    ledger.load([HEADER, ["17/01/2026", "-50", "0", "Uber", "Uber", "Pix"]])
+    snapshot = [HEADER, ["17/01/2026", "-50", "0", "Uber", "Uber", "Pix"]]
+
+    def download():
+        # Escritas de outras threads enquanto a planilha é baixada
+        ledger.append_row(3, ["18/01/2026", "-20", "0", "Café", "Outros", "Pix"])
+        ledger.update_cell(2, 2, "-45")
+        return snapshot
+
+    ledger.refresh(download)
+    assert ledger.get_row(2)[1] == "-45"
+    assert ledger.get_row(3)[3] == "Café"
+    assert ledger.columns.size == 2
+
+def test_concurrent_refreshes_download_once():
+    ledger = LedgerCache()
+    downloads = []
+
+    def download():
+        downloads.append(1)
+        time.sleep(0.2)
+        return [HEADER]
+
+    threads = [threading.Thread(target=ledger.refresh, args=(download,)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(downloads) == 1
+    assert ledger.is_loaded
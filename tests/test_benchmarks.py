@@ -0,0 +1,27 @@
+from benchmarks.ledger_generator import generate_ledger, parse_size
+from benchmarks.run import build_cases, compare
+
+def test_generated_ledger_looks_like_the_sheet():
+    rows = generate_ledger(500, seed=1)
+    assert len(rows) == 501
+    assert rows[0][0] == "Data"
+    assert all("," in row[1] for row in rows[1:])
+    assert any(row[2] != "0" for row in rows[1:])     # há reembolsos
+    assert any(not row[1].startswith("-") for row in rows[1:])   # há entradas
+    assert generate_ledger(50, seed=1) == generate_ledger(50, seed=1)
+
+def test_parse_size():
+    assert parse_size("1k") == 1_000
+    assert parse_size("100k") == 100_000
+    assert parse_size("1m") == 1_000_000
+    assert parse_size("250") == 250
+
+def test_every_case_runs_on_a_small_ledger():
+    for func in build_cases(generate_ledger(300)).values():
+        func()
+
+def test_compare_flags_only_real_regressions():
+    baseline = {"a@1k": 0.010, "b@1k": 0.000010}
+    results = {"a@1k": 0.020, "b@1k": 0.000030, "c@1k": 1.0}
+    # b triplicou, mas a diferença absoluta é ruído; c não tem baseline
+    assert compare(results, baseline, tolerance=1.5) == [("a@1k", 0.020, 0.010)]
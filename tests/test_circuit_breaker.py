@@ -0,0 +1,68 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from services.ai_handler import AIService
+from services.circuit_breaker import CircuitBreaker, parse_retry_after, OPEN, HALF_OPEN, CLOSED
+from utils.prompts import get_intent_router_prompt
+
+def make_service(monkeypatch, side_effect):
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    service = AIService(fused_routing=False)
+    service.models_to_try = ["model-a", "model-b"]
+    service.breakers = {m: CircuitBreaker(cooldown=60) for m in service.models_to_try}
+    service.client = MagicMock()
+    service.client.aio.models.generate_content = AsyncMock(side_effect=side_effect)
+    return service
+
+def called_models(service):
+    return [c.kwargs["model"] for c in service.client.aio.models.generate_content.call_args_list]
+
+def test_parse_retry_after():
+    assert parse_retry_after("429 RESOURCE_EXHAUSTED. Please retry in 23.5s.") == 23.5
+    assert parse_retry_after("{'retryDelay': '41s'}") == 41.0
+    assert parse_retry_after("500 INTERNAL") is None
+
+def test_breaker_cooldown_and_half_open_probe():
+    breaker = CircuitBreaker(cooldown=10)
+    breaker.record_quota_error(now=100)
+    assert breaker.state == OPEN
+    assert not breaker.allow_request(now=105)
+    assert breaker.allow_request(now=111)      # cooldown acabou: libera uma chamada de teste
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow_request(now=111)  # só uma por vez
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+@pytest.mark.asyncio
+async def test_quota_error_skips_model_on_next_request(monkeypatch):
+    ok = MagicMock(text='{"intent": "other"}')
+    service = make_service(monkeypatch, [Exception("429 quota. Please retry in 30s."), ok, ok])
+
+    assert await service._generate_content_with_fallback(get_intent_router_prompt("p1")) == ok.text
+    assert await service._generate_content_with_fallback(get_intent_router_prompt("p2")) == ok.text
+
+    # A segunda mensagem vai direto para o modelo saudável
+    assert called_models(service) == ["model-a", "model-b", "model-b"]
+
+@pytest.mark.asyncio
+async def test_all_models_open_probes_soonest(monkeypatch):
+    ok = MagicMock(text="{}")
+    service = make_service(monkeypatch, [ok])
+    service.breakers["model-a"].record_quota_error(retry_after=300)
+    service.breakers["model-b"].record_quota_error(retry_after=30)
+
+    assert await service._generate_content_with_fallback(get_intent_router_prompt("p")) == "{}"
+    assert called_models(service) == ["model-b"]
+    assert service.breakers["model-b"].state == CLOSED
+
+@pytest.mark.asyncio
+async def test_cancelled_probe_releases_the_breaker(monkeypatch):
+    service = make_service(monkeypatch, asyncio.CancelledError())
+    breaker = service.breakers["model-a"]
+    breaker.record_quota_error(now=0)
+    breaker.opened_until = 0  # cooldown já acabou: a próxima chamada é a de teste
+
+    with pytest.raises(asyncio.CancelledError):
+        await service._generate_content_with_fallback(get_intent_router_prompt("p"))
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow_request()  # outra chamada de teste pode passar
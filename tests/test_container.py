@@ -0,0 +1,89 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import pytest
+from unittest.mock import MagicMock
+from bot.middlewares import StartupTimingMiddleware
+from services.container import ServiceContainer
+from services.metrics import metrics
+from services.user_registry import UserServiceRegistry
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_importing_handlers_needs_no_credentials():
+    env = {k: v for k, v in os.environ.items() if k not in ("GEMINI_API_KEY", "GOOGLE_SHEET_ID", "MY_USER_ID", "USER_SHEETS")}
+    result = subprocess.run(
+        [sys.executable, "-c", "import bot.handlers"],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+
+def test_services_are_created_on_first_use(monkeypatch):
+    monkeypatch.setenv("USER_SHEETS", "1:sheet-a")
+    container = ServiceContainer()
+    assert "registry" not in vars(container)
+    assert "ai_service" not in vars(container)
+    assert container.registry is container.registry
+    assert container.registry.is_authorized(1)
+
+@pytest.mark.asyncio
+async def test_warm_opens_sheets_concurrently():
+    def open_sheet(sheet_id):
+        time.sleep(0.2)
+        service = MagicMock()
+        service.initialize_sheet.return_value = "Headers já existentes."
+        service.refresh_ledger.return_value = 10
+        return service
+
+    registry = UserServiceRegistry({1: "a", 2: "b", 3: "c"}, open_sheet)
+    container = ServiceContainer(registry=registry, journal=MagicMock())
+    start = time.perf_counter()
+    warmed = await container.warm()
+    assert set(warmed) == {"a", "b", "c"}
+    assert time.perf_counter() - start < 0.5
+    assert len(registry) == 3
+
+@pytest.mark.asyncio
+async def test_startup_time_is_reported_once():
+    metrics.reset()
+    middleware = StartupTimingMiddleware(time.perf_counter())
+
+    async def handler(event, data):
+        return "ok"
+
+    assert await middleware(handler, None, {}) == "ok"
+    await middleware(handler, None, {})
+    assert metrics.histograms[metrics._key("startup_to_first_update_seconds", {})].count == 1
+
+@pytest.mark.asyncio
+async def test_mirror_starts_when_a_sqlite_service_is_opened(monkeypatch, tmp_path):
+    monkeypatch.setenv("STORAGE_BACKEND", "sqlite")
+    monkeypatch.setenv("SQLITE_PATH", str(tmp_path / "telegrana_{sheet_id}.db"))
+    container = ServiceContainer(journal=MagicMock())
+    container.registry = UserServiceRegistry({1: "a", 2: "b"}, container.open_user_service, max_size=1)
+    opened = []
+    container.enable_mirror(sheets_factory=lambda sheet_id: opened.append(sheet_id) or MagicMock())
+
+    # Sem warm: o serviço nasce na primeira mensagem de cada usuário
+    assert await container.user_service(1) is not None
+    assert await container.user_service(2) is not None
+    # Reabrir depois da evicção do LRU não cria um segundo espelho
+    await container.user_service(1)
+    await asyncio.sleep(0.05)
+    assert sorted(container.mirror_tasks) == ["a", "b"]
+    assert sorted(opened) == ["a", "b"]
+    for task in container.mirror_tasks.values():
+        task.cancel()
+
+def test_shared_sqlite_path_is_refused_for_several_sheets(monkeypatch):
+    monkeypatch.setenv("STORAGE_BACKEND", "sqlite")
+    monkeypatch.setenv("USER_SHEETS", "1:sheet-a,2:sheet-b")
+    monkeypatch.setenv("SQLITE_PATH", "telegrana.db")
+    with pytest.raises(ValueError):
+        ServiceContainer().registry
+
+    # O padrão já separa um banco por planilha
+    monkeypatch.delenv("SQLITE_PATH")
+    assert ServiceContainer().registry.sheet_ids() == ["sheet-a", "sheet-b"]
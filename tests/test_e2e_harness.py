@@ -0,0 +1,44 @@
+import pytest
+from services.metrics import metrics
+from benchmarks.e2e import FLOWS, Harness, classify_prompt
+from utils.prompts import get_intent_router_prompt, get_reimbursement_prompt
+
+@pytest.fixture
+def harness():
+    return Harness(ledger_rows=300)
+
+def test_classify_prompt_finds_kind_and_text():
+    assert classify_prompt(get_reimbursement_prompt("Recebi 20 do uber", "17/10/2026")) == ("reimbursement", "Recebi 20 do uber")
+    kind, text = classify_prompt(get_intent_router_prompt("Uber 25"))
+    assert (kind, text) == ("router", "Uber 25")
+
+@pytest.mark.asyncio
+async def test_every_flow_runs_offline(harness):
+    for name, messages in FLOWS.items():
+        elapsed, gemini_calls, _, telegram_calls, answers = await harness.run_flow(messages)
+        assert gemini_calls >= 1, name
+        assert telegram_calls == len(answers) >= len(messages), name
+        assert not any("Não entendi" in answer for answer in answers), name
+
+@pytest.mark.asyncio
+async def test_missing_payment_method_is_asked_then_saved(harness):
+    _, _, sheets_calls, _, answers = await harness.run_flow(FLOWS["insert_missing_info"])
+    assert "método de pagamento" in answers[0]
+    assert "Salvos na planilha" in answers[1]
+    assert sheets_calls == 1
+
+@pytest.mark.asyncio
+async def test_report_has_percentiles_per_flow(harness):
+    report = await harness.run(iterations=3, flows={"query_month"})
+    assert list(report) == ["query_month"]
+    stats = report["query_month"]
+    assert stats["p50"] <= stats["p95"] <= stats["p99"]
+    assert stats["gemini_calls"] == 2
+
+@pytest.mark.asyncio
+async def test_handler_branches_are_timed(harness):
+    metrics.reset()
+    await harness.run_flow(FLOWS["insert_then_edit"])
+    series = {labels for name, labels in metrics.histograms if name == "handler_seconds"}
+    assert (("branch", "insert"), ("handler", "handle_message")) in series
+    assert (("branch", "handle_edit"), ("handler", "handle_edit")) in series
@@ -0,0 +1,60 @@
+import pytest
+from datetime import datetime
+from services.fast_parser import FastExpenseParser
+
+EXPENSE_TAGS = ["Mercado", "Restaurante", "Uber", "Outros"]
+INCOME_TAGS = ["Salário", "Presente", "Reembolso", "Outros"]
+NOW = datetime(2026, 1, 17, 12, 0)
+
+@pytest.fixture
+def parser():
+    return FastExpenseParser()
+
+@pytest.mark.parametrize("text,expected", [
+    ("Gastei 50 no mercado no pix",
+     {"valor": -50.0, "descricao": "Mercado", "tags": "Mercado", "metodo_pagamento": "Pix", "data": None}),
+    ("Almoço 45 reais no crédito",
+     {"valor": -45.0, "descricao": "Almoço", "tags": None, "metodo_pagamento": "Crédito", "data": None}),
+    ("Uber 25,90 no Pix ontem",
+     {"valor": -25.9, "descricao": "Uber", "tags": "Uber", "metodo_pagamento": "Pix", "data": "16/01/2026"}),
+    ("Comprei um picolé no cartão de debito de 11 reais dia 15",
+     {"valor": -11.0, "descricao": "Picolé", "tags": None, "metodo_pagamento": "Débito", "data": "15/01/2026"}),
+    ("Recebi 5000 de salário hoje",
+     {"valor": 5000.0, "descricao": "Salário", "tags": "Salário", "metodo_pagamento": None, "data": None}),
+])
+def test_fast_path_confident(parser, text, expected):
+    assert parser.parse(text, EXPENSE_TAGS, INCOME_TAGS, now=NOW) == expected
+
+@pytest.mark.parametrize("text", [
+    "Quanto gastei ontem?",                         # consulta
+    "Reembolsou 20 reais do Uber",                  # reembolso
+    "Mude a tag da última compra para Lazer",       # edição
+    "O valor é 30 reais",                           # edição sem verbo de correção
+    "Paguei 20 no Caju",                            # sem descrição
+    "Gastei 1.500 na viagem",                       # valor ambíguo
+    "Gastei 30 no mercado e 20 na farmácia",        # dois valores
+    "Acabei de ganhar 100 reais num sorteio",       # entrada sem verbo conhecido
+    "Recebi 800 de vale alimentação no Caju",       # regra especial do Caju
+    "Oi, tudo bem?",
+    "Comprei 2 ingressos",                          # quantidade, não valor
+    "Vendi 3 livros",                               # quantidade, não valor
+    "Gastei 50 no mercado semana passada",          # data relativa não resolvida
+    "Paguei 30 reais no pix na sexta",              # dia da semana
+    "Gastei 80 reais de luz mês passado",           # mês relativo
+    "Gastei 40 reais na farmácia dia 5 do mes passado",
+])
+def test_fast_path_defers_to_ai(parser, text):
+    assert parser.parse(text, EXPENSE_TAGS, INCOME_TAGS, now=NOW) is None
+
+@pytest.mark.parametrize("text,valor", [
+    ("R$ 12 de pão", -12.0),
+    ("Pão 12 reais", -12.0),
+    ("Pão no pix 12", -12.0),
+])
+def test_amount_needs_money_context(parser, text, valor):
+    assert parser.parse(text, EXPENSE_TAGS, INCOME_TAGS, now=NOW)["valor"] == valor
+
+def test_fast_path_counts_hits_and_misses(parser):
+    parser.parse("Gastei 50 no mercado no pix", EXPENSE_TAGS, INCOME_TAGS, now=NOW)
+    parser.parse("Qual meu saldo?", EXPENSE_TAGS, INCOME_TAGS, now=NOW)
+    assert parser.stats == {"hits": 1, "misses": 1}
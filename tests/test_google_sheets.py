@@ -0,0 +1,169 @@
+import threading
+import gspread
+from unittest.mock import MagicMock
+from services.google_sheets import GoogleSheetsService, VALIDATION_HEADROOM
+from services.ledger_cache import LedgerCache
+from services.transaction_service import TransactionService
+
+def make_service(config_rows=None):
+    # Monta o serviço sem autenticar no Google
+    sheets = GoogleSheetsService.__new__(GoogleSheetsService)
+    sheets.sh = MagicMock()
+    sheets.ws = MagicMock()
+    sheets.ws.row_count = 1000
+    sheets.ws.spreadsheet = sheets.sh
+    # O batch_updater esvazia a lista de requests depois de enviar: guardamos uma cópia
+    sheets.sent_requests = []
+    sheets.sh.batch_update.side_effect = lambda body: sheets.sent_requests.append(list(body["requests"]))
+    if config_rows is None:
+        sheets.sh.worksheet.side_effect = gspread.WorksheetNotFound("Config")
+    else:
+        sheets.sh.worksheet.return_value.get_all_values.return_value = config_rows
+    sheets._init_registry()
+    sheets._load_tag_registry()
+    sheets._validation_debounce = 60
+    sheets._validation_timer = None
+    sheets._validation_lock = threading.Lock()
+    sheets._validated_until = 1000
+    sheets._requested_until = 0
+    sheets.page_size = 1000
+    sheets._last_row = None
+    sheets.ledger = LedgerCache()
+    return sheets
+
+def serve_pages(sheets, rows, page_size):
+    """Simula ws.get("A{start}:F{end}") sobre `rows` (linha 1 = header)."""
+    sheets.page_size = page_size
+    sheets.ws.id = 0
+    # A grade tem a folga das validações depois da última linha usada
+    sheets.sh.fetch_sheet_metadata.return_value = {
+        "sheets": [{"properties": {"sheetId": 0, "gridProperties": {"rowCount": len(rows) + VALIDATION_HEADROOM}}}]
+    }
+    column_a = [row[0] if row else "" for row in rows]
+    while column_a and not column_a[-1]:
+        column_a.pop()
+    sheets.ws.col_values.return_value = column_a
+
+    def get(range_name):
+        if range_name == "A:F":
+            start, end = 1, len(rows)
+        else:
+            start, end = (int(part[1:]) for part in range_name.split(":"))
+        page = rows[start - 1:end]
+        # A API omite as linhas vazias do fim do range
+        while page and not page[-1]:
+            page.pop()
+        return page
+    sheets.ws.get.side_effect = get
+
+def test_registry_loads_persisted_tags():
+    sheets = make_service([["Tag", "Tipo"], ["Farmácia", "expense"], ["Freela", "income"]])
+    assert "Farmácia" in sheets.expense_tags
+    assert "Freela" in sheets.income_tags
+    assert "Freela" in sheets.tag_options
+
+def test_registry_is_created_hidden_when_missing():
+    sheets = make_service()
+    sheets.sh.add_worksheet.assert_called_once()
+    sheets.config_ws.hide.assert_called_once()
+
+def test_add_category_persists_and_debounces_validations():
+    sheets = make_service([["Tag", "Tipo"]])
+    try:
+        assert sheets.add_category("Farmácia") is True
+        assert sheets.add_category("Pet") is True
+        assert sheets.add_category("Pet") is False
+
+        sheets.config_ws.append_row.assert_any_call(["Farmácia", "expense"])
+        # Nada foi enviado ainda: as duas tags entram na mesma atualização
+        sheets.sh.batch_update.assert_not_called()
+
+        sheets.apply_validations()
+        sheets.sh.batch_update.assert_called_once()
+        assert len(sheets.sent_requests[0]) == 2
+    finally:
+        if sheets._validation_timer:
+            sheets._validation_timer.cancel()
+
+def test_validated_range_grows_with_rows():
+    sheets = make_service([["Tag", "Tipo"]])
+    sheets.ws.append_rows.return_value = {"updates": {"updatedRange": "Página1!A995:F996"}}
+    try:
+        sheets.append_rows([["17/01/2026", -5, 0, "Pão", "Mercado", "Pix"]] * 2)
+        assert sheets._validation_timer is not None
+        # Só agendado: o range coberto não muda antes de a requisição dar certo
+        assert sheets._validated_until == 1000
+
+        sheets.apply_validations()
+        end_row = sheets.sent_requests[0][0][0]["repeatCell"]["range"]["endRowIndex"]
+        assert end_row == 996 + VALIDATION_HEADROOM
+        # A grade tinha 1000 linhas: cresce antes de receber as validações
+        sheets.ws.add_rows.assert_called_once_with(996 + VALIDATION_HEADROOM - 1000)
+        assert sheets._validated_until == 996 + VALIDATION_HEADROOM
+    finally:
+        if sheets._validation_timer:
+            sheets._validation_timer.cancel()
+
+def test_failed_validation_update_is_retried():
+    sheets = make_service([["Tag", "Tipo"]])
+    sheets.sh.batch_update.side_effect = Exception("503 Service Unavailable")
+    sheets.ws.append_rows.return_value = {"updates": {"updatedRange": "Página1!A995:F995"}}
+    try:
+        sheets.append_rows([["17/01/2026", -5, 0, "Pão", "Mercado", "Pix"]])
+        sheets._apply_scheduled_validations()
+        assert sheets._validated_until == 1000
+
+        # O próximo append ainda está perto do fim do range validado e agenda de novo
+        sheets._validation_timer = None
+        sheets.ws.append_rows.return_value = {"updates": {"updatedRange": "Página1!A996:F996"}}
+        sheets.append_rows([["17/01/2026", -5, 0, "Pão", "Mercado", "Pix"]])
+        assert sheets._validation_timer is not None
+    finally:
+        if sheets._validation_timer:
+            sheets._validation_timer.cancel()
+
+def test_refresh_is_a_single_read():
+    sheets = make_service([["Tag", "Tipo"]])
+    rows = [["Data", "Valor", "Reembolsado", "Descrição", "Tags", "Método de Pagamento"]]
+    rows += [[f"{day:02d}/01/2026", f"-{day}", "0", f"Item {day}", "Outros", "Pix"] for day in range(1, 11)]
+    rows[5] = []  # linha vazia no meio
+    serve_pages(sheets, rows, page_size=3)
+
+    assert sheets.refresh_ledger() == len(rows)
+    assert sheets.ledger.rows == rows
+    # Uma requisição, sem metadados nem páginas
+    sheets.ws.get.assert_called_once_with("A:F")
+    sheets.sh.fetch_sheet_metadata.assert_not_called()
+
+def test_cold_search_reads_only_the_newest_page():
+    sheets = make_service([["Tag", "Tipo"]])
+    rows = [["Data", "Valor", "Reembolsado", "Descrição", "Tags", "Método de Pagamento"]]
+    rows += [[f"{day:02d}/01/2026", "-10", "0", "Uber", "Uber", "Pix"] for day in range(1, 31)]
+    serve_pages(sheets, rows, page_size=10)
+    service = TransactionService(storage=sheets)
+
+    matches = service.find_transaction(desc_query="uber")
+
+    # Cache frio: só as duas últimas páginas são lidas (a última tem apenas a linha 31)
+    assert [t.row_index for t in matches] == [31, 30, 29, 28, 27]
+    assert sheets.ws.get.call_count == 2
+    sheets.ws.col_values.assert_called_once_with(1)
+    assert not sheets.ledger.is_loaded
+
+def test_paging_follows_appended_rows():
+    sheets = make_service([["Tag", "Tipo"]])
+    rows = [["Data", "Valor", "Reembolsado", "Descrição", "Tags", "Método de Pagamento"]]
+    rows += [[f"{day:02d}/01/2026", "-10", "0", "Uber", "Uber", "Pix"] for day in range(1, 11)]
+    serve_pages(sheets, rows, page_size=10)
+    sheets.ws.append_rows.side_effect = lambda new_rows: rows.extend(new_rows) or {
+        "updates": {"updatedRange": f"Página1!A{len(rows) - len(new_rows) + 1}:F{len(rows)}"}
+    }
+    list(sheets.iter_row_pages())
+
+    sheets.append_rows([["11/01/2026", "-10", "0", "Uber", "Uber", "Pix"]])
+    pages = list(sheets.iter_row_pages(reverse=True))
+
+    # A linha nova entra na paginação sem reler a coluna A
+    assert [start for start, _ in pages] == [11, 1]
+    assert pages[0][1][-1] == ["11/01/2026", "-10", "0", "Uber", "Uber", "Pix"]
+    sheets.ws.col_values.assert_called_once_with(1)
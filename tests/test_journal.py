@@ -0,0 +1,164 @@
+import pytest
+from unittest.mock import MagicMock
+from benchmarks.fake_sheets import FakeSheetsService
+from services.async_transaction_service import AsyncTransactionService, create_sheets_executor
+from services.journal import TransactionJournal, JournalFlusher, flush_pending
+from services.transaction_service import TransactionService
+
+HEADER = ["Data", "Valor", "Reembolsado", "Descrição", "Tags", "Método"]
+
+@pytest.fixture
+def journal(tmp_path):
+    return TransactionJournal(str(tmp_path / "journal.db"))
+
+def make_sheets(first_row=10):
+    sheets = MagicMock()
+    sheets.sheet_id = "sheet-1"
+    sheets.append_rows.side_effect = lambda rows: list(range(first_row, first_row + len(rows)))
+    sheets.find_appended.return_value = None
+    return sheets
+
+
+class RemoteFakeSheets(FakeSheetsService):
+    """Planilha falsa tratada como remota, para ligar o write-behind."""
+
+    is_remote = True
+
+
+class HttpError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.response = MagicMock(status_code=status_code)
+
+def test_flush_reconciles_real_rows(journal):
+    sheets = make_sheets(first_row=10)
+    first = journal.append("sheet-1", ["17/01/2026 10:00", -50, 0, "Uber", "Uber", "Pix"])
+    second = journal.append("sheet-1", ["17/01/2026 11:00", -20, 0, "Café", "Outros", "Pix"])
+    assert journal.resolve(first) is None
+
+    assert flush_pending(journal, sheets) == 2
+
+    # Um único append_rows com as duas linhas, na ordem de chegada
+    sheets.append_rows.assert_called_once()
+    assert [row[3] for row in sheets.append_rows.call_args.args[0]] == ["Uber", "Café"]
+    assert journal.resolve(first) == 10
+    assert journal.resolve(second) == 11
+    assert journal.pending_count() == 0
+
+def test_failed_flush_keeps_entries_for_retry(journal):
+    sheets = make_sheets()
+    sheets.append_rows.side_effect = Exception("503 Service Unavailable")
+    entry_id = journal.append("sheet-1", ["17/01/2026", -5, 0, "Pão", "Mercado", "Pix"])
+
+    flusher = JournalFlusher(journal, lambda sheet_id: sheets)
+    with pytest.raises(Exception):
+        flusher.flush_once()
+
+    assert journal.pending_count() == 1
+    assert journal.resolve(entry_id) is None
+
+def test_journal_survives_reopen(tmp_path):
+    path = str(tmp_path / "journal.db")
+    TransactionJournal(path).append("sheet-1", ["17/01/2026", -5, 0, "Pão", "Mercado", "Pix"])
+    assert TransactionJournal(path).pending_count() == 1
+
+def test_pending_rows_are_visible_before_flush(journal):
+    sheets = RemoteFakeSheets([HEADER, ["17/01/2026 09:00", "-50", "0", "Uber", "Uber", "Pix"]])
+    sheets.refresh_ledger()
+    service = TransactionService(storage=sheets, journal=journal)
+
+    result = service.create_transaction(-20.0, "Padaria", "Mercado", "pix", data="17/01/2026 10:00")
+    assert result["row_index"] < 0
+    assert service.calculate_totals("17/01/2026", "18/01/2026", "expense")["spent"] == 70.0
+    found = service.find_transaction(desc_query="padaria")
+    assert [t.row_index for t in found] == [result["row_index"]]
+
+    assert flush_pending(journal, sheets) == 1
+    # A provisória sai e a linha real entra: nada em dobro
+    assert service.calculate_totals("17/01/2026", "18/01/2026", "expense")["spent"] == 70.0
+    assert [t.row_index for t in service.find_transaction(desc_query="padaria")] == [3]
+
+def test_rejected_row_is_dead_lettered_without_blocking_the_rest(tmp_path):
+    journal = TransactionJournal(str(tmp_path / "journal.db"), max_attempts=2)
+    sheets = make_sheets(first_row=10)
+    bad = journal.append("sheet-1", ["17/01/2026", -5, 0, "=ERRO(", "Mercado", "Pix"])
+    good = journal.append("sheet-1", ["17/01/2026", -7, 0, "Pão", "Mercado", "Pix"])
+
+    def append_rows(rows):
+        if any(row[3] == "=ERRO(" for row in rows):
+            raise HttpError(400)
+        return list(range(10, 10 + len(rows)))
+    sheets.append_rows.side_effect = append_rows
+
+    with pytest.raises(HttpError):
+        flush_pending(journal, sheets)
+    # Na segunda recusa a entrada é descartada e a seguinte é enviada
+    assert flush_pending(journal, sheets) == 1
+    assert journal.resolve(good) == 10
+    assert journal.resolve(bad) is None
+    assert journal.pending_count() == 0
+    assert journal.dead_count() == 1
+    sheets.ledger.settle.assert_any_call([bad])
+
+def test_transient_errors_never_dead_letter(tmp_path):
+    journal = TransactionJournal(str(tmp_path / "journal.db"), max_attempts=1)
+    sheets = make_sheets()
+    sheets.append_rows.side_effect = HttpError(503)
+    journal.append("sheet-1", ["17/01/2026", -5, 0, "Pão", "Mercado", "Pix"])
+    for _ in range(3):
+        with pytest.raises(HttpError):
+            flush_pending(journal, sheets)
+    assert journal.pending_count() == 1
+    assert journal.dead_count() == 0
+
+def test_lost_response_is_not_appended_twice(journal):
+    sheets = RemoteFakeSheets([HEADER])
+    sheets.refresh_ledger()
+    real_append = sheets.append_rows
+
+    def append_then_drop(rows):
+        real_append(rows)
+        raise ConnectionError("resposta perdida")
+    sheets.append_rows = append_then_drop
+    entry_id = journal.append(sheets.sheet_id, ["17/01/2026 10:00", -5.5, 0, "Pão", "Mercado", "Pix"])
+
+    with pytest.raises(ConnectionError):
+        flush_pending(journal, sheets)
+    sheets.append_rows = real_append
+
+    # A linha já está na planilha: o flush só reconcilia
+    assert flush_pending(journal, sheets) == 1
+    assert journal.resolve(entry_id) == 2
+    assert len(sheets.sheet_rows) == 2
+
+@pytest.mark.asyncio
+async def test_editing_a_row_still_in_the_journal(journal):
+    sheets = RemoteFakeSheets([HEADER, ["17/01/2026 09:00", "-50", "0", "Uber", "Uber", "Pix"]])
+    sheets.refresh_ledger()
+    executor = create_sheets_executor(max_workers=2)
+    service = AsyncTransactionService(TransactionService(storage=sheets, journal=journal), executor)
+    try:
+        await service.create_transaction(-20.0, "Padaria", "Mercado", "pix", data="17/01/2026 10:00")
+        found = await service.find_transaction(desc_query="padaria")
+        assert found[0].row_index < 0
+
+        await service.update_transaction(found[0].row_index, {"amount": -25.0})
+        await service.update_payment_method(found[0].row_index, "Crédito")
+    finally:
+        executor.shutdown(wait=True)
+
+    # A linha provisória foi enviada e a edição caiu na linha real, não em outra
+    assert sheets.sheet_rows[1] == ["17/01/2026 09:00", "-50", "0", "Uber", "Uber", "Pix"]
+    assert sheets.sheet_rows[2][1] == "-25.0" and sheets.sheet_rows[2][5] == "Crédito"
+    assert journal.pending_count() == 0
+
+@pytest.mark.asyncio
+async def test_stop_flushes_what_is_left(journal):
+    sheets = make_sheets(first_row=10)
+    flusher = JournalFlusher(journal, lambda sheet_id: sheets, interval=60)
+    flusher.start()
+    entry_id = journal.append("sheet-1", ["17/01/2026", -5, 0, "Pão", "Mercado", "Pix"])
+
+    await flusher.stop()
+    assert journal.resolve(entry_id) == 10
+    assert journal.pending_count() == 0
@@ -0,0 +1,92 @@
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+from services.ai_handler import AIService
+from bot.webhook import build_metrics_app
+from services.metrics import LatencyHistogram, Metrics, metrics, percentile
+from utils.prompts import get_intent_router_prompt
+
+def test_histogram_percentiles_use_recent_window():
+    histogram = LatencyHistogram(window=100)
+    for ms in range(1, 201):
+        histogram.observe(ms / 1000)
+    # Só as últimas 100 medições (101..200 ms) entram nos percentis
+    assert histogram.percentile(50) == pytest.approx(0.150)
+    assert histogram.percentile(99) == pytest.approx(0.199)
+    assert histogram.count == 200
+
+def test_percentile_is_nearest_rank():
+    values = [0.1, 0.2, 0.3, 0.4]
+    assert percentile(values, 50) == 0.2
+    assert percentile(values, 95) == 0.4
+    assert percentile([0.1] * 19 + [1.0], 95) == 0.1
+    assert percentile([], 99) == 0.0
+
+def test_timer_records_even_on_error():
+    m = Metrics()
+    with pytest.raises(RuntimeError):
+        with m.timer("sheets_api_seconds", method="get"):
+            raise RuntimeError
+    assert m.histograms[("sheets_api_seconds", (("method", "get"),))].count == 1
+
+def test_prometheus_output_is_cumulative():
+    m = Metrics()
+    m.observe("gemini_call_seconds", 0.2, model="flash", kind="router")
+    m.observe("gemini_call_seconds", 3.0, model="flash", kind="router")
+    m.inc("sheets_rows_fetched_total", 1000, method="get")
+    text = m.render_prometheus()
+    assert "# TYPE gemini_call_seconds histogram" in text
+    assert 'gemini_call_seconds_bucket{kind="router",model="flash",le="0.25"} 1' in text
+    assert 'gemini_call_seconds_bucket{kind="router",model="flash",le="+Inf"} 2' in text
+    assert 'gemini_call_seconds_count{kind="router",model="flash"} 2' in text
+    assert 'sheets_rows_fetched_total{method="get"} 1000' in text
+
+def test_prometheus_label_values_are_escaped():
+    m = Metrics()
+    m.observe("handler_seconds", 0.1, handler='a"b\\c\nd')
+    assert 'handler_seconds_count{handler="a\\"b\\\\c\\nd"} 1' in m.render_prometheus()
+
+def test_stats_text_keeps_underscores_inside_code_spans():
+    m = Metrics()
+    assert "Nenhuma métrica" in m.render_text()
+    m.observe("handler_seconds", 0.5, handler="handle_message", branch="query")
+    text = m.render_text()
+    assert "`handler_seconds`" in text
+    assert "`query handle_message`" in text
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint():
+    metrics.inc("test_endpoint_total")
+    client = TestClient(TestServer(build_metrics_app()))
+    await client.start_server()
+    try:
+        response = await client.get("/metrics")
+        assert response.status == 200
+        assert "test_endpoint_total 1" in await response.text()
+    finally:
+        await client.close()
+
+@pytest.mark.asyncio
+async def test_gemini_fallback_hops_are_recorded(monkeypatch):
+    class QuotaThenOk:
+        def __init__(self):
+            self.aio = self
+            self.models = self
+            self.calls = 0
+
+        async def generate_content(self, model, contents, config=None):
+            self.calls += 1
+            if self.calls == 1:
+                raise Exception("429 RESOURCE_EXHAUSTED")
+            return type("Response", (), {"text": '{"intent": "query"}'})()
+
+    monkeypatch.setenv("GEMINI_API_KEY", "test")
+    ai = AIService()
+    ai.client = QuotaThenOk()
+    metrics.reset()
+
+    assert await ai._generate_content_with_fallback(get_intent_router_prompt("oi")) == '{"intent": "query"}'
+    first, second = ai.models_to_try[:2]
+    assert metrics.histograms[metrics._key("gemini_call_seconds", {"model": first, "kind": "router", "outcome": "quota"})].count == 1
+    assert metrics.histograms[metrics._key("gemini_call_seconds", {"model": second, "kind": "router", "outcome": "ok"})].count == 1
+    assert metrics.counters[metrics._key("gemini_fallbacks_total", {"kind": "router"})] == 1
+    assert metrics.histograms[metrics._key("gemini_request_seconds", {"kind": "router"})].count == 1
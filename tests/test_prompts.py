@@ -0,0 +1,74 @@
+import json
+import pytest
+from services.ai_handler import AIService
+from benchmarks.prompt_tokens import BASELINE_PATH, measure
+from benchmarks.e2e import FakeGenaiClient
+from utils import prompts
+
+def test_static_part_does_not_depend_on_the_message():
+    a = prompts.get_fused_router_prompt("Uber 25", ["Uber"], ["Salário"], ["Pix"], "01/01/2026")
+    b = prompts.get_fused_router_prompt("quanto gastei?", ["Mercado", "Lazer"], [], ["Caju"], "17/10/2026")
+    assert a.static == b.static
+    assert a.dynamic != b.dynamic
+    assert b.dynamic.endswith('Frase: "quanto gastei?"')
+    assert "17/10/2026" in b.dynamic and "Lazer" in b.dynamic
+
+def test_templates_are_dedented():
+    for build in (prompts.get_intent_router_prompt, prompts.get_tag_intent_prompt):
+        prompt = build("oi")
+        # Sem a indentação do código-fonte (só a dos blocos de JSON)
+        assert min(len(line) - len(line.lstrip()) for line in prompt.static.splitlines() if line.strip()) == 0
+        assert str(prompt).startswith(prompt.static) and str(prompt).endswith(prompt.dynamic)
+
+def test_only_a_small_suffix_changes_per_call():
+    with open(BASELINE_PATH, encoding="utf-8") as f:
+        baseline = json.load(f)["estimated"]
+    for kind, counts in measure().items():
+        # A redação das instruções é a dos templates antigos: o ganho vem do cache da parte fixa
+        assert counts["dynamic"] < baseline[kind] / 4, kind
+        assert counts["dynamic"] < counts["static"], kind
+
+@pytest.fixture
+def ai(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test")
+    ai = AIService()
+    ai.client = FakeGenaiClient({"router": {"Uber 25": {"intent": "insert"}}})
+    return ai
+
+@pytest.mark.asyncio
+async def test_static_part_goes_as_system_instruction(ai, monkeypatch):
+    monkeypatch.setattr(ai, "context_cache", False)
+    sent = []
+    original = ai.client.generate_content
+
+    async def capture(model, contents, config=None):
+        sent.append((contents, config))
+        return await original(model, contents, config)
+
+    monkeypatch.setattr(ai.client, "generate_content", capture)
+    prompt = prompts.get_intent_router_prompt("Uber 25")
+    assert json.loads(await ai._generate_content_with_fallback(prompt)) == {"intent": "insert"}
+    contents, config = sent[0]
+    assert contents == prompt.dynamic
+    assert config["system_instruction"] == prompt.static
+    assert "cached_content" not in config
+
+@pytest.mark.asyncio
+async def test_context_cache_is_created_once_per_prompt_kind(ai, monkeypatch):
+    monkeypatch.setattr(ai, "context_cache", True)
+    prompt = prompts.get_intent_router_prompt("Uber 25")
+    for _ in range(3):
+        assert json.loads(await ai._generate_content_with_fallback(prompt)) == {"intent": "insert"}
+    assert len(ai.client.cached_contents) == 1
+
+@pytest.mark.asyncio
+async def test_context_cache_failure_falls_back_to_system_instruction(ai, monkeypatch):
+    monkeypatch.setattr(ai, "context_cache", True)
+
+    async def too_small(model, config=None):
+        raise Exception("400 INVALID_ARGUMENT: Cached content is too small")
+
+    monkeypatch.setattr(ai.client, "create", too_small)
+    prompt = prompts.get_intent_router_prompt("Uber 25")
+    assert json.loads(await ai._generate_content_with_fallback(prompt)) == {"intent": "insert"}
+    assert ai._cached_contents[(ai.models_to_try[0], "router")] is None
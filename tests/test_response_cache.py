@@ -0,0 +1,68 @@
+import threading
+import time
+import pytest
+from unittest.mock import AsyncMock, patch
+from services.ai_handler import AIService
+from services.response_cache import ResponseCache
+
+def test_lru_eviction_and_stats():
+    cache = ResponseCache(max_size=2, ttl=60)
+    cache.set("a", {"intent": "query"})
+    cache.set("b", {"intent": "tags"})
+    assert cache.get("a") == {"intent": "query"}  # "a" vira o mais recente
+    cache.set("c", {"intent": "other"})           # despeja "b"
+    assert cache.get("b") is None
+    assert cache.stats == {"hits": 1, "misses": 1}
+
+def test_ttl_expiration():
+    cache = ResponseCache(ttl=10)
+    with patch("services.response_cache.time.time", return_value=1000):
+        cache.set("a", {"intent": "query"})
+    with patch("services.response_cache.time.time", return_value=1011):
+        assert cache.get("a") is None
+    assert len(cache) == 0
+
+def test_disk_backing_survives_restart(tmp_path):
+    path = str(tmp_path / "ai_cache.json")
+    cache = ResponseCache(path=path)
+    cache.set("a", {"action": "list"})
+    cache.flush()
+    assert ResponseCache(path=path).get("a") == {"action": "list"}
+
+def test_disk_writes_are_debounced(tmp_path):
+    path = tmp_path / "ai_cache.json"
+    cache = ResponseCache(path=str(path), save_delay=0.05)
+    with patch.object(cache, "_save", wraps=cache._save) as save:
+        for i in range(20):
+            cache.set(str(i), {"intent": "query"})
+        # Nada é gravado no caminho do set; só uma escrita depois do debounce
+        assert not path.exists()
+        time.sleep(0.2)
+    save.assert_called_once()
+    assert len(ResponseCache(path=str(path))) == 20
+
+def test_get_waits_for_a_flush_in_progress(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / "ai_cache.json"))
+    cache.set("a", {"intent": "query"})
+    results = []
+    reader = threading.Thread(target=lambda: results.append(cache.get("a")))
+    # Enquanto o flush copia as entradas (com o lock), o get não reordena o dicionário
+    with cache._lock:
+        reader.start()
+        reader.join(0.05)
+        assert reader.is_alive()
+    reader.join(1)
+    assert results == [{"intent": "query"}]
+    cache.flush()
+
+@pytest.mark.asyncio
+async def test_detect_intent_cached_on_normalized_text(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    service = AIService(fused_routing=False)
+    service._generate_content_with_fallback = AsyncMock(return_value='{"intent": "query"}')
+
+    assert await service.detect_intent("Qual meu saldo?") == {"intent": "query"}
+    assert await service.detect_intent("  qual meu SALDO ") == {"intent": "query"}
+
+    service._generate_content_with_fallback.assert_called_once()
+    assert service.response_cache.stats == {"hits": 1, "misses": 1}
@@ -1,9 +1,12 @@
 import pytest
+from unittest.mock import AsyncMock
 from services.ai_handler import AIService
+from services.storage import DEFAULT_EXPENSE_TAGS, DEFAULT_INCOME_TAGS, DEFAULT_METODO_OPTIONS
 
-@pytest.fixture(scope="module")
-def ai_service():
-    return AIService()
+# Os mesmos casos valem para o roteador simples e para o fused (roteador + extrator)
+@pytest.fixture(scope="module", params=[False, True], ids=["router", "fused"])
+def ai_service(request):
+    return AIService(fused_routing=request.param)
 
 @pytest.mark.asyncio
 @pytest.mark.parametrize("text,expected_intent", [
@@ -66,5 +69,18 @@ def ai_service():
     ("Quem te criou?", "other"),
 ])
 async def test_detect_intent(ai_service, text, expected_intent):
-    result = await ai_service.detect_intent(text)
+    result = await ai_service.detect_intent(text, DEFAULT_EXPENSE_TAGS, DEFAULT_INCOME_TAGS, DEFAULT_METODO_OPTIONS)
     assert result.get("intent") == expected_intent
+
+@pytest.mark.asyncio
+async def test_detect_intent_fused_returns_payload(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    service = AIService(fused_routing=True)
+    service._generate_content_with_fallback = AsyncMock(
+        return_value='```json{"intent": "tags", "data": {"action": "list", "tag_name": null}}```'
+    )
+
+    result = await service.detect_intent("Quais são as minhas tags?", ["Mercado"], ["Salário"], ["Pix"])
+
+    assert result == {"intent": "tags", "payload": {"action": "list", "tag_name": None}}
+    service._generate_content_with_fallback.assert_called_once()
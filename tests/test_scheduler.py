@@ -0,0 +1,135 @@
+import asyncio
+import time
+from datetime import datetime
+from types import SimpleNamespace
+import pytest
+from aiogram import Bot, Dispatcher, Router
+from aiogram.filters import StateFilter
+from aiogram.types import Chat, Message, Update, User
+from bot.states import ExpenseState
+from benchmarks.fake_sheets import FakeSheetsService
+from bot.middlewares import UpdateScheduler
+from services.async_transaction_service import AsyncTransactionService, RowLocks, create_sheets_executor
+from services.transaction_service import TransactionService
+
+HEADER = ["Data", "Valor", "Reembolsado", "Descrição", "Tags", "Método"]
+
+
+def chat(chat_id):
+    return {"event_chat": SimpleNamespace(id=chat_id)}
+
+
+@pytest.mark.asyncio
+async def test_same_chat_in_order_other_chats_in_parallel():
+    scheduler = UpdateScheduler(max_concurrency=4)
+    log = []
+
+    async def handler(event, data):
+        await asyncio.sleep(0.3 if event == "a1" else 0.01)
+        log.append(event)
+
+    start = time.perf_counter()
+    for event, chat_id in [("a1", 1), ("a2", 1), ("b1", 2), ("b2", 2)]:
+        await scheduler(handler, event, chat(chat_id))
+    await scheduler.drain()
+
+    # a2 espera o a1 (mais lento) da mesma conversa; a conversa 2 não espera ninguém
+    assert log.index("a1") < log.index("a2")
+    assert log.index("b2") < log.index("a1")
+    assert time.perf_counter() - start < 0.5
+    assert scheduler._chats == {}
+
+
+@pytest.mark.asyncio
+async def test_full_queue_holds_the_producer():
+    scheduler = UpdateScheduler(max_concurrency=4, max_pending=2)
+    release = asyncio.Event()
+
+    async def handler(event, data):
+        await release.wait()
+
+    await scheduler(handler, 1, chat(1))
+    await scheduler(handler, 2, chat(2))
+    third = asyncio.create_task(scheduler(handler, 3, chat(3)))
+    await asyncio.sleep(0.05)
+    assert not third.done()
+
+    release.set()
+    await asyncio.wait_for(third, timeout=1)
+    await scheduler.drain()
+    assert scheduler.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_update_frees_its_slot():
+    scheduler = UpdateScheduler(max_pending=1)
+
+    async def broken(event, data):
+        raise RuntimeError("falhou")
+
+    await scheduler(broken, 1, chat(1))
+    await asyncio.wait_for(scheduler(broken, 2, chat(1)), timeout=1)
+    await scheduler.drain()
+
+
+@pytest.mark.asyncio
+async def test_reimbursement_and_edit_on_the_same_row_do_not_race():
+    sheets = FakeSheetsService([HEADER, ["17/01/2026", "-50", "0", "Uber", "Uber", "Pix"]])
+    sheets.refresh_ledger()
+    executor = create_sheets_executor(max_workers=4)
+    row_locks = RowLocks()
+    # Um serviço por mensagem, como nos handlers, compartilhando os locks
+    edit = AsyncTransactionService(TransactionService(storage=sheets), executor, row_locks)
+    reimburse = AsyncTransactionService(TransactionService(storage=sheets), executor, row_locks)
+
+    shown = await reimburse.get_transaction(2)
+    await asyncio.gather(
+        edit.update_transaction(2, {"amount": -30.0}),
+        reimburse.process_reimbursement(shown, 40.0),
+    )
+    executor.shutdown(wait=True)
+
+    # O reembolso vê o valor editado (30) e lança o excedente de 10 como entrada
+    row = sheets.ledger.get_row(2)
+    assert float(row[1]) == -30.0 and float(row[2]) == 30.0
+    assert float(sheets.ledger.get_row(3)[1]) == 10.0
+    assert len(row_locks) == 0
+
+
+def message_update(update_id, text, chat_id=1):
+    user = User(id=chat_id, is_bot=False, first_name="Teste")
+    return Update(update_id=update_id, message=Message(
+        message_id=update_id, date=datetime.now(), chat=Chat(id=chat_id, type="private"), from_user=user, text=text,
+    ))
+
+
+@pytest.mark.asyncio
+async def test_queued_update_sees_the_state_left_by_the_previous_one():
+    router = Router()
+    routed = []
+
+    @router.message(StateFilter(None))
+    async def new_expense(message, state):
+        # Fica "pensando" (ex: chamando o Gemini) antes de pedir o método de pagamento
+        await asyncio.sleep(0.1)
+        await state.set_state(ExpenseState.AwaitingMissingInfo)
+        routed.append(("new_expense", message.text))
+
+    @router.message(ExpenseState.AwaitingMissingInfo)
+    async def missing_info(message, state):
+        await state.clear()
+        routed.append(("missing_info", message.text))
+
+    dp = Dispatcher()
+    scheduler = UpdateScheduler()
+    dp.update.outer_middleware(scheduler)
+    dp.include_router(router)
+    bot = Bot(token="42:TEST")
+
+    # O segundo update chega enquanto o primeiro ainda está em processamento
+    await dp.feed_update(bot, message_update(1, "Gastei 50"))
+    await dp.feed_update(bot, message_update(2, "Pix"))
+    await scheduler.drain()
+    await bot.session.close()
+
+    assert routed == [("new_expense", "Gastei 50"), ("missing_info", "Pix")]
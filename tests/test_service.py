@@ -1,14 +1,18 @@
 import pytest
-from unittest.mock import MagicMock
+from benchmarks.fake_sheets import FakeSheetsService
+from benchmarks.ledger_generator import generate_ledger
 from services.transaction_service import TransactionService
 from models.transaction import Transaction
 
 @pytest.fixture
 def service():
-    # Mock GoogleSheetsService
-    ts = TransactionService()
-    ts.sheets = MagicMock()
-    return ts
+    # Planilha em memória: os testes rodam sem credenciais nem rede
+    return TransactionService(storage=FakeSheetsService(generate_ledger(0)))
+
+def load_ledger(service, rows):
+    service.sheets.sheet_rows = [list(row) for row in rows]
+    service.refresh_ledger()
+    return service.sheets.ledger
 
 def test_calculate_totals_basic(service):
     # Setup mock data
@@ -19,7 +23,7 @@ def test_calculate_totals_basic(service):
         ["17/01/2026", "-50", "20", "Compra 2", "Lazer", "Pix"], # Net -30
         ["17/01/2026", "1000", "0", "Salário", "Salário", "Pix"],
     ]
-    service.sheets.get_all_rows.return_value = mock_rows
+    load_ledger(service, mock_rows)
 
     res = service.calculate_totals(start_date_str="17/01/2026")
     
@@ -33,7 +37,7 @@ def test_calculate_totals_with_filters(service):
         ["17/01/2026", "-100", "0", "Credito Item", "Tag", "Crédito"],
         ["17/01/2026", "-50", "0", "Pix Item", "Tag", "Pix"],
     ]
-    service.sheets.get_all_rows.return_value = mock_rows
+    load_ledger(service, mock_rows)
 
     # Filter only Credit
     res = service.calculate_totals(include_methods=["Crédito"])
@@ -43,7 +47,113 @@ def test_calculate_totals_with_filters(service):
     res = service.calculate_totals(exclude_methods=["Crédito"])
     assert res["spent"] == 50.0
 
+def test_calculate_totals_date_range_and_top_items(service):
+    mock_rows = [
+        ["Data", "Valor", "Reembolsado", "Descrição", "Tags", "Método"],
+        ["16/01/2026 10:00", "-10", "0", "Fora do range", "Tag", "Pix"],
+        ["17/01/2026 12:30", "-30", "0", "Almoço", "Tag", "Pix"],
+        ["17/01/2026", "-80,50", "0", "Mercado", "Tag", "Crédito"],
+        ["17/01/2026", "-20", "20", "Reembolsado", "Tag", "Pix"], # Net 0
+        ["data inválida", "-999", "0", "Ignorado", "Tag", "Pix"],
+        ["18/01/2026", "-5", "0", "Fora do range", "Tag", "Pix"],
+    ]
+    load_ledger(service, mock_rows)
+
+    res = service.calculate_totals(start_date_str="17/01/2026", end_date_str="18/01/2026", items_limit=1)
+    assert res["spent"] == 110.5
+    assert res["gain"] == 0.0
+    assert res["items"] == [{"desc": "Mercado", "val": -80.5, "date": "17/01/2026"}]
+
+def test_calculate_totals_from_rollups_matches_rows(service):
+    mock_rows = [
+        ["Data", "Valor", "Reembolsado", "Descrição", "Tags", "Método"],
+        ["20/11/2025", "-40", "0", "Borda inicial", "Mercado", "Pix"],
+        ["05/12/2025", "-100", "30", "Dezembro", "Mercado", "Crédito"],
+        ["31/12/2025 23:00", "2000", "0", "Salário", "Salário", "Pix"],
+        ["10/01/2026", "-25", "0", "Janeiro", "Uber", "Pix"],
+        ["02/02/2026", "-60", "0", "Borda final", "Mercado", "Pix"],
+        ["20/02/2026", "-999", "0", "Fora do range", "Mercado", "Pix"],
+    ]
+    ledger = load_ledger(service, mock_rows)
+
+    ranges = [
+        ("15/11/2025", "10/02/2026"),   # bordas parciais + dois meses inteiros
+        ("01/12/2025", "01/01/2026"),   # exatamente um mês
+        ("03/12/2025", "20/12/2025"),   # menos de um mês
+        (None, None),
+    ]
+    for start, end in ranges:
+        for filters in ({}, {"exclude_methods": ["Crédito"]}, {"include_methods": ["crédito"]}):
+            # Referência: somas linha a linha sobre a listagem completa
+            items = service.calculate_totals(start, end, **filters)["items"]
+            expected = (-sum(i["val"] for i in items if i["val"] < 0), sum(i["val"] for i in items if i["val"] > 0))
+            for items_limit in (None, 0, 5):
+                res = service.calculate_totals(start, end, items_limit=items_limit, **filters)
+                assert (res["spent"], res["gain"]) == pytest.approx(expected)
+
+    # Os agregados acompanham as escritas no cache
+    ledger.update_cell(3, 3, "100")   # reembolso total da compra de dezembro
+    ledger.append_row(8, ["15/12/2025", "-15", "0", "Café", "Outros", "Pix"])
+    res = service.calculate_totals("01/12/2025", "01/01/2026", items_limit=0)
+    assert res["spent"] == 15.0
+    assert res["gain"] == 2000.0
+
+def test_calculate_totals_with_items_still_uses_rollups(service, monkeypatch):
+    load_ledger(service, [
+        ["Data", "Valor", "Reembolsado", "Descrição", "Tags", "Método"],
+        ["05/12/2025", "-100", "0", "Dezembro", "Mercado", "Pix"],
+        ["10/01/2026", "-25", "0", "Janeiro", "Uber", "Pix"],
+    ])
+    calls = []
+    rollup_totals = service._rollup_totals
+    monkeypatch.setattr(service, "_rollup_totals", lambda *args: calls.append(args) or rollup_totals(*args))
+
+    res = service.calculate_totals("01/12/2025", "01/02/2026", items_limit=5)
+    assert len(calls) == 1
+    assert res["spent"] == 125.0
+    assert [i["desc"] for i in res["items"]] == ["Dezembro", "Janeiro"]
+
+def test_find_transaction_uses_date_range(service):
+    mock_rows = [
+        ["Data", "Valor", "Reembolsado", "Descrição", "Tags", "Método"],
+        ["16/01/2026 09:00", "-25", "0", "Padaria", "Mercado", "Pix"],
+        ["17/01/2026 10:00", "-25", "0", "Padaria", "Mercado", "Pix"],
+        ["17/01/2026 18:00", "-40", "0", "Farmácia", "Saúde", "Pix"],
+    ]
+    ledger = load_ledger(service, mock_rows)
+
+    res = service.find_transaction(date_query="17/01/2026", amount_query=25.0)
+    assert [t.row_index for t in res] == [3]
+
+    # Linha nova entra no índice de datas sem refresh
+    ledger.append_row(5, ["17/01/2026 20:00", "-25", "0", "Padaria", "Mercado", "Pix"])
+    res = service.find_transaction(date_query="17/01/2026", desc_query="padaria")
+    assert [t.row_index for t in res] == [5, 3]
+
+    # Descrição alterada é reindexada (busca sem acento)
+    ledger.update_cell(4, 4, "Farmácia São João")
+    res = service.find_transaction(desc_query="farmacia joao")
+    assert [t.row_index for t in res] == [4]
+
+def test_find_expense_by_date_and_desc(service):
+    mock_rows = [
+        ["Data", "Valor", "Reembolsado", "Descrição", "Tags", "Método"],
+        ["15/01/2026", "-60", "0", "Uber aeroporto", "Uber", "Crédito"],
+        ["15/01/2026", "-30", "30", "Uber centro", "Uber", "Crédito"], # Já reembolsado
+        ["16/01/2026", "-20", "0", "Uber casa", "Uber", "Pix"],
+    ]
+    load_ledger(service, mock_rows)
+
+    res = service.find_expense_by_date_and_desc("15/01/2026", "uber")
+    assert [t.row_index for t in res] == [2]
+    res = service.find_expense_by_date_and_desc(None, "compra do uber")
+    assert [t.row_index for t in res] == [4, 2]
+
 def test_process_reimbursement_surplus(service):
+    load_ledger(service, [
+        ["Data", "Valor", "Reembolsado", "Descrição", "Tags", "Método"],
+        ["17/01/2026", "-50", "0", "Uber", "Transporte", "Pix"],
+    ])
     # Transaction: -50 spent
     t = Transaction(date="17/01/2026", amount=-50.0, reimbursed_amount=0.0, 
                     description="Uber", category="Transporte", payment_method="Pix", row_index=2)
@@ -54,9 +164,9 @@ def test_process_reimbursement_surplus(service):
     assert res["is_surplus"] is True
     assert res["surplus_amount"] == 10.0
     # Original should be capped at 50
-    service.sheets.update_reimbursement.assert_called_with(2, 50.0)
+    assert service.sheets.sheet_rows[1][2] == "50.0"
     # New row for surplus
-    service.sheets.add_expense.assert_called()
+    assert service.sheets.sheet_rows[2][1:] == ["10.0", "0", "Reembolso Excedente: Uber", "Reembolso", "Pix"]
 
 def test_normalize_text_logic():
     from services.transaction_service import normalize_text
@@ -0,0 +1,126 @@
+import pytest
+from unittest.mock import MagicMock
+from models.transaction import parse_date_ordinal
+from benchmarks.fake_sheets import FakeSheetsService
+from benchmarks.ledger_generator import generate_ledger
+from services.sqlite_storage import SQLiteStorage, SheetsMirror
+from services.transaction_service import TransactionService
+
+@pytest.fixture
+def storage(tmp_path):
+    return SQLiteStorage(str(tmp_path / "telegrana.db"))
+
+@pytest.fixture
+def service(storage):
+    return TransactionService(storage=storage, journal=MagicMock())
+
+def test_rows_follow_sheet_numbering(storage):
+    first = storage.add_expense(-50, "Uber", tags="Uber", metodo_pagamento="Pix", data_custom="17/01/2026 10:00")
+    rows = storage.append_rows([
+        ["18/01/2026", -20, 0, "Café", "Outros", "Pix"],
+        ["19/01/2026", 1000, 0, "Salário", "Salário", "Pix"],
+    ])
+    assert first == 2
+    assert rows == [3, 4]
+
+    storage.refresh_ledger()
+    assert storage.get_all_rows()[2] == ["18/01/2026", "-20", "0", "Café", "Outros", "Pix"]
+
+def test_service_works_on_sqlite(service):
+    service.refresh_ledger()
+    result = service.create_transaction(-50.0, "Uber", "Uber", "pix", data="17/01/2026 10:00")
+    service.create_transaction(1000.0, "Salário", "Salário", "pix", data="18/01/2026 09:00")
+
+    # Sem journal: a escrita local já é rápida
+    assert service.journal is None
+    assert result["row_index"] == 2
+    totals = service.calculate_totals()
+    assert totals["spent"] == 50.0
+    assert totals["gain"] == 1000.0
+    assert [t.row_index for t in service.find_transaction(desc_query="uber")] == [2]
+
+def test_update_transaction_persists(storage, tmp_path):
+    row = storage.add_expense(-50, "Uber", tags="Uber", metodo_pagamento="Pix", data_custom="17/01/2026")
+    storage.update_transaction(row, {"amount": -30.25, "description": "Uber aeroporto"})
+
+    reopened = SQLiteStorage(str(tmp_path / "telegrana.db"))
+    reopened.refresh_ledger()
+    assert reopened.get_all_rows()[1][1:4] == ["-30.25", "0", "Uber aeroporto"]
+
+def test_amounts_keep_full_precision(storage):
+    storage.append_rows([["17/01/2026", -1234567.89, 0.125, "Carro", "Outros", "Pix"]])
+    storage.refresh_ledger()
+    assert storage.get_all_rows()[1][1:3] == ["-1234567.89", "0.125"]
+    assert storage.ledger.transaction_at(0).amount == -1234567.89
+
+def test_scan_range_uses_indexes(storage):
+    storage.append_rows([
+        ["10/01/2026", -10, 0, "A", "Outros", "Pix"],
+        ["10/02/2026", -20, 0, "Café", "Outros", "Pix"],
+        ["12/02/2026", -25, 0, "Cafe", "Outros", "Crédito"],
+        ["10/03/2026", -30, 0, "C", "Outros", "Pix"],
+    ])
+    start = parse_date_ordinal("01/02/2026")
+    end = parse_date_ordinal("01/03/2026")
+    assert [t.amount for t in storage.scan_range(start, end)] == [-25, -20]
+    assert [t.amount for t in storage.scan_range(start, end, method="Pix")] == [-20]
+    assert [t.amount for t in storage.scan_range(description="CAFÉ")] == [-25, -20]
+
+    storage.update_description(3, "Padaria")
+    assert [t.amount for t in storage.scan_range(description="café")] == [-25]
+
+    plan = " ".join(str(row) for row in storage.conn.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM transactions WHERE date_ord >= ? AND date_ord < ?", (start, end)
+    ))
+    assert "idx_transactions_date" in plan
+
+def test_scan_range_matches_the_cached_backend(storage):
+    rows = generate_ledger(500)
+    storage.append_rows(rows[1:])
+    sheets = FakeSheetsService(rows)
+    start = parse_date_ordinal("01/01/2019")
+    end = parse_date_ordinal("01/05/2019")
+    for kwargs in ({}, {"method": "Pix"}, {"description": "salario"}):
+        expected = [(t.row_index, t.amount) for t in sheets.scan_range(start, end, **kwargs)]
+        assert [(t.row_index, t.amount) for t in storage.scan_range(start, end, **kwargs)] == expected
+        assert expected
+
+def test_tags_survive_restart(storage, tmp_path):
+    assert storage.add_category("Farmácia") is True
+    assert storage.add_category("Farmácia") is False
+
+    reopened = SQLiteStorage(str(tmp_path / "telegrana.db"))
+    assert "Farmácia" in reopened.expense_tags
+
+def test_mirror_pushes_only_changed_rows(storage):
+    sheets = MagicMock()
+    sheets.ws.row_count = 1000
+    mirror = SheetsMirror(storage, sheets)
+
+    storage.append_rows([
+        ["10/01/2026", -10, 0, "A", "Outros", "Pix"],
+        ["11/01/2026", -20, 0, "B", "Outros", "Pix"],
+    ])
+    assert mirror.sync_once() == 2
+    ranges = [item["range"] for item in sheets.ws.batch_update.call_args.args[0]]
+    assert ranges == ["A2:F2", "A3:F3"]
+
+    storage.update_transaction(3, {"category": "Lazer"})
+    assert mirror.sync_once() == 1
+    assert sheets.ws.batch_update.call_args.args[0][0]["range"] == "A3:F3"
+    assert mirror.sync_once() == 0
+
+def test_mirror_keeps_rows_edited_during_a_sync(storage):
+    sheets = MagicMock()
+    sheets.ws.row_count = 1000
+    mirror = SheetsMirror(storage, sheets)
+    storage.append_rows([["10/01/2026", -10, 0, "A", "Outros", "Pix"]])
+
+    # Edição entre a leitura das pendências e o mark_synced
+    sheets.ws.batch_update.side_effect = lambda *args, **kwargs: storage.update_transaction(2, {"amount": -15.0})
+    assert mirror.sync_once() == 1
+    sheets.ws.batch_update.side_effect = None
+
+    assert mirror.sync_once() == 1
+    assert sheets.ws.batch_update.call_args.args[0][0]["values"] == [["10/01/2026", "-15", "0", "A", "Outros", "Pix"]]
+    assert mirror.sync_once() == 0
@@ -0,0 +1,34 @@
+import pytest
+from models.transaction import Transaction, parse_date_cell, parse_date_ordinal
+from datetime import date
+
+def test_parse_date_cell():
+    assert parse_date_cell("17/01/2026 12:30") == (date(2026, 1, 17).toordinal(), "12:30")
+    assert parse_date_cell("7/1/2026") == (date(2026, 1, 7).toordinal(), None)
+    assert parse_date_cell("31/02/2026") == (None, None)
+    assert parse_date_cell("data inválida") == (None, None)
+    assert parse_date_cell("") == (None, None)
+    assert parse_date_ordinal("17/01/2026") == date(2026, 1, 17).toordinal()
+
+def test_from_row_short_row_is_not_padded():
+    row = ["17/01/2026 08:00", "-50,5"]
+    t = Transaction.from_row(row, row_index=3)
+    assert row == ["17/01/2026 08:00", "-50,5"]
+    assert t.amount == -50.5
+    assert t.reimbursed_amount == 0.0
+    assert t.description is None and t.category is None
+    assert t.date_ordinal == date(2026, 1, 17).toordinal()
+    assert t.time == "08:00"
+    assert t.to_row()[0] == "17/01/2026 08:00"
+
+def test_from_row_interns_tags():
+    first = Transaction.from_row(["17/01/2026", "-10", "0", "A", "Mer" + "cado", "Pix"], row_index=10)
+    second = Transaction.from_row(["18/01/2026", "-20", "0", "B", "".join(["Merc", "ado"]), "Pix"], row_index=11)
+    assert (first.row_index, second.row_index) == (10, 11)
+    assert first.category is second.category
+
+def test_transaction_is_slotted():
+    t = Transaction("17/01/2026", -1.0, 0.0, None, None, None)
+    assert t.date_ordinal == date(2026, 1, 17).toordinal()
+    with pytest.raises(AttributeError):
+        t.extra = 1
@@ -0,0 +1,40 @@
+import pytest
+from unittest.mock import MagicMock
+from services.user_registry import UserServiceRegistry, parse_user_sheets
+
+def make_registry(max_size=2):
+    user_sheets = {1: "sheet-a", 2: "sheet-b", 3: "sheet-c", 4: "sheet-a"}
+    factory = MagicMock(side_effect=lambda sheet_id: MagicMock(sheet_id=sheet_id))
+    return UserServiceRegistry(user_sheets, factory, max_size=max_size), factory
+
+def test_parse_user_sheets():
+    assert parse_user_sheets("123:abc, 456:def") == {123: "abc", 456: "def"}
+    assert parse_user_sheets("") == {}
+    with pytest.raises(ValueError):
+        parse_user_sheets("123")
+
+def test_unknown_user_gets_nothing():
+    registry, factory = make_registry()
+    assert registry.get(99) is None
+    assert not registry.is_authorized(99)
+    factory.assert_not_called()
+
+def test_sheet_is_opened_once_and_shared():
+    registry, factory = make_registry()
+    first = registry.get(1)
+    assert registry.get(1) is first
+    # Usuário 4 usa a mesma planilha do usuário 1
+    assert registry.get(4) is first
+    factory.assert_called_once_with("sheet-a")
+
+def test_least_recently_used_sheet_is_evicted():
+    registry, factory = make_registry(max_size=2)
+    service_a = registry.get(1)
+    registry.get(2)
+    registry.get(1)   # "sheet-a" volta a ser a mais recente
+    registry.get(3)   # evicta "sheet-b"
+
+    assert len(registry) == 2
+    assert registry.get(1) is service_a
+    registry.get(2)
+    assert [call.args[0] for call in factory.call_args_list] == ["sheet-a", "sheet-b", "sheet-c", "sheet-b"]
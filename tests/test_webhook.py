@@ -0,0 +1,68 @@
+import asyncio
+import pytest
+import pytest_asyncio
+from aiohttp.test_utils import TestClient, TestServer
+from aiogram import Bot, Dispatcher, Router
+from bot.middlewares import UpdateScheduler
+from bot.webhook import build_webhook_app
+
+SECRET = "s3cr3t"
+
+def make_update(update_id, text="50 uber"):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 1768651200,
+            "chat": {"id": 1, "type": "private"},
+            "from": {"id": 1, "is_bot": False, "first_name": "Teste"},
+            "text": text,
+        },
+    }
+
+@pytest_asyncio.fixture
+async def webhook():
+    received = []
+    done = asyncio.Event()
+    router = Router()
+
+    @router.message()
+    async def echo(message):
+        received.append(message.text)
+        done.set()
+
+    dp = Dispatcher()
+    dp.update.outer_middleware(UpdateScheduler(max_concurrency=2))
+    dp.include_router(router)
+    bot = Bot(token="123456:TEST")
+    app = build_webhook_app(dp, bot, path="/webhook", secret_token=SECRET)
+    client = TestClient(TestServer(app))
+    await client.start_server()
+    yield client, received, done
+    await client.close()
+
+@pytest.mark.asyncio
+async def test_update_is_dispatched(webhook):
+    client, received, done = webhook
+    response = await client.post(
+        "/webhook",
+        json=make_update(1),
+        headers={"X-Telegram-Bot-Api-Secret-Token": SECRET},
+    )
+    assert response.status == 200
+
+    await asyncio.wait_for(done.wait(), timeout=2)
+    assert received == ["50 uber"]
+
+@pytest.mark.asyncio
+async def test_wrong_secret_is_rejected(webhook):
+    client, received, _ = webhook
+    response = await client.post(
+        "/webhook",
+        json=make_update(2),
+        headers={"X-Telegram-Bot-Api-Secret-Token": "errado"},
+    )
+    assert response.status == 401
+
+    await asyncio.sleep(0.05)
+    assert received == []
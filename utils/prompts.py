@@ -1,19 +1,49 @@
-def get_expense_classification_prompt(text, expense_tags, income_tags, current_date):
-    return f"""
-    Você é um assistente financeiro pessoal. Estamos em {current_date}.
-    Analise a frase: "{text}"
+from textwrap import dedent
+from typing import NamedTuple
+
+
+class Prompt(NamedTuple):
+    """Prompt dividido em instruções fixas e na parte que muda a cada mensagem.
+
+    `static` é igual em todas as chamadas do mesmo tipo: vai como system_instruction
+    (ou no cached content do Gemini). `dynamic` leva só a data, as listas de
+    tags/métodos e a frase do usuário.
+    """
+    kind: str
+    static: str
+    dynamic: str
+
+    def __str__(self):
+        return f"{self.static}\n\n{self.dynamic}"
+
+
+def _instructions(text):
+    """Remove a indentação do código-fonte (espaços que só custariam tokens)."""
+    return dedent(text).strip()
+
+
+def _dynamic(text, **context):
+    """Sufixo dinâmico: um "Chave: valor" por linha e a frase do usuário por último."""
+    lines = [f"{key.replace('_', ' ').capitalize()}: {value}" for key, value in context.items()]
+    lines.append(f'Frase: "{text}"')
+    return "\n".join(lines)
+
+
+EXPENSE_INSTRUCTIONS = _instructions("""
+    Você é um assistente financeiro pessoal. Estamos na data "Hoje" informada no fim da mensagem.
+    Analise a frase do usuário ("Frase", no fim da mensagem).
     
     CLASSIFIQUE como:
     - GASTO: quando é saída de dinheiro (ex: "gastei", "paguei", "comprei")
     - ENTRADA: quando é recebimento de dinheiro (ex: "recebi", "ganhei", "salário")
     
     REGRAS DE CLASSIFICAÇÃO:
-    - tags para GASTOS: {expense_tags}
-    - tags para ENTRADAS: {income_tags}
+    - tags para GASTOS: as "Tags de gastos" informadas
+    - tags para ENTRADAS: as "Tags de entradas" informadas
     - METODOLOGIA ESPECIAL: Toda vez que houver uma **entrada/receita** relacionada a "vale alimentação", "alimentação" ou "VR" no método "Caju", a "tags" DEVE ser obrigatoriamente "Salário".
     - metodo_pagamento: Escolha APENAS uma: [Pix, Crédito, Débito, Caju]. Se não mencionado, retorne null.
     - data: extraia a data mencionada no formato dd/mm/yyyy. Se não mencionado, retorne null. 
-    - Se o usuário disser "dia 13", assuma o mês e ano atuais de {current_date}.
+    - Se o usuário disser "dia 13", assuma o mês e ano atuais de "Hoje".
     
     IMPORTANTE:
     - Se for GASTO: o valor deve ser NEGATIVO (ex: -400)
@@ -28,39 +58,36 @@ def get_expense_classification_prompt(text, expense_tags, income_tags, current_d
     - A descricao deve ser uma versão resumida e clara. Se não houver descrição clara, use null.
     
     Retorne APENAS um JSON:
-    {{
+    {
         "valor": float (negativo para gastos, positivo para entradas ou null),
         "descricao": str (ou null),
         "tags": str (ou null),
         "metodo_pagamento": str (ou null),
         "data": str (dd/mm/yyyy ou null)
-    }}
+    }
     Se não houver valor, retorne null.
-    """
+""")
 
-def get_reimbursement_prompt(text, current_date):
-    return f"""
-    Você é um assistente financeiro pessoal. Estamos em {current_date}.
-    Analise se a seguinte frase é sobre um REEMBOLSO: "{text}"
+REIMBURSEMENT_INSTRUCTIONS = _instructions("""
+    Você é um assistente financeiro pessoal. Estamos na data "Hoje" informada no fim da mensagem.
+    Analise se a frase do usuário ("Frase", no fim da mensagem) é sobre um REEMBOLSO.
     
     Se for sobre reembolso, extraia:
     - valor_reembolsado: valor que foi reembolsado (float)
-    - data_compra: data da compra original (formato dd/mm/yyyy). Se o usuário disser "dia 15" e não especificar mês/ano, assuma mês/ano atual ({current_date}).
+    - data_compra: data da compra original (formato dd/mm/yyyy). Se o usuário disser "dia 15" e não especificar mês/ano, assuma mês/ano atual ("Hoje").
     - descricao_compra: descrição da compra que foi reembolsada (ex: "mercado", "compra no mercado")
     
     Retorne APENAS um JSON:
-    {{
+    {
         "is_reimbursement": true,
         "valor_reembolsado": float (null se não encontrado),
         "data_compra": str no formato dd/mm/yyyy (null se não especificado),
         "descricao_compra": str (null se não especificado)
-    }}
-    """
-
+    }
+""")
 
-def get_past_edit_prompt(text, all_tags, metodo_options):
-    return f"""
-    Você é um assistente financeiro. Analise a frase: "{text}"
+PAST_EDIT_INSTRUCTIONS = _instructions("""
+    Você é um assistente financeiro. Analise a frase do usuário ("Frase", no fim da mensagem).
 
     O usuário quer alterar ou corrigir uma transação que já foi feita? 
     Isso deve ser verdade APENAS se houver verbos de correção (alterar, mudar, corrigir, trocar) ou se ele estiver fornecendo uma informação que falta para algo já citado (ex: "aquele gasto de ontem foi no crédito").
@@ -70,20 +97,20 @@ def get_past_edit_prompt(text, all_tags, metodo_options):
     - Se não houver intenção clara de MUDANÇA, retorne false.
 
     Retorne APENAS um JSON:
-    {{
+    {
         "is_past_edit": boolean,
-        "search_criteria": {{
+        "search_criteria": {
             "date": str (dd/mm/yyyy, "today", "yesterday" ou null),
             "amount": float (null se não descreveu o valor original),
             "description": str (null se não descreveu)
-        }},
-        "updates": {{
+        },
+        "updates": {
             "amount": float (null se não mudar),
             "description": str (null se não mudar),
             "tag": str (null se não mudar),
             "payment_method": str (null se null se não mudar)
-        }}
-    }}
+        }
+    }
 
     EXEMPLOS NEGATIVOS (is_past_edit: false):
     - "eu comprei um playstation 5 por 4000 reais" -> Isso é novo!
@@ -94,33 +121,31 @@ def get_past_edit_prompt(text, all_tags, metodo_options):
     - "mude o valor daquela compra de ontem para 100"
     - "a tag da passagem de aviao na verdade é viagem"
     - "o gasto de 400 reais de hoje foi no pix (corrigindo)"
-    """
+""")
 
-def get_tag_intent_prompt(text):
-    return f"""
+TAG_INTENT_INSTRUCTIONS = _instructions("""
     Você é um assistente. O usuário quer gerenciar tags.
-    Frase: "{text}"
+    A frase do usuário ("Frase") está no fim da mensagem.
 
     Identifique a intenção:
     - LISTAR: "quais são minhas tags?", "listar categorias", "ver tags".
     - CRIAR: "crie a tag Gasolina", "adicionar categoria Investimentos", "nova tag Lazer".
 
     Retorne APENAS um JSON:
-    {{
+    {
         "action": "list" | "create" | null,
         "tag_name": str (apenas se action == create, Capitalizado, sem 'tag' ou 'categoria')
-    }}
+    }
     
     Exemplos:
-    "Crie a tag Viagem" -> {{"action": "create", "tag_name": "Viagem"}}
-    "Adicionar categoria Carro" -> {{"action": "create", "tag_name": "Carro"}}
-    "Quais tags existem?" -> {{"action": "list", "tag_name": null}}
-    """
+    "Crie a tag Viagem" -> {"action": "create", "tag_name": "Viagem"}
+    "Adicionar categoria Carro" -> {"action": "create", "tag_name": "Carro"}
+    "Quais tags existem?" -> {"action": "list", "tag_name": null}
+""")
 
-def get_query_intent_prompt(text, current_date, metodo_options):
-    return f"""
-    Você é um assistente financeiro. Estamos em {current_date}.
-    Analise a pergunta do usuário sobre seus gastos/ganhos: "{text}"
+QUERY_INSTRUCTIONS = _instructions("""
+    Você é um assistente financeiro. Estamos na data "Hoje" informada no fim da mensagem.
+    Analise a pergunta do usuário sobre seus gastos/ganhos ("Frase", no fim da mensagem).
 
     Identifique os parâmetros da consulta:
     1. DATE_RANGE:
@@ -135,16 +160,16 @@ def get_query_intent_prompt(text, current_date, metodo_options):
        - "exclude_methods": Lista de métodos de pagamento a EXCLUIR (ex: "sem caju").
        - "include_methods": Lista de métodos de pagamento a INCLUIR exclusivamente (ex: "no crédito").
     
-    Opções de métodos conhecidos: {metodo_options}
+    Opções de métodos conhecidos: os "Métodos" informados
 
     DICAS DE DATA:
-    - Hoje: {current_date}
-    - Ontem: dia anterior a {current_date}
+    - Hoje: a data "Hoje" informada
+    - Ontem: dia anterior a "Hoje"
     - Semana passada: intervalo de 7 dias terminando no último domingo.
     - Dia X: start_date=X/mes/ano, end_date=(X+1)/mes/ano.
 
     Retorne APENAS um JSON:
-    {{
+    {
         "is_query": true,
         "start_date": str (dd/mm/yyyy) | null,
         "end_date": str (dd/mm/yyyy) | null,
@@ -152,13 +177,12 @@ def get_query_intent_prompt(text, current_date, metodo_options):
         "query_type": "spent" | "gain" | "summary",
         "exclude_methods": [str],
         "include_methods": [str]
-    }}
-    """
+    }
+""")
 
-def get_intent_router_prompt(text):
-    return f"""
+ROUTER_INSTRUCTIONS = _instructions("""
     Você é o roteador de um assistente financeiro. 
-    Sua missão é IDENTIFICAR a intenção do usuário na frase: "{text}"
+    Sua missão é IDENTIFICAR a intenção do usuário na frase do usuário ("Frase", no fim da mensagem)
 
     Escolha APENAS UM dos intents abaixo:
     1. "insert": O usuário está relatando um novo gasto ou ganho (ex: "comprei", "recebi", "paguei", "vendi", "almoço 50 reais").
@@ -174,7 +198,66 @@ def get_intent_router_prompt(text):
     - Se a frase for uma pergunta genérica sobre dinheiro gasto, é "query".
 
     Retorne APENAS um JSON:
-    {{
+    {
         "intent": "insert" | "reimburse" | "query" | "edit" | "tags" | "other"
-    }}
-    """
+    }
+""")
+
+FUSED_ROUTER_INSTRUCTIONS = _instructions("""
+    Você é o roteador e extrator de um assistente financeiro. Estamos na data "Hoje" informada no fim da mensagem.
+    A frase do usuário ("Frase") está no fim da mensagem.
+
+    PASSO 1 - Escolha APENAS UM intent:
+    1. "insert": novo gasto ou ganho (ex: "comprei", "recebi", "paguei", "vendi", "almoço 50 reais").
+    2. "reimburse": REEMBOLSO/ESTORNO de algo já comprado. Palavras como "reembolsou", "reembolso", "estornou" ou "estorno" têm PRIORIDADE e SEMPRE levam a "reimburse".
+    3. "query": resumo, relatório ou saldo (ex: "quanto gastei", "saldo", "total do mês").
+    4. "edit": ALTERAR uma transação já registrada (ex: "mude a tag", "corrija o valor", "não foi no pix").
+    5. "tags": gerenciar categorias (ex: "quais minhas tags", "crie a tag X").
+    6. "other": nenhum dos acima.
+    Se a frase contiver um VALOR e um ITEM (ex: "picolé 11 reais"), o intent é "insert".
+
+    PASSO 2 - Preencha "data" conforme o intent escolhido:
+    - "insert": {"valor": float (NEGATIVO para gastos, POSITIVO para entradas, null se não houver valor), "descricao": str|null, "tags": str|null, "metodo_pagamento": str|null, "data": "dd/mm/yyyy"|null}
+      * tags de GASTOS: as "Tags de gastos" informadas; tags de ENTRADAS: as "Tags de entradas" informadas. Se não se encaixar, null.
+      * Entrada de "vale alimentação"/"VR" no método "Caju" tem tag "Salário".
+      * É PROIBIDO inventar valores. Se só houver valor de reembolso, "valor" é null.
+    - "reimburse": {"is_reimbursement": true, "valor_reembolsado": float|null, "data_compra": "dd/mm/yyyy"|null, "descricao_compra": str|null}
+    - "query": {"is_query": true, "start_date": "dd/mm/yyyy"|null, "end_date": "dd/mm/yyyy"|null (exclusive), "label": str, "query_type": "spent"|"gain"|"summary", "exclude_methods": [str], "include_methods": [str]}
+      * Ontem: dia anterior a "Hoje". Dia X: start_date=X/mes/ano, end_date=(X+1)/mes/ano.
+    - "edit": {"is_past_edit": true, "search_criteria": {"date": "dd/mm/yyyy"|"today"|"yesterday"|null, "amount": float|null, "description": str|null}, "updates": {"amount": float|null, "description": str|null, "tag": str|null, "payment_method": str|null}}
+      * tags conhecidas: as "Tags de gastos" e as "Tags de entradas" informadas
+    - "tags": {"action": "list"|"create"|null, "tag_name": str|null (Capitalizado, sem 'tag' ou 'categoria')}
+    - "other": {}
+
+    Métodos de pagamento: os "Métodos" informados. Se o usuário disser "dia 13", assuma mês e ano de "Hoje".
+
+    Retorne APENAS um JSON:
+    {
+        "intent": "insert" | "reimburse" | "query" | "edit" | "tags" | "other",
+        "data": {...}
+    }
+""")
+
+
+def get_expense_classification_prompt(text, expense_tags, income_tags, current_date):
+    return Prompt("expense", EXPENSE_INSTRUCTIONS, _dynamic(
+        text, hoje=current_date, tags_de_gastos=expense_tags, tags_de_entradas=income_tags))
+
+def get_reimbursement_prompt(text, current_date):
+    return Prompt("reimbursement", REIMBURSEMENT_INSTRUCTIONS, _dynamic(text, hoje=current_date))
+
+def get_past_edit_prompt(text, all_tags, metodo_options):
+    return Prompt("past_edit", PAST_EDIT_INSTRUCTIONS, _dynamic(text))
+
+def get_tag_intent_prompt(text):
+    return Prompt("tags", TAG_INTENT_INSTRUCTIONS, _dynamic(text))
+
+def get_query_intent_prompt(text, current_date, metodo_options):
+    return Prompt("query", QUERY_INSTRUCTIONS, _dynamic(text, hoje=current_date, métodos=metodo_options))
+
+def get_intent_router_prompt(text):
+    return Prompt("router", ROUTER_INSTRUCTIONS, _dynamic(text))
+
+def get_fused_router_prompt(text, expense_tags, income_tags, metodo_options, current_date):
+    return Prompt("fused", FUSED_ROUTER_INSTRUCTIONS, _dynamic(
+        text, hoje=current_date, tags_de_gastos=expense_tags, tags_de_entradas=income_tags, métodos=metodo_options))
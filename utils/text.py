@@ -0,0 +1,16 @@
+import unicodedata
+
+# Palavras ignoradas nas buscas por descrição
+STOPWORDS = {"de", "do", "da", "em", "no", "na", "com", "a", "o", "compra", "gasto", "despesa"}
+
+def normalize_text(text):
+    """Remove acentos e converte para minúsculas."""
+    if not text: return ""
+    return "".join(
+        c for c in unicodedata.normalize('NFD', str(text).lower())
+        if unicodedata.category(c) != 'Mn'
+    )
+
+def tokenize(text):
+    """Tokens normalizados (sem acento, minúsculos) de um texto, sem stopwords."""
+    return [token for token in normalize_text(text).split() if token not in STOPWORDS]